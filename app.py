@@ -1,128 +1,785 @@
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify, session
+import base64
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify, session, has_request_context
+from werkzeug.exceptions import RequestEntityTooLarge
 import psycopg2
 import psycopg2.extras
-import psycopg2.pool
 import re
 import os
 import csv
+import io
 import time
+import math
 from waitress import serve
 from datetime import datetime, timedelta, UTC  # UTC használata
-import firebase_admin
-from firebase_admin import credentials, auth
 from dotenv import load_dotenv
 import json
+import threading
+import select
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+from collections import OrderedDict
+from dedup import bounding_box, find_duplicate_pairs, find_duplicates
+from geoindex import METERS_PER_DEGREE, GridIndex, haversine_m, min_distance_beyond_degrees
+from routing import PlaceCoordinates, UnknownPlaces, encode_distance_matrix, route_legs, visit_order
+from places_formats import (COMPRESS_MIN_BYTES, PLACES_FORMATS, POINT_BUFFER_FIELDS, available_encodings,
+                            available_formats, compress_body, encode_columns, encode_point_buffer)
+from dbpool import ConnectionPool, ReadRouter
+from metrics import RequestMetrics, TimedCursor, TimedDictCursor, TimedRealDictCursor
+from user_directory import (CachedUserDirectory, EmailAlreadyExists, FirebaseUserDirectory, InMemoryUserDirectory,
+                            LazyUserDirectory, UserNotFound)
 
 # Naplózás beállítása
 log_level = logging.DEBUG if os.environ.get('APP_ENV', 'development') != 'production' else logging.INFO
 logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Middleware az inaktivitási időzítéshez
+# Inaktivitási időzítés.
+# - timeout: ennyi valódi (nem ping) kérés nélküli idő után kijelentkeztetünk
+# - ping_timeout: ha a felhasználó utolsó látható lapja is elrejtődött/bezárult
+#   (a kliens "hidden" jelzést küld), ennyi idő múlva kijelentkeztetünk
+# - heartbeat_timeout: ha a böngésző jelzés nélkül tűnt el (pl. összeomlott),
+#   a ritka szívverés elmaradása után kijelentkeztetünk
+# Az időbélyegek csak touch_interval felbontással frissülnek, így a legtöbb kérés
+# nem módosítja a sessiont és nem küld új Set-Cookie fejlécet.
 class SessionTimeout:
-    def __init__(self, app, timeout=timedelta(minutes=15), ping_timeout=timedelta(seconds=30)):
-        self.app = app
-        self.timeout = timeout
-        self.ping_timeout = ping_timeout
-
-    def __call__(self, environ, start_response):
-        session_data = environ.get('flask.session', {})
-        last_activity = session_data.get('last_activity')
-        last_seen = session_data.get('last_seen', datetime.now(UTC))  # Timezone-aware
-
-        if 'user' in session_data and last_activity:
-            inactivity = datetime.now(UTC) - last_activity
-            unseen = datetime.now(UTC) - last_seen
-            logger.debug(f"Inactivity: {inactivity}, Unseen: {unseen}")  # Debug log
-            if inactivity > self.timeout or unseen > self.ping_timeout:  # Csak valódi inaktivitás vagy ping hiánya
-                session.pop('user', None)
-                flash("⚠️ Inaktivitás miatt kijelentkeztél!", "warning")
-
-        def new_start_response(status, headers, exc_info=None):
-            if 'user' in session:
-                session['last_activity'] = datetime.now(UTC)
-                session['last_seen'] = datetime.now(UTC)  # Frissítjük az utolsó látott időt minden kérésnél
-            return start_response(status, headers, exc_info)
-
-        return self.app(environ, new_start_response)
+    def __init__(self, app, timeout=timedelta(minutes=15), ping_timeout=timedelta(seconds=30),
+                 heartbeat_interval=timedelta(seconds=150), touch_interval=timedelta(seconds=60)):
+        self.timeout = timeout.total_seconds()
+        self.ping_timeout = ping_timeout.total_seconds()
+        self.heartbeat_interval = heartbeat_interval.total_seconds()
+        # A rejtett lapot a "hidden" jelzés után ping_timeout múlva léptetjük ki; egy összeomlott
+        # vagy kilőtt böngésző viszont nem jelez, azt csak a kimaradó szívverés mutatja, így ott
+        # a session legfeljebb heartbeat_timeout-ig (alapból 450 mp) él. A rövidebb ablakhoz
+        # sűrűbb szívverés kellene, ami a tétlen lapok forgalmát növelné (bench_ping.py).
+        self.heartbeat_timeout = 3 * self.heartbeat_interval
+        self.touch_interval = touch_interval.total_seconds()
+        app.config['PERMANENT_SESSION_LIFETIME'] = timeout
+        app.config['SESSION_REFRESH_EACH_REQUEST'] = False
+        app.before_request(self.check)
+        app.context_processor(lambda: {"heartbeat_interval_ms": int(self.heartbeat_interval * 1000)})
+
+    @staticmethod
+    def _timestamp(value, default):
+        # A régi sessionökben datetime volt tárolva
+        return value if isinstance(value, (int, float)) else default
+
+    def check(self):
+        if 'user' not in session or request.endpoint == 'static':
+            return None
+        now = int(time.time())
+        last_activity = self._timestamp(session.get('last_activity'), now)
+        last_seen = self._timestamp(session.get('last_seen'), now)
+        hidden_at = session.get('hidden_at')
+        if (now - last_activity > self.timeout or now - last_seen > self.heartbeat_timeout
+                or (hidden_at is not None and now - hidden_at > self.ping_timeout)):
+            logger.debug(f"Inaktivitás: {now - last_activity} mp, nem látott: {now - last_seen} mp, rejtve: {hidden_at}")
+            for key in ('user', 'last_activity', 'last_seen', 'hidden_at'):
+                session.pop(key, None)
+            flash("⚠️ Inaktivitás miatt kijelentkeztél!", "warning")
+            return None
+        if request.endpoint != 'ping':
+            # Valódi kérés csak látható lapról jöhet
+            if hidden_at is not None:
+                session.pop('hidden_at', None)
+            if now - last_activity >= self.touch_interval or 'last_activity' not in session:
+                session['last_activity'] = now
+        if now - last_seen >= self.touch_interval or 'last_seen' not in session:
+            session['last_seen'] = now
+        return None
 
 app = Flask(__name__)
 app.secret_key = "titkoskulcs"
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=2)  # Csökkentettük 2 percre
-app.wsgi_app = SessionTimeout(app.wsgi_app, timeout=timedelta(minutes=15), ping_timeout=timedelta(seconds=30))
+session_timeout = SessionTimeout(app, timeout=timedelta(minutes=15), ping_timeout=timedelta(seconds=30))
 
 # Lokális .env betöltése, ha létezik (élesben felülírja a Railway változó)
 load_dotenv()
 
-# Firebase inicializálása környezetváltozóval
-firebase_config = os.environ.get('FIREBASE_CONFIG')
-if not firebase_config:
-    logger.error("FIREBASE_CONFIG környezetváltozó nincs beállítva!")
-    raise ValueError("FIREBASE_CONFIG környezetváltozó nincs beállítva!")
-
-try:
-    cred_data = json.loads(firebase_config)
-    cred = credentials.Certificate(cred_data)
-except json.JSONDecodeError as e:
-    logger.error(f"Hiba a Firebase konfiguráció JSON dekódolásakor: {str(e)}")
-    raise ValueError("A FIREBASE_CONFIG érvénytelen JSON formátumú!")
-except Exception as e:
-    logger.error(f"Hiba a Firebase inicializálása során: {str(e)}")
-    raise
-
-firebase_admin.initialize_app(cred)
-
-# Adatbázis kapcsolat URL a környezetváltozóból
+# Kérésszintű mérések, Prometheus formátumban a /metrics végponton. A végpont csak METRICS_TOKEN
+# megadásakor létezik, és csak "Authorization: Bearer <token>" fejléccel érhető el. SLOW_REQUEST_MS > 0 esetén az ennél lassabb
+# kéréseket lekérdezés-bontással naplózzuk. METRICS_ENABLED=0 esetén semmi sem fut: nincs
+# kérés hook, és a poolban az időmérés nélküli cursorok maradnak.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 0))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+if METRICS_ENABLED:
+    request_metrics = RequestMetrics(app, slow_request_ms=SLOW_REQUEST_MS, token=METRICS_TOKEN)
+    TUPLE_CURSOR, DICT_CURSOR, REAL_DICT_CURSOR = TimedCursor, TimedDictCursor, TimedRealDictCursor
+else:
+    request_metrics = None
+    TUPLE_CURSOR, DICT_CURSOR, REAL_DICT_CURSOR = psycopg2.extensions.cursor, psycopg2.extras.DictCursor, psycopg2.extras.RealDictCursor
+
+# Felhasználókezelés: alapesetben Firebase, USER_DIRECTORY=memory esetén memóriabeli
+# (tesztekhez, mérésekhez). A rekordokat és szerepköröket USER_CACHE_TTL másodpercig tároljuk;
+# a bejelentkezés mindig gyorsítótár nélkül ellenőriz.
+USER_DIRECTORY = os.environ.get("USER_DIRECTORY", "firebase")
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+USERS_PAGE_SIZE = int(os.environ.get("USERS_PAGE_SIZE", 50))
+
+FIREBASE_CONFIG = os.environ.get('FIREBASE_CONFIG')
+
+# Első használatkor fut (lásd LazyUserDirectory, AppStartup): a firebase_admin importja és
+# inicializálása így nem az app importját és nem az első kérést lassítja
+def create_user_directory():
+    if USER_DIRECTORY == "memory":
+        logger.warning("Memóriabeli felhasználókezelés (USER_DIRECTORY=memory), Firebase nélkül!")
+        return InMemoryUserDirectory()
+    import firebase_admin
+    from firebase_admin import auth, credentials
+    try:
+        cred = credentials.Certificate(json.loads(FIREBASE_CONFIG))
+    except Exception as e:
+        logger.error(f"Hiba a Firebase inicializálása során: {str(e)}")
+        raise
+    firebase_admin.initialize_app(cred)
+    logger.info("Firebase inicializálva.")
+    return FirebaseUserDirectory(auth, observer=request_metrics.observe_firebase if request_metrics else None)
+
+base_user_directory = LazyUserDirectory(create_user_directory)
+user_directory = CachedUserDirectory(base_user_directory, ttl=USER_CACHE_TTL)
+
+# Adatbázis kapcsolat URL a környezetváltozóból (ellenőrzés: check_config)
 DATABASE_URL = os.environ.get("DATABASE_URL")
-if not DATABASE_URL:
-    logger.error("DATABASE_URL környezetváltozó nincs beállítva!")
-    raise ValueError("DATABASE_URL környezetváltozó nincs beállítva!")
-
-# Kapcsolat pool inicializálása
-try:
-    db_pool = psycopg2.pool.SimpleConnectionPool(
-        minconn=1,
-        maxconn=5,
-        dsn=DATABASE_URL,
+
+# A kötelező beállítások ellenőrzése; a create_app() hívja, így a hibás konfiguráció
+# már induláskor kiderül, a modul importja viszont beállítások nélkül is működik
+def check_config():
+    if not DATABASE_URL:
+        logger.error("DATABASE_URL környezetváltozó nincs beállítva!")
+        raise ValueError("DATABASE_URL környezetváltozó nincs beállítva!")
+    if USER_DIRECTORY == "memory":
+        return
+    if not FIREBASE_CONFIG:
+        logger.error("FIREBASE_CONFIG környezetváltozó nincs beállítva!")
+        raise ValueError("FIREBASE_CONFIG környezetváltozó nincs beállítva!")
+    try:
+        json.loads(FIREBASE_CONFIG)
+    except json.JSONDecodeError as e:
+        logger.error(f"Hiba a Firebase konfiguráció JSON dekódolásakor: {str(e)}")
+        raise ValueError("A FIREBASE_CONFIG érvénytelen JSON formátumú!")
+
+# Kapcsolat pool (méret és időkorlátok környezetváltozóból). Létrehozáskor nem nyit
+# kapcsolatot: a workerenkénti előmelegítést az AppStartup végzi a háttérben.
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 5))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5))
+DB_POOL_IDLE_CHECK = float(os.environ.get("DB_POOL_IDLE_CHECK", 30))
+
+db_pool = ConnectionPool(
+    DATABASE_URL,
+    minconn=DB_POOL_MIN,
+    maxconn=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    idle_check=DB_POOL_IDLE_CHECK,
+    wait_observer=request_metrics.observe_pool_wait if request_metrics else None,
+    cursor_factory=DICT_CURSOR,
+    keepalives=1,
+    keepalives_idle=30,
+    keepalives_interval=10,
+    keepalives_count=5
+)
+
+# Olvasó replikák (opcionális, vesszővel elválasztott DSN-ek). Az olvasó végpontok (főoldal,
+# /api/places, export) ezekről olvasnak, ha a replika már látja a primary aktuális places
+# verzióját (lásd replica_is_fresh), különben és a replika kiesésekor a primaryről. Minden
+# más (írások, import, felhasználók) a primaryn marad.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_RETRY_AFTER = float(os.environ.get("DB_REPLICA_RETRY_AFTER", 30))
+DB_REPLICA_CONNECT_TIMEOUT = int(os.environ.get("DB_REPLICA_CONNECT_TIMEOUT", 3))
+
+replica_pools = [
+    ConnectionPool(
+        url,
+        minconn=DB_POOL_MIN,
+        maxconn=DB_POOL_MAX,
+        timeout=DB_POOL_TIMEOUT,
+        idle_check=DB_POOL_IDLE_CHECK,
+        wait_observer=request_metrics.observe_pool_wait if request_metrics else None,
+        # A friss-ellenőrzés és az olvasás ugyanabban a pillanatképben fusson
+        session_options={"isolation_level": psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ, "readonly": True},
+        cursor_factory=DICT_CURSOR,
+        connect_timeout=DB_REPLICA_CONNECT_TIMEOUT,
         keepalives=1,
         keepalives_idle=30,
         keepalives_interval=10,
         keepalives_count=5
     )
-    logger.info("Kapcsolat pool sikeresen inicializálva.")
-except Exception as e:
-    logger.error(f"Hiba a kapcsolat pool inicializálása során: {str(e)}")
-    raise
-
-# Kapcsolat lekérése a poolból újracsatlakozási logikával
-def get_db_connection(max_retries=3, retry_delay=1):
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            conn = db_pool.getconn()
-            conn.cursor_factory = psycopg2.extras.DictCursor
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT 1")
-            logger.debug("Kapcsolat sikeresen lekérve a poolból.")
-            return conn
-        except psycopg2.OperationalError as e:
-            logger.warning(f"Kapcsolódási hiba (próbálkozás {attempt + 1}/{max_retries}): {str(e)}")
-            attempt += 1
-            if attempt == max_retries:
-                logger.error(f"Kapcsolódás sikertelen {max_retries} próbálkozás után: {str(e)}")
-                raise
-            time.sleep(retry_delay)
-        except Exception as e:
-            logger.error(f"Hiba a kapcsolat lekérése során: {str(e)}")
-            raise
+    for url in DATABASE_REPLICA_URLS
+]
+
+# A replika akkor használható, ha már tartalmazza a min_version verziót. A gyorsítótár
+# kulcsa a primary verziója, így lemaradt replika adata sosem kerülhet az aktuális verzió
+# alá; és mivel az író worker a saját írása után a primaryről frissíti a verziót, a többi
+# pedig a NOTIFY-ból értesül, az író munkamenet (és bárki más) visszaolvassa az írást.
+def replica_is_fresh(conn, min_version):
+    with conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+        cursor.execute("SELECT version FROM places_version")
+        return cursor.fetchone()[0] >= min_version
+
+read_db = ReadRouter(db_pool, replica_pools, is_fresh=replica_is_fresh, retry_after=DB_REPLICA_RETRY_AFTER)
+
+# Végpontonkénti statement_timeout (ms, 0 = nincs korlát): az interaktív oldalak gyorsan
+# hibáznak egy elszabadult lekérdezésnél, az export hosszabb keretet kap, de nem
+# futhat korlátlanul. A többi végpont és a háttérszálak a szerver alapértékét használják.
+READ_STATEMENT_TIMEOUT_MS = int(os.environ.get("READ_STATEMENT_TIMEOUT_MS", 10000))
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.environ.get("EXPORT_STATEMENT_TIMEOUT_MS", 300000))
+STATEMENT_TIMEOUTS_MS = {
+    "index": READ_STATEMENT_TIMEOUT_MS,
+    "api_places": READ_STATEMENT_TIMEOUT_MS,
+    "export_csv": EXPORT_STATEMENT_TIMEOUT_MS,
+}
+
+def statement_timeout():
+    return STATEMENT_TIMEOUTS_MS.get(request.endpoint) if has_request_context() else None
+
+def pool_metrics():
+    stats = db_pool.stats()
+    metrics = [
+        ("db_pool_connections", "gauge", "Nyitott pool kapcsolatok.", stats["size"]),
+        ("db_pool_connections_in_use", "gauge", "Kiadott pool kapcsolatok.", stats["in_use"]),
+        ("db_pool_checkouts_total", "counter", "Kapcsolat kiadások.", stats["checkouts"]),
+        ("db_pool_waits_total", "counter", "Várakozással járó kiadások.", stats["waits"]),
+        ("db_pool_timeouts_total", "counter", "Időtúllépéssel elutasított kiadások.", stats["timeouts"]),
+        ("db_pool_broken_total", "counter", "Eldobott hibás kapcsolatok.", stats["broken"]),
+    ]
+    if replica_pools:
+        replicas = read_db.replicas.stats()
+        metrics += [
+            ("db_replica_reads_total", "counter", "Replikáról kiszolgált olvasások.", replicas["replica_reads"]),
+            ("db_replica_primary_reads_total", "counter", "Primaryre terelt olvasások (nincs elérhető vagy elég friss replika).", replicas["primary_reads"]),
+            ("db_replica_lagging_total", "counter", "Lemaradás miatt kihagyott replika kapcsolatok.", replicas["lagging"]),
+            ("db_replica_failures_total", "counter", "Replika kiesések (kapcsolati hibák).", replicas["failures"]),
+            ("db_replicas_down", "gauge", "Forgásból épp kivett replikák.", replicas["down"]),
+        ]
+    return metrics
+
+if request_metrics:
+    request_metrics.add_collector(pool_metrics)
+
+# Kapcsolat a poolból: `with db_connection() as conn:`; a kapcsolat a blokk végén
+# visszakerül a poolba, a lezáratlan tranzakció visszagörgetődik
+def db_connection():
+    return db_pool.connection(statement_timeout=statement_timeout())
 
-def release_db_connection(conn):
+# Az olvasó végpontok kapcsolata (replika vagy primary, lásd read_db)
+def read_connection(min_version):
+    return read_db.connection(min_version, statement_timeout())
+
+# Kézi kezeléshez (pl. streamelt válasz, ahol a kapcsolat túléli a view függvényt)
+def get_db_connection():
+    return db_pool.getconn(statement_timeout=statement_timeout())
+
+def release_db_connection(conn, pool=db_pool):
     try:
-        db_pool.putconn(conn)
+        pool.putconn(conn)
     except Exception as e:
         logger.error(f"Hiba a kapcsolat visszahelyezése során: {str(e)}")
 
+# Olvasó kapcsolat kézi kezeléshez: (pool, kapcsolat), visszaadás: release_db_connection(conn, pool)
+def get_read_connection(min_version):
+    return read_db.getconn(min_version, statement_timeout())
+
+# Térképes klaszterezés (/api/places/clusters): zoom szintenként egy rács, amelynek
+# cellái CLUSTER_CELLS_PER_TILE x CLUSTER_CELLS_PER_TILE részre osztanak egy térképcsempét
+# (a z szinten 360 / (2^z * CLUSTER_CELLS_PER_TILE) fokos cellák, mindkét tengelyen).
+# A cellák összesítéseit (darab, koordinátaösszeg, néhány minta id) CLUSTER_INDEX_MAX_ZOOM
+# szintig a places_clusters tábla tárolja, amit utasításszintű triggerek frissítenek
+# (lásd SCHEMA_MIGRATIONS). Mélyebb zoomon a cellák már jórészt egy-egy helyet tartalmaznak
+# (a tábla mérete és az írások költsége helyenként nőne), a nézetbe pedig kevés hely esik,
+# így ott a cellákat lekérdezéskor a GiST pont index alapján csoportosítjuk.
+# Az index beállításai a tárolt cellákat határozzák meg; módosításuk után a
+# places_clusters táblát üríteni kell (TRUNCATE), a következő indulás újraépíti.
+CLUSTER_INDEX_MAX_ZOOM = 12
+CLUSTER_MAX_ZOOM = 20
+CLUSTER_CELLS_PER_TILE = 4
+CLUSTER_SAMPLE_SIZE = 5
+
+# Séma kiegészítések (indexek), amelyeket az alkalmazás maga tart karban.
+# Minden utasítás idempotens; a tanácsadó zár miatt a párhuzamosan induló workerek nem ütköznek.
+SCHEMA_LOCK_ID = 7412001
+SCHEMA_MIGRATIONS = [
+    # Kulcsalapú lapozás és rendezés az /api/places végponthoz
+    "CREATE INDEX IF NOT EXISTS places_name_id_idx ON places (name, id)",
+    # Térbeli index a /api/places/bbox és /api/places/nearest végpontokhoz (PostGIS nélkül)
+    "CREATE INDEX IF NOT EXISTS places_point_gist_idx ON places USING gist (point(east, north))",
+    # A koordinátánkénti egyediség téves ütközést adott (két, egymástól távoli hely azonos
+    # szélességen), a valódi duplikátumokat (pár méterre lévő pontok) pedig nem fogta meg;
+    # helyette a közeli, hasonló nevű helyeket szűrjük (lásd dedup.py)
+    "ALTER TABLE places DROP CONSTRAINT IF EXISTS places_east_key",
+    "ALTER TABLE places DROP CONSTRAINT IF EXISTS places_north_key",
+    "DROP INDEX IF EXISTS places_east_key",
+    "DROP INDEX IF EXISTS places_north_key",
+    # Ékezetfüggetlen keresés: kisbetűsítés és a magyar (és a régi Latin-2 exportokban
+    # előforduló õ/û) ékezetes betűk levágása, az unaccent kiterjesztés nélkül.
+    # A korábbi változat célkarakterei egy "o"-val hosszabbak voltak (az ú-tól kezdve
+    # minden betű eggyel elcsúszott); az arra épült keresőindexet eldobjuk, az opcionális
+    # lépés a javított függvénnyel újraépíti.
+    """DO $do$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'places_fold' AND prosrc LIKE '%iiiiooooooouuuuuc%') THEN
+                DROP INDEX IF EXISTS places_search_trgm_idx;
+            END IF;
+        END $do$""",
+    """CREATE OR REPLACE FUNCTION places_fold(value text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT translate(lower(coalesce(value, '')), 'áàâäãéèêëíìîïóòôöõőúùûüűç', 'aaaaaeeeeiiiioooooouuuuuc') $$""",
+    """CREATE OR REPLACE FUNCTION places_search_text(name text, address text, notes text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT places_fold(name) || ' ' || places_fold(address) || ' ' || places_fold(notes) $$""",
+    # Verziószámláló: minden írás után nő, és NOTIFY-jal értesíti az összes workert
+    """CREATE TABLE IF NOT EXISTS places_version (
+        id boolean PRIMARY KEY DEFAULT true CHECK (id),
+        version bigint NOT NULL,
+        updated_at timestamptz NOT NULL
+    )""",
+    "INSERT INTO places_version (id, version, updated_at) VALUES (true, 1, now()) ON CONFLICT (id) DO NOTHING",
+    """CREATE OR REPLACE FUNCTION places_bump_version() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            new_version bigint;
+            changed_at timestamptz;
+        BEGIN
+            UPDATE places_version SET version = version + 1, updated_at = now()
+            RETURNING version, updated_at INTO new_version, changed_at;
+            PERFORM pg_notify('places_changed', new_version || ' ' || extract(epoch FROM changed_at));
+            RETURN NULL;
+        END
+        $$""",
+    "DROP TRIGGER IF EXISTS places_bump_version ON places",
+    """CREATE TRIGGER places_bump_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON places
+        FOR EACH STATEMENT EXECUTE FUNCTION places_bump_version()""",
+    # Delta szinkron: minden sor a legutóbbi módosító tranzakció azonosítójával (xid8) és
+    # idejével; a törölt helyek azonosítója a places_tombstones táblába kerül. Mindkettőt
+    # trigger tartja karban, így minden író (hozzáadás, szerkesztés, törlés, import) lefedett.
+    "ALTER TABLE places ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now()",
+    "ALTER TABLE places ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT pg_current_xact_id()",
+    "CREATE INDEX IF NOT EXISTS places_change_idx ON places (change_xid, id)",
+    """CREATE TABLE IF NOT EXISTS places_tombstones (
+        id integer PRIMARY KEY,
+        deleted_at timestamptz NOT NULL DEFAULT now(),
+        change_xid xid8 NOT NULL DEFAULT pg_current_xact_id()
+    )""",
+    "CREATE INDEX IF NOT EXISTS places_tombstones_change_idx ON places_tombstones (change_xid, id)",
+    """CREATE OR REPLACE FUNCTION places_touch() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            NEW.updated_at := now();
+            NEW.change_xid := pg_current_xact_id();
+            RETURN NEW;
+        END
+        $$""",
+    "DROP TRIGGER IF EXISTS places_touch ON places",
+    """CREATE TRIGGER places_touch
+        BEFORE UPDATE ON places
+        FOR EACH ROW EXECUTE FUNCTION places_touch()""",
+    """CREATE OR REPLACE FUNCTION places_tombstone() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            INSERT INTO places_tombstones (id) VALUES (OLD.id)
+            ON CONFLICT (id) DO UPDATE SET deleted_at = now(), change_xid = pg_current_xact_id();
+            RETURN NULL;
+        END
+        $$""",
+    "DROP TRIGGER IF EXISTS places_tombstone ON places",
+    """CREATE TRIGGER places_tombstone
+        AFTER DELETE ON places
+        FOR EACH ROW EXECUTE FUNCTION places_tombstone()""",
+    # Klaszter összesítések zoom szintenként (lásd CLUSTER_INDEX_MAX_ZOOM). Minden írás csak az
+    # érintett cellákat frissíti: az utasításszintű triggerek az átmeneti táblákból
+    # (new_rows / old_rows) cellánként egyetlen upsertet végeznek, így egy import darab
+    # is soronkénti munka nélkül kerül bele.
+    """CREATE TABLE IF NOT EXISTS places_clusters (
+        zoom smallint NOT NULL,
+        cx integer NOT NULL,
+        cy integer NOT NULL,
+        count integer NOT NULL,
+        sum_east double precision NOT NULL,
+        sum_north double precision NOT NULL,
+        sample_ids integer[] NOT NULL,
+        PRIMARY KEY (zoom, cx, cy)
+    )""",
+    # Egy pont cellái az összes zoom szinten; cx a hosszúság (north), cy a szélesség (east) szerinti index
+    f"""CREATE OR REPLACE FUNCTION places_cluster_keys(east double precision, north double precision)
+        RETURNS TABLE (zoom smallint, cx integer, cy integer)
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT z::smallint, floor(north / size)::integer, floor(east / size)::integer
+              FROM generate_series(0, {CLUSTER_INDEX_MAX_ZOOM}) z, LATERAL (SELECT 360.0 / ({CLUSTER_CELLS_PER_TILE} * 2 ^ z) AS size) s $$""",
+    f"""CREATE OR REPLACE FUNCTION places_clusters_add(added_ids integer[], added_east double precision[], added_north double precision[])
+        RETURNS void
+        LANGUAGE sql
+        AS $$
+            INSERT INTO places_clusters AS c (zoom, cx, cy, count, sum_east, sum_north, sample_ids)
+            SELECT k.zoom, k.cx, k.cy, count(*), sum(p.east), sum(p.north), (array_agg(p.id ORDER BY p.id))[1:{CLUSTER_SAMPLE_SIZE}]
+            FROM unnest(added_ids, added_east, added_north) AS p(id, east, north), places_cluster_keys(p.east, p.north) k
+            GROUP BY k.zoom, k.cx, k.cy
+            ORDER BY k.zoom, k.cx, k.cy
+            ON CONFLICT (zoom, cx, cy) DO UPDATE SET
+                count = c.count + EXCLUDED.count,
+                sum_east = c.sum_east + EXCLUDED.sum_east,
+                sum_north = c.sum_north + EXCLUDED.sum_north,
+                -- Egy mozgató UPDATE-nél a törlés mintapótlása már a cellába érkezett helyeket is
+                -- láthatta, ezért csak a még nem szereplő azonosítókat fűzzük hozzá
+                sample_ids = (c.sample_ids || ARRAY(
+                    SELECT id FROM unnest(EXCLUDED.sample_ids) id WHERE id <> ALL (c.sample_ids)))[1:{CLUSTER_SAMPLE_SIZE}]
+        $$""",
+    # Törlés után az érintett cellák közül az üresek eltűnnek, a megfogyott minták a cella
+    # helyeiből (GiST pont index) töltődnek fel újra. A cellákat előbb kulcs szerinti
+    # sorrendben zároljuk (mint a places_clusters_add upsertje), így a párhuzamos írások
+    # nem kerülnek holtpontba.
+    f"""CREATE OR REPLACE FUNCTION places_clusters_remove(removed_ids integer[], removed_east double precision[], removed_north double precision[])
+        RETURNS void
+        LANGUAGE sql
+        AS $$
+            SELECT 1 FROM places_clusters c
+            WHERE (c.zoom, c.cx, c.cy) IN (
+                SELECT k.zoom, k.cx, k.cy
+                FROM unnest(removed_east, removed_north) AS p(east, north), places_cluster_keys(p.east, p.north) k
+            )
+            ORDER BY c.zoom, c.cx, c.cy
+            FOR UPDATE;
+            UPDATE places_clusters c SET
+                count = c.count - d.removed,
+                sum_east = c.sum_east - d.sum_east,
+                sum_north = c.sum_north - d.sum_north,
+                sample_ids = ARRAY(SELECT id FROM unnest(c.sample_ids) id WHERE id <> ALL (d.ids))
+            FROM (
+                SELECT k.zoom, k.cx, k.cy, count(*) AS removed, sum(p.east) AS sum_east, sum(p.north) AS sum_north, array_agg(p.id) AS ids
+                FROM unnest(removed_ids, removed_east, removed_north) AS p(id, east, north), places_cluster_keys(p.east, p.north) k
+                GROUP BY k.zoom, k.cx, k.cy
+            ) d
+            WHERE c.zoom = d.zoom AND c.cx = d.cx AND c.cy = d.cy;
+            DELETE FROM places_clusters c
+            USING unnest(removed_east, removed_north) AS p(east, north), places_cluster_keys(p.east, p.north) k
+            WHERE c.zoom = k.zoom AND c.cx = k.cx AND c.cy = k.cy AND c.count <= 0;
+            UPDATE places_clusters c SET sample_ids = ARRAY(
+                SELECT p.id FROM places p, LATERAL (SELECT 360.0 / ({CLUSTER_CELLS_PER_TILE} * 2 ^ c.zoom) AS size) s
+                WHERE point(p.east, p.north) <@ box(point(c.cy * s.size, c.cx * s.size), point((c.cy + 1) * s.size, (c.cx + 1) * s.size))
+                    AND floor(p.north / s.size) = c.cx AND floor(p.east / s.size) = c.cy
+                ORDER BY p.id
+                LIMIT {CLUSTER_SAMPLE_SIZE}
+            )
+            FROM (
+                SELECT DISTINCT k.zoom, k.cx, k.cy
+                FROM unnest(removed_east, removed_north) AS p(east, north), places_cluster_keys(p.east, p.north) k
+            ) d
+            WHERE c.zoom = d.zoom AND c.cx = d.cx AND c.cy = d.cy AND cardinality(c.sample_ids) < least(c.count, {CLUSTER_SAMPLE_SIZE});
+        $$""",
+    """CREATE OR REPLACE FUNCTION places_clusters_sync() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM places_clusters_add(array_agg(id), array_agg(east), array_agg(north)) FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM places_clusters_remove(array_agg(id), array_agg(east), array_agg(north)) FROM old_rows;
+            ELSIF TG_OP = 'TRUNCATE' THEN
+                TRUNCATE places_clusters;
+            ELSE
+                -- Csak az elmozdult helyek számítanak
+                PERFORM places_clusters_remove(array_agg(o.id), array_agg(o.east), array_agg(o.north))
+                FROM old_rows o JOIN new_rows n ON n.id = o.id
+                WHERE o.east IS DISTINCT FROM n.east OR o.north IS DISTINCT FROM n.north;
+                PERFORM places_clusters_add(array_agg(n.id), array_agg(n.east), array_agg(n.north))
+                FROM old_rows o JOIN new_rows n ON n.id = o.id
+                WHERE o.east IS DISTINCT FROM n.east OR o.north IS DISTINCT FROM n.north;
+            END IF;
+            RETURN NULL;
+        END
+        $$""",
+    "DROP TRIGGER IF EXISTS places_clusters_insert ON places",
+    """CREATE TRIGGER places_clusters_insert
+        AFTER INSERT ON places REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION places_clusters_sync()""",
+    "DROP TRIGGER IF EXISTS places_clusters_update ON places",
+    """CREATE TRIGGER places_clusters_update
+        AFTER UPDATE ON places REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION places_clusters_sync()""",
+    "DROP TRIGGER IF EXISTS places_clusters_delete ON places",
+    """CREATE TRIGGER places_clusters_delete
+        AFTER DELETE ON places REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION places_clusters_sync()""",
+    # A TRUNCATE places sorszintű adatot nem ad át, a cellák ilyenkor együtt ürülnek
+    "DROP TRIGGER IF EXISTS places_clusters_truncate ON places",
+    """CREATE TRIGGER places_clusters_truncate
+        AFTER TRUNCATE ON places
+        FOR EACH STATEMENT EXECUTE FUNCTION places_clusters_sync()""",
+    # Első feltöltés (új tábla, vagy TRUNCATE után); utána a triggerek tartják karban
+    """SELECT places_clusters_add(array_agg(id), array_agg(east), array_agg(north)) FROM places
+        WHERE NOT EXISTS (SELECT 1 FROM places_clusters)""",
+    # Háttérben futó CSV importok állapota; a records_done a már véglegesített CSV rekordok
+    # száma, innen folytatódik egy megszakadt import
+    """CREATE TABLE IF NOT EXISTS import_jobs (
+        id text PRIMARY KEY,
+        status text NOT NULL DEFAULT 'queued',
+        filename text,
+        path text NOT NULL,
+        created_by text,
+        claimed_by text,
+        heartbeat_at timestamptz NOT NULL DEFAULT now(),
+        created_at timestamptz NOT NULL DEFAULT now(),
+        finished_at timestamptz,
+        total_bytes bigint NOT NULL DEFAULT 0,
+        bytes_done bigint NOT NULL DEFAULT 0,
+        records_done integer NOT NULL DEFAULT 0,
+        imported integer NOT NULL DEFAULT 0,
+        duplicates integer NOT NULL DEFAULT 0,
+        errors integer NOT NULL DEFAULT 0,
+        duplicate_samples text[] NOT NULL DEFAULT '{}',
+        error_samples text[] NOT NULL DEFAULT '{}',
+        message text
+    )""",
+    "CREATE INDEX IF NOT EXISTS import_jobs_pending_idx ON import_jobs (heartbeat_at) WHERE status IN ('queued', 'running')",
+]
+
+# Olyan kiegészítések, amelyek nélkül is működik az alkalmazás (pl. hiányzó kiterjesztés,
+# vagy a régi adatokban már meglévő duplikátum miatt nem létrehozható egyedi index).
+# Csoportonként futnak: egy csoport hibája csak figyelmeztetést ad, és a csoport
+# további lépéseit kihagyja, a többi csoportot nem.
+OPTIONAL_SCHEMA_MIGRATIONS = [
+    [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS places_search_trgm_idx ON places USING gin (places_search_text(name, address, notes) gin_trgm_ops)",
+    ],
+    # Az egyediséget az adatbázis biztosítja; az indexnevek a UNIQUE oszlop-megszorítások
+    # alapértelmezett nevei, így egy korábban így létrehozott tábla esetén nem jön létre új index
+    ["CREATE UNIQUE INDEX IF NOT EXISTS places_name_key ON places (name)"],
+]
+
+# Egyedi index neve -> ütköző mező
+UNIQUE_CONSTRAINT_FIELDS = {"places_name_key": "name"}
+# Azok a mezők, amelyek egyediségét index biztosítja (ensure_schema tölti ki); a többire
+# az írások előtt továbbra is az alkalmazás ellenőriz
+unique_place_fields = frozenset()
+
+# Saját, rövid életű kapcsolattal fut (nem a poolból), így gunicorn --preload esetén
+# a master folyamat egyszer lefuttatja, és nem marad nála örökölhető pool kapcsolat
+# True, ha a séma naprakész; adatbázis hibánál False (az AppStartup később újrapróbálja)
+def ensure_schema():
+    conn = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+                for statement in SCHEMA_MIGRATIONS:
+                    cursor.execute(statement)
+                for group in OPTIONAL_SCHEMA_MIGRATIONS:
+                    cursor.execute("SAVEPOINT optional_migration")
+                    try:
+                        for statement in group:
+                            cursor.execute(statement)
+                    except psycopg2.Error as e:
+                        logger.warning(f"Opcionális séma lépés kihagyva: {str(e).strip()}")
+                        cursor.execute("ROLLBACK TO SAVEPOINT optional_migration")
+                        continue
+                    cursor.execute("RELEASE SAVEPOINT optional_migration")
+                cursor.execute("""
+                    SELECT i.relname FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+                    WHERE x.indrelid = 'places'::regclass AND x.indisunique AND x.indisvalid AND i.relname = ANY(%s)
+                """, (list(UNIQUE_CONSTRAINT_FIELDS),))
+                unique_indexes = {row[0] for row in cursor.fetchall()}
+        global unique_place_fields
+        unique_place_fields = frozenset(UNIQUE_CONSTRAINT_FIELDS[index] for index in unique_indexes)
+        missing = [field for field in UNIQUE_CONSTRAINT_FIELDS.values() if field not in unique_place_fields]
+        if missing:
+            logger.error(f"Hiányzó egyedi index (meglévő duplikátumok?): {', '.join(missing)}; ezekre alkalmazásoldali ellenőrzés fut")
+        logger.info("Adatbázis séma ellenőrizve.")
+        return True
+    except psycopg2.Error as e:
+        logger.error(f"Hiba a séma frissítése során: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+# A places tábla verziója. Egy háttérszál LISTEN places_changed-del követi a többi
+# worker (és a többi gunicorn folyamat) írásait, így a verzió lekérdezése nem igényel
+# adatbázis kört. Ha a figyelő kapcsolat nem él, vagy ez a worker épp írt, a verziót
+# egyetlen lekérdezéssel frissítjük.
+PLACES_LISTEN_POLL = 60
+
+class PlacesVersion:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.version = None
+        self.updated_at = None
+        self.live = False
+        self.stale = True
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def current(self):
+        cached = self.cached()
+        if cached is not None:
+            return cached
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT version, updated_at FROM places_version")
+                version, updated_at = cursor.fetchone()
+            conn.commit()
+        return self.refreshed(version, updated_at)
+
+    # A memóriában tartott verzió, ha adatbázis kör nélkül megbízható, különben None.
+    # Az aszinkron kiszolgálás (asgi.py) ezzel és a refreshed()-del a saját driverén kérdez le.
+    def cached(self):
+        self._ensure_listener()
+        if self.live and not self.stale and self.version is not None:
+            return self.version, self.updated_at
+        return None
+
+    def refreshed(self, version, updated_at):
+        self._update(version, updated_at)
+        self.stale = False
+        return self.version, self.updated_at
+
+    def mark_stale(self):
+        self.stale = True
+
+    def _update(self, version, updated_at):
+        with self._lock:
+            if self.version is None or version > self.version:
+                self.version = version
+                self.updated_at = updated_at
+
+    def _ensure_listener(self):
+        # gunicorn fork után a szál nem öröklődik, ezért folyamatonként indítjuk. A zár alatti
+        # újraellenőrzés miatt egyszerre érkező kérések sem indítanak több figyelőt.
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self.live = False
+                self._thread = threading.Thread(target=self._listen, name="places-listener", daemon=True)
+                self._thread.start()
+
+    def after_fork(self):
+        # A szülő figyelő szála fork közben fogva tarthatta a zárat
+        self._lock = threading.Lock()
+
+    def _listen(self):
+        retry_delay = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=5)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("LISTEN places_changed")
+                    # A LISTEN után olvasott verzió miatt nem maradhat ki értesítés
+                    cursor.execute("SELECT version, updated_at FROM places_version")
+                    self._update(*cursor.fetchone())
+                self.live = True
+                retry_delay = 1
+                logger.debug("Places verzió figyelő elindult.")
+                while True:
+                    if select.select([conn], [], [], PLACES_LISTEN_POLL) == ([], [], []):
+                        with conn.cursor() as cursor:
+                            cursor.execute("SELECT 1")  # halott kapcsolat felismerése
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        version, epoch = conn.notifies.pop(0).payload.split()
+                        self._update(int(version), datetime.fromtimestamp(float(epoch), UTC))
+            except Exception as e:
+                self.live = False
+                logger.warning(f"Places verzió figyelő hiba, újrapróbálás {retry_delay} mp múlva: {str(e)}")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 60)
+            finally:
+                if conn:
+                    conn.close()
+
+places_version = PlacesVersion(DATABASE_URL)
+os.register_at_fork(after_in_child=places_version.after_fork)
+
+# Verzióhoz kötött, LRU jellegű gyorsítótár a lekérdezett helylistákhoz
+PLACES_CACHE_SIZE = int(os.environ.get("PLACES_CACHE_SIZE", 256))
+
+class PlacesCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+places_cache = PlacesCache(PLACES_CACHE_SIZE)
+
+# Az írási útvonalak commit után hívják: a saját írást a következő olvasás már látja,
+# a többi worker a NOTIFY-ból értesül
+def mark_places_changed():
+    places_version.mark_stale()
+
+def cached_places_page(fields, limit=None, after=None, q=""):
+    version, _ = places_version.current()
+    key = ("page", fields, limit, after, q)
+    page = places_cache.get(key, version)
+    if page is None:
+        with read_connection(version) as conn:
+            page = fetch_places_page(conn, fields, limit, after, q)
+        places_cache.put(key, version, page)
+    return page
+
+# Memóriabeli térbeli index (GEO_BACKEND=memory), a places verzióval együtt frissül
+GEO_BACKEND = os.environ.get("GEO_BACKEND", "db")
+_geo_index = None
+_geo_index_lock = threading.Lock()
+
+def get_geo_index():
+    global _geo_index
+    version, _ = places_version.current()
+    with _geo_index_lock:
+        if _geo_index and _geo_index[0] == version:
+            return _geo_index[1]
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+                cursor.execute("SELECT id, east, north, name FROM places")
+                index = GridIndex(cursor.fetchall())
+        _geo_index = (version, index)
+        logger.debug(f"Térbeli index újraépítve: {len(index)} hely")
+        return index
+
+# A helyek koordinátái tömbökben (távolságmátrix, útvonal), a places verzióval együtt frissül.
+# Csak az útvonal végpontok első hívásakor töltődik be; 1 000 000 helyen kb. 20 MB workerenként.
+_place_coordinates = None
+_place_coordinates_lock = threading.Lock()
+
+def get_place_coordinates():
+    global _place_coordinates
+    version, _ = places_version.current()
+    with _place_coordinates_lock:
+        if _place_coordinates and _place_coordinates[0] == version:
+            return _place_coordinates[1]
+        with read_connection(version) as conn, conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+            cursor.execute("SELECT id, east, north FROM places")
+            rows = cursor.fetchall()
+        coordinates = PlaceCoordinates(*zip(*rows)) if rows else PlaceCoordinates([], [], [])
+        _place_coordinates = (version, coordinates)
+        logger.debug(f"Koordináta pillanatkép újraépítve: {len(coordinates)} hely")
+        return coordinates
+
 def is_valid_coordinate(value, is_longitude=False):
     if not re.match(r"^-?\d{1,2}(\.\d{1,7})?$", value):
         return False
@@ -132,29 +789,462 @@ def is_valid_coordinate(value, is_longitude=False):
     else:
         return -90 <= num <= 90    # Észak (latitude)
 
+# Tömeges import: COPY egy ideiglenes staging táblába, halmazalapú duplikátumszűrés, majd
+# egyetlen INSERT ... SELECT; a lekérdezések száma nem függ a sorok számától. Commit nélkül,
+# hogy a háttérben futó import a saját állapotát ugyanabban a tranzakcióban rögzíthesse
+def import_rows(cursor, rows):
+    # A pandas importja több száz ms, ezért csak az első importnál töltjük be
+    from import_validation import IMPORT_CONFLICT_LABELS, describe_near_duplicate, in_file_conflicts
+    if not rows:
+        return 0, []
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((row[0], row[1], repr(row[2]), repr(row[3]), row[4], row[5]))
+    buffer.seek(0)
+    cursor.execute("""
+        CREATE TEMP TABLE import_staging (
+            lineno integer PRIMARY KEY,
+            name text,
+            east double precision,
+            north double precision,
+            address text,
+            notes text,
+            conflict text,
+            conflict_value text
+        ) ON COMMIT DROP
+    """)
+    # CSV formátumban az üres mező NULL lenne; a szöveges mezők (mint az egyedi felvételnél) üres szövegek
+    cursor.copy_expert("COPY import_staging (lineno, name, east, north, address, notes) FROM STDIN "
+                       "WITH (FORMAT csv, FORCE_NOT_NULL (name, address, notes))", buffer)
+    cursor.execute("ANALYZE import_staging")
+    # Ütközés a meglévő helyekkel (hash join, soronkénti lekérdezés nélkül)
+    cursor.execute("""
+        UPDATE import_staging s SET conflict = 'name', conflict_value = s.name
+        FROM places p
+        WHERE s.conflict IS NULL AND p.name = s.name
+    """)
+    mark_near_duplicates(cursor, describe_near_duplicate)
+    # Fájlon belüli ütközések a meglévő helyekkel nem ütköző sorok között, lineno sorrendben,
+    # mindig csak a megtartott sorokhoz mérve (mint a régi, soronként beszúró import): így egy
+    # később elutasított sor nem szorít ki egy utána jövő érvényes sort
+    cursor.execute("SELECT lineno, name, east, north FROM import_staging WHERE conflict IS NULL ORDER BY lineno")
+    conflicts = in_file_conflicts(cursor.fetchall(), DEDUP_RADIUS_M, DEDUP_NAME_SIMILARITY)
+    if conflicts:
+        linenos, fields, values = (list(column) for column in zip(*conflicts))
+        cursor.execute("""
+            UPDATE import_staging s SET conflict = d.field, conflict_value = d.value
+            FROM unnest(%s::integer[], %s::text[], %s::text[]) AS d(lineno, field, value)
+            WHERE s.lineno = d.lineno
+        """, (linenos, fields, values))
+    cursor.execute("SELECT count(*) FROM import_staging WHERE conflict IS NULL")
+    candidate_count = cursor.fetchone()[0]
+    # Az ellenőrzés óta egy másik admin felvehetett ütköző helyet; az egyedi indexek
+    # miatt ezeket a sorokat kihagyjuk, nem buktatják el a teljes importot
+    cursor.execute("""
+        INSERT INTO places (name, east, north, address, notes)
+        SELECT name, east, north, address, notes
+        FROM import_staging
+        WHERE conflict IS NULL
+        ORDER BY lineno
+        ON CONFLICT DO NOTHING
+    """)
+    imported_count = cursor.rowcount
+    cursor.execute("SELECT conflict, conflict_value FROM import_staging WHERE conflict IS NOT NULL ORDER BY lineno")
+    duplicate_entries = [f"{IMPORT_CONFLICT_LABELS[conflict]}: {value}" for conflict, value in cursor.fetchall()]
+    if imported_count < candidate_count:
+        logger.warning(f"Tömeges import: {candidate_count - imported_count} sor párhuzamos írás miatt ütközött")
+        duplicate_entries.append(f"Időközben felvett ütköző hely: {candidate_count - imported_count} sor")
+    return imported_count, duplicate_entries
+
+# A staging sorok közeli, hasonló nevű párjai a meglévő helyek között. A jelölteket egy
+# lekérdezés adja (soronként a GiST pont index befoglaló téglalapja, mint a bounding_box-ban),
+# a döntést a dedup modul hozza, az eredmény egy UPDATE-tel kerül vissza.
+def mark_near_duplicates(cursor, describe):
+    cursor.execute("""
+        SELECT s.lineno, s.name, s.east, s.north, p.id, p.east, p.north, p.name
+        FROM import_staging s
+        JOIN places p ON point(p.east, p.north) <@ box(
+            point(s.east - %(d)s, s.north - %(d)s / greatest(cos(radians(least(90, abs(s.east) + %(d)s))), 1e-6)),
+            point(s.east + %(d)s, s.north + %(d)s / greatest(cos(radians(least(90, abs(s.east) + %(d)s))), 1e-6)))
+        WHERE s.conflict IS NULL
+        ORDER BY s.lineno
+    """, {"d": DEDUP_RADIUS_M / METERS_PER_DEGREE})
+    candidates = {}
+    for lineno, name, east, north, *place in cursor.fetchall():
+        candidates.setdefault((lineno, name, east, north), []).append(place)
+    linenos, values = [], []
+    for (lineno, name, east, north), places in candidates.items():
+        matches = find_duplicates(name, east, north, places, DEDUP_RADIUS_M, DEDUP_NAME_SIMILARITY)
+        if matches:
+            distance, _, place = matches[0]
+            linenos.append(lineno)
+            values.append(describe(name, place[3], distance))
+    if linenos:
+        cursor.execute("""
+            UPDATE import_staging s SET conflict = 'near', conflict_value = d.value
+            FROM unnest(%s::integer[], %s::text[]) AS d(lineno, value)
+            WHERE s.lineno = d.lineno
+        """, (linenos, values))
+
+IMPORT_UPLOAD_DIR = os.environ.get("IMPORT_UPLOAD_DIR", "uploads")
+IMPORT_MAX_MB = int(os.environ.get("IMPORT_MAX_MB", 512))
+IMPORT_CHUNK_ROWS = int(os.environ.get("IMPORT_CHUNK_ROWS", 5000))
+IMPORT_WORKERS = int(os.environ.get("IMPORT_WORKERS", 1))
+IMPORT_STALE_AFTER = 120  # ennyi másodperc szívverés nélkül egy másik folyamat átveheti a feladatot
+IMPORT_POLL_INTERVAL = 30
+IMPORT_SAMPLE_LIMIT = 100  # ennyi duplikátum / hibás sor kerül el a státusz oldalra
+IMPORT_JOB_RETENTION_DAYS = 30
+app.config["MAX_CONTENT_LENGTH"] = IMPORT_MAX_MB * 1024 * 1024
+
+# Háttérben futó CSV importok. A feltöltés csak elmenti a fájlt és felvesz egy import_jobs
+# sort, a feldolgozás egy szálkészletben, IMPORT_CHUNK_ROWS rekordos darabokban fut.
+# Minden darab beszúrása és a feladat előrehaladása egy tranzakcióban véglegesül, így
+# egy újraindítás után a feladat pontosan az utolsó véglegesített darab után folytatódik.
+# A feladatot a claimed_by folyamat viszi; ha annak szívverése IMPORT_STALE_AFTER
+# másodpercnél régebbi (pl. újraindult a worker), egy másik folyamat átveszi.
+class ImportJobRunner:
+    def __init__(self, workers=1, chunk_rows=5000, poll_interval=30, stale_after=120):
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.owner = None
+        self._pid = None
+        self._executor = None
+        self._active = set()
+        self._lock = threading.Lock()
+
+    # Folyamatonként egyszer indul (a gunicorn fork után is), mint a PlacesVersion figyelője
+    # Ebben a folyamatban már elindultak-e a workerenkénti erőforrások
+    @property
+    def started(self):
+        return self._pid == os.getpid()
+
+    def ensure_started(self):
+        if self.started:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.owner = f"{socket.gethostname()}:{self._pid}"
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import-job")
+            self._active = set()
+            threading.Thread(target=self._recover_loop, name="import-job-recovery", daemon=True).start()
+
+    def submit(self, filename, path, created_by):
+        self.ensure_started()
+        job_id = uuid.uuid4().hex
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO import_jobs (id, filename, path, created_by, claimed_by, total_bytes)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (job_id, filename, path, created_by, self.owner, os.path.getsize(path)))
+            conn.commit()
+        self._schedule(job_id)
+        return job_id
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _recover_loop(self):
+        while True:
+            try:
+                for job_id in self._claim_stale():
+                    logger.info(f"Megszakadt import átvéve: {job_id}")
+                    self._schedule(job_id)
+            except Exception as e:
+                logger.error(f"Hiba a megszakadt importok keresése során: {str(e)}")
+            time.sleep(self.poll_interval)
+
+    def _claim_stale(self):
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE import_jobs SET claimed_by = %s, heartbeat_at = now()
+                    WHERE id IN (
+                        SELECT id FROM import_jobs
+                        WHERE status IN ('queued', 'running') AND heartbeat_at < now() - make_interval(secs => %s)
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id
+                """, (self.owner, self.stale_after))
+                job_ids = [row[0] for row in cursor.fetchall()]
+                cursor.execute("DELETE FROM import_jobs WHERE finished_at < now() - make_interval(days => %s)", (IMPORT_JOB_RETENTION_DAYS,))
+            conn.commit()
+        return job_ids
+
+    def _run(self, job_id):
+        try:
+            self._process(job_id)
+        except UnicodeDecodeError as e:
+            logger.warning(f"Nem UTF-8 kódolású CSV fájl (import {job_id}): {str(e)}")
+            self._finish(job_id, "failed", "A fájl nem UTF-8 kódolású CSV!")
+        except Exception as e:
+            logger.error(f"Váratlan hiba a CSV importálás során (import {job_id}): {str(e)}")
+            self._finish(job_id, "failed", "Általános hiba történt az importálás során.")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _process(self, job_id):
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE import_jobs SET status = 'running', heartbeat_at = now()
+                    WHERE id = %s AND claimed_by = %s AND status IN ('queued', 'running')
+                    RETURNING path, records_done
+                """, (job_id, self.owner))
+                claimed = cursor.fetchone()
+            conn.commit()
+        if not claimed:
+            return
+        path, records_done = claimed
+        if not os.path.exists(path):
+            self._finish(job_id, "failed", "A feltöltött fájl nem található (másik gépen indult az import?).")
+            return
+        logger.info(f"Import {job_id} indul a(z) {records_done + 1}. rekordtól")
+        from import_validation import read_import_frames, validate_import_frame
+        record_count = error_count = 0
+        with open(path, "rb") as raw:
+            skip = records_done
+            for frame in read_import_frames(raw, self.chunk_rows):
+                # Folytatásnál a már véglegesített rekordokat csak átolvassuk
+                if skip >= len(frame):
+                    skip -= len(frame)
+                    continue
+                frame, skip = frame.iloc[skip:], 0
+                batch = validate_import_frame(frame)
+                if not self._commit_chunk(job_id, batch, raw.tell()):
+                    logger.warning(f"Import {job_id} átkerült egy másik folyamathoz, leállunk")
+                    return
+                record_count += batch.record_count
+                error_count += len(batch.errors)
+        # Darabonként nem naplózunk, a hibás sorokról a végén egy összesítés szól
+        if error_count:
+            logger.warning("CSV ellenőrzés (import %s): %s hibás sor a(z) %s rekordból", job_id, error_count, record_count)
+        self._finish(job_id, "done")
+
+    def _commit_chunk(self, job_id, batch, bytes_done):
+        record_count = batch.record_count
+        error_entries = batch.error_entries()
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                imported_count, duplicate_entries = import_rows(cursor, batch.row_tuples())
+                cursor.execute("""
+                    UPDATE import_jobs SET
+                        records_done = records_done + %s, bytes_done = %s,
+                        imported = imported + %s, duplicates = duplicates + %s, errors = errors + %s,
+                        duplicate_samples = (duplicate_samples || %s::text[])[1:%s],
+                        error_samples = (error_samples || %s::text[])[1:%s],
+                        heartbeat_at = now()
+                    WHERE id = %s AND claimed_by = %s AND status = 'running'
+                """, (record_count, bytes_done, imported_count, len(duplicate_entries), len(error_entries),
+                      duplicate_entries[:IMPORT_SAMPLE_LIMIT], IMPORT_SAMPLE_LIMIT,
+                      error_entries[:IMPORT_SAMPLE_LIMIT], IMPORT_SAMPLE_LIMIT, job_id, self.owner))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return False
+            conn.commit()
+        if imported_count:
+            mark_places_changed()
+        logger.debug("Import %s: +%s rekord, %s beszúrva", job_id, record_count, imported_count)
+        return True
+
+    def _finish(self, job_id, status, message=None):
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE import_jobs SET status = %s, message = %s, finished_at = now(), heartbeat_at = now()
+                        WHERE id = %s AND claimed_by = %s
+                        RETURNING path
+                    """, (status, message, job_id, self.owner))
+                    finished = cursor.fetchone()
+                conn.commit()
+        except psycopg2.Error as e:
+            logger.error(f"Nem sikerült lezárni az importot ({job_id}): {str(e)}")
+            return
+        if finished and os.path.exists(finished[0]):
+            os.remove(finished[0])
+        logger.info(f"Import {job_id} befejeződött: {status}")
+
+import_runner = ImportJobRunner(IMPORT_WORKERS, IMPORT_CHUNK_ROWS, IMPORT_POLL_INTERVAL, IMPORT_STALE_AFTER)
+
+# Indulás. A modul importja nem nyit kapcsolatot és nem inicializálja a Firebase-t.
+# - prepare(): a séma migráció, folyamatfán belül egyszer (--preload esetén a masterben, fork előtt)
+# - ensure_started(): folyamatonként egyszer (fork után azonnal, különben az első kérésnél)
+#   a háttérben előmelegíti a workert (pool kapcsolatok, verzió figyelő, felhasználókezelés),
+#   majd elindítja az import szálakat. A kérések nem várnak rá; ami még nincs kész, azt az
+#   első használat hozza létre.
+# Sikertelen séma ellenőrzés után legfeljebb ilyen időközönként próbáljuk újra (a kérések
+# közben nem várnak egymásra a kapcsolódási időtúllépésekben)
+SCHEMA_RETRY_AFTER = 10
+
+class AppStartup:
+    def __init__(self):
+        self.schema_ready = False
+        self._retry_at = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        if self.schema_ready:
+            return True
+        with self._lock:
+            if not self.schema_ready and time.monotonic() >= self._retry_at:
+                self.schema_ready = ensure_schema()
+                if not self.schema_ready:
+                    self._retry_at = time.monotonic() + SCHEMA_RETRY_AFTER
+        return self.schema_ready
+
+    # Ebben a folyamatban már elindultak-e a workerenkénti erőforrások
+    @property
+    def started(self):
+        return self._pid == os.getpid()
+
+    def ensure_started(self):
+        if self.started:
+            return
+        # Amíg a séma nincs kész, a worker erőforrásai sem indulnak; a következő kérés újrapróbálja
+        if not self.prepare():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._prewarm, name="prewarm", daemon=True).start()
+
+    def after_fork(self):
+        # A szülőben esetleg zárolt zárat nem örököljük
+        self._lock = threading.Lock()
+        if self.schema_ready:
+            self.ensure_started()
+
+    def _prewarm(self):
+        start = time.perf_counter()
+        try:
+            opened = db_pool.prewarm()
+            places_version.current()
+            read_db.prewarm()
+            base_user_directory.directory
+            logger.info(f"Worker {os.getpid()} előmelegítve {(time.perf_counter() - start) * 1000:.0f} ms alatt ({opened} új kapcsolat)")
+        except Exception as e:
+            logger.warning(f"A worker előmelegítése nem sikerült (az első kérések pótolják): {str(e)}")
+        finally:
+            # A megszakadt importok átvétele a pool feltöltése után indul
+            import_runner.ensure_started()
+
+startup = AppStartup()
+app.before_request(startup.ensure_started)
+os.register_at_fork(after_in_child=startup.after_fork)
+
+# Belépési pont: gunicorn --preload "app:create_app()" (lásd Procfile). A modul szintű app
+# objektumot adja vissza, ellenőrzött beállításokkal és kész sémával; a workerenkénti
+# erőforrások fork után indulnak.
+def create_app():
+    check_config()
+    startup.prepare()
+    return app
+
+def get_import_job(job_id):
+    with db_connection() as conn:
+        with conn.cursor(cursor_factory=REAL_DICT_CURSOR) as cursor:
+            cursor.execute("""
+                SELECT id, status, filename, created_at, finished_at, total_bytes, bytes_done, records_done,
+                       imported, duplicates, errors, duplicate_samples, error_samples, message
+                FROM import_jobs WHERE id = %s
+            """, (job_id,))
+            return cursor.fetchone()
+
+PLACE_CONFLICT_MESSAGES = {
+    "name": "⚠️ Ez a név már létezik! Kérlek, válassz egyedi nevet.",
+}
+PLACE_EDIT_CONFLICT_MESSAGES = {
+    "name": "⚠️ Ez a név már létezik egy másik rekordban!",
+}
+PLACE_CONFLICT_FALLBACK = "⚠️ Ez a hely már létezik (mezők egyediek kell legyenek)!"
+
+# Az ON CONFLICT DO NOTHING nem mondja meg, melyik index ütközött; ez csak ütközés
+# esetén fut, egyetlen lekérdezéssel, és az első ütköző mezőt adja vissza.
+def find_place_conflict(cursor, name):
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM places WHERE name = %s)", (name,))
+    return "name" if cursor.fetchone()[0] else None
+
+# Ha egy egyedi indexet nem sikerült létrehozni, az adott mezőt az írás előtt egyetlen
+# lekérdezéssel ellenőrizzük (a régi viselkedés, versenyhelyzet ellen nem véd)
+def check_unenforced_uniqueness(cursor, name, east, north, exclude_id=None):
+    values = {"name": name, "east": east, "north": north}
+    fields = [field for field in UNIQUE_CONSTRAINT_FIELDS.values() if field not in unique_place_fields]
+    if not fields:
+        return None
+    cursor.execute(
+        "SELECT " + ", ".join(f"coalesce(bool_or({field} = %s), false)" for field in fields)
+        + " FROM places WHERE (" + " OR ".join(f"{field} = %s" for field in fields) + ") AND id IS DISTINCT FROM %s",
+        [values[field] for field in fields] * 2 + [exclude_id])
+    for field, conflict in zip(fields, cursor.fetchone()):
+        if conflict:
+            return field
+    return None
+
+# Közeli duplikátumok: DEDUP_RADIUS_M méteren belüli, legalább DEDUP_NAME_SIMILARITY
+# mértékben hasonló nevű hely (lásd dedup.py). Az egyedi írásoknál a GiST pont index
+# adja a jelölteket; az űrlapon a felhasználó tudatosan felülbírálhatja.
+DEDUP_RADIUS_M = float(os.environ.get("DEDUP_RADIUS_M", 100))
+DEDUP_NAME_SIMILARITY = float(os.environ.get("DEDUP_NAME_SIMILARITY", 0.7))
+DEDUP_MAX_RADIUS_M = 1000
+
+# A legközelebbi közeli duplikátum (távolság m, hasonlóság, (id, east, north, name)) vagy
+# None. Versenyhelyzet ellen nem véd (mint a check_unenforced_uniqueness).
+def find_near_duplicate(cursor, name, east, north, exclude_id=None):
+    cursor.execute("""
+        SELECT id, east, north, name FROM places
+        WHERE point(east, north) <@ box(point(%s, %s), point(%s, %s)) AND id IS DISTINCT FROM %s
+    """, (*bounding_box(east, north, DEDUP_RADIUS_M), exclude_id))
+    matches = find_duplicates(name, east, north, cursor.fetchall(), DEDUP_RADIUS_M, DEDUP_NAME_SIMILARITY)
+    return matches[0] if matches else None
+
+def near_duplicate_message(duplicate):
+    distance, _, place = duplicate
+    return (f"⚠️ Hasonló nevű hely már van {distance:.0f} m-en belül: {place[3]}! Ha ez mégis egy másik hely, "
+            f"jelöld be a „Mentés a hasonló hely ellenére” mezőt.")
+
+INDEX_PAGE_SIZE = 50
+
 @app.route("/")
 def index():
-    conn = None
+    search = request.args.get("search", "").strip()
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM places ORDER BY name")
-            places = cursor.fetchall()
-        is_admin = session.get('user', {}).get('role') == 'admin'
-        remotepg = 'user' in session
-        logger.debug(f"Sesszió adatok: {session.get('user')}, is_admin: {is_admin}")
-        return render_template("index.html", places=places, remotepg=remotepg, is_admin=is_admin)
+        after = decode_page_cursor(request.args["after"]) if request.args.get("after") else None
+        places, next_cursor = cached_places_page(PLACE_FIELDS, INDEX_PAGE_SIZE, after, search)
+        return render_index(places, next_cursor, search)
+    except ValueError as e:
+        logger.warning(str(e))
+        return redirect(url_for("index", search=search or None))
     except psycopg2.OperationalError as e:
         logger.error(f"Kapcsolati hiba a főoldal lekérdezése során: {str(e)}")
-        flash("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!", "danger")
-        return render_template("index.html", places=[], remotepg=False, is_admin=False)
+        return render_index_error("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!")
     except Exception as e:
         logger.error(f"Hiba a főoldal lekérdezése során: {str(e)}")
-        flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
-        return render_template("index.html", places=[], remotepg=False, is_admin=False)
-    finally:
-        if conn:
-            release_db_connection(conn)
+        return render_index_error("⚠️ Általános hiba történt, kérlek próbáld újra később!")
+
+# A főoldal megjelenítése; a szinkron és az aszinkron (asgi.py) kiszolgálás is ezt használja
+def render_index(places, next_cursor, search):
+    is_admin = session.get('user', {}).get('role') == 'admin'
+    remotepg = 'user' in session
+    logger.debug("Sesszió adatok: %s, is_admin: %s", session.get('user'), is_admin)
+    return render_template("index.html", places=places, next_cursor=next_cursor, search=search,
+                           page_size=INDEX_PAGE_SIZE, remotepg=remotepg, is_admin=is_admin)
+
+def render_index_error(message):
+    flash(message, "danger")
+    return render_template("index.html", places=[], remotepg=False, is_admin=False)
 
 @app.route("/add", methods=["GET", "POST"])
 def add_place():
@@ -171,37 +1261,38 @@ def add_place():
             flash("⚠️ Érvénytelen koordináta formátum vagy tartomány!", "danger")
             logger.warning("Érvénytelen koordináta formátum.")
             return redirect(url_for("add_place"))
-        conn = None
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT 1 FROM places WHERE name = %s", (name,))
-                if cursor.fetchone():
-                    flash("⚠️ Ez a név már létezik! Kérlek, válassz egyedi nevet.", "warning")
-                    return redirect(url_for("add_place"))
-                cursor.execute("SELECT 1 FROM places WHERE east = %s", (east,))
-                if cursor.fetchone():
-                    flash("⚠️ Ez a Kelet koordináta már létezik! Kérlek, válassz egyedi koordinátát.", "warning")
-                    return redirect(url_for("add_place"))
-                cursor.execute("SELECT 1 FROM places WHERE north = %s", (north,))
-                if cursor.fetchone():
-                    flash("⚠️ Ez az Észak koordináta már létezik! Kérlek, válassz egyedi koordinátát.", "warning")
-                    return redirect(url_for("add_place"))
-                cursor.execute("INSERT INTO places (name, east, north, address, notes) VALUES (%s, %s, %s, %s, %s)", (name, east, north, address, notes))
-            conn.commit()
-            flash("✅ Hely sikeresen hozzáadva!", "success")
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    conflict = check_unenforced_uniqueness(cursor, name, east, north)
+                    if conflict:
+                        flash(PLACE_CONFLICT_MESSAGES[conflict], "warning")
+                        return redirect(url_for("add_place"))
+                    duplicate = None if request.form.get("allow_near_duplicate") else find_near_duplicate(cursor, name, east, north)
+                    if duplicate:
+                        flash(near_duplicate_message(duplicate), "warning")
+                        return redirect(url_for("add_place"))
+                    cursor.execute("""
+                        INSERT INTO places (name, east, north, address, notes) VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT DO NOTHING
+                        RETURNING id
+                    """, (name, east, north, address, notes))
+                    if cursor.fetchone() is None:
+                        conflict = find_place_conflict(cursor, name)
+                        flash(PLACE_CONFLICT_MESSAGES.get(conflict, PLACE_CONFLICT_FALLBACK), "warning")
+                        return redirect(url_for("add_place"))
+                conn.commit()
+                mark_places_changed()
+                flash("✅ Hely sikeresen hozzáadva!", "success")
         except psycopg2.errors.UniqueViolation as e:
             logger.error(f"Egyediség megsértése: {str(e)}")
-            flash("⚠️ Ez a hely már létezik (mezők egyediek kell legyenek)!", "warning")
+            flash(PLACE_CONFLICT_MESSAGES.get(UNIQUE_CONSTRAINT_FIELDS.get(e.diag.constraint_name), PLACE_CONFLICT_FALLBACK), "warning")
         except psycopg2.OperationalError as e:
             logger.error(f"Kapcsolat hiba az új hely hozzáadása során: {str(e)}")
             flash("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!", "danger")
         except Exception as e:
             logger.error(f"Hiba történt az adatbázis művelet során: {str(e)}")
             flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
-        finally:
-            if conn:
-                release_db_connection(conn)
         return redirect(url_for("index"))
     return render_template("add.html")
 
@@ -215,112 +1306,100 @@ def import_csv():
         if not file:
             flash("❌ Nincs fájl kiválasztva!", "danger")
             return redirect(url_for("import_csv"))
-        max_size = 1024 * 1024  # 1MB limit
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        if file_size > max_size:
-            flash("⚠️ A fájl túl nagy! Maximum 1MB engedélyezett.", "danger")
-            return redirect(url_for("import_csv"))
-        UPLOAD_FOLDER = "uploads"
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(file_path)
-        imported_count = 0
-        duplicate_entries = []
-        error_entries = []
-        conn = None
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cursor:
-                logger.debug(f"Importálás megkezdése fájlból: {file_path}")
-                with open(file_path, newline="", encoding="utf-8-sig") as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    logger.debug(f"CSV fejléc: {reader.fieldnames}")
-                    for row in reader:
-                        logger.debug(f"Feldolgozás alatt lévő sor: {row}")
-                        name = row.get("Név", "").strip()
-                        try:
-                            east = round(float(row.get("Kelet", "").strip()), 6)
-                            north = round(float(row.get("Észak", "").strip()), 6)
-                        except ValueError as ve:
-                            logger.warning(f"Érvénytelen koordináta formátum a sorban: {row}, hiba: {str(ve)}")
-                            error_entries.append(f"Sor: {row} - Érvénytelen koordináta")
-                            continue
-                        address = row.get("Cím", "").strip()
-                        notes = row.get("Megjegyzések", "").strip()
-                        if not (is_valid_coordinate(str(east), is_longitude=True) and is_valid_coordinate(str(north))):
-                            logger.warning(f"Érvénytelen koordináta: east={east}, north={north}")
-                            error_entries.append(f"Sor: {row} - Érvénytelen koordináta formátum vagy tartomány")
-                            continue
-                        cursor.execute("SELECT 1 FROM places WHERE name = %s", (name,))
-                        if cursor.fetchone():
-                            logger.warning(f"Duplikált név: {name}")
-                            duplicate_entries.append(f"Név: {name}")
-                            continue
-                        cursor.execute("SELECT 1 FROM places WHERE east = %s", (east,))
-                        if cursor.fetchone():
-                            logger.warning(f"Duplikált Kelet: {east}")
-                            duplicate_entries.append(f"Kelet: {east}")
-                            continue
-                        cursor.execute("SELECT 1 FROM places WHERE north = %s", (north,))
-                        if cursor.fetchone():
-                            logger.warning(f"Duplikált Észak: {north}")
-                            duplicate_entries.append(f"Észak: {north}")
-                            continue
-                        try:
-                            logger.debug(f"Insert készítése: name={name}, east={east}, north={north}")
-                            cursor.execute("INSERT INTO places (name, east, north, address, notes) VALUES (%s, %s, %s, %s, %s)", (name, east, north, address, notes))
-                            conn.commit()
-                            imported_count += 1
-                            logger.debug(f"Sikeres insert: id={cursor.lastrowid if hasattr(cursor, 'lastrowid') else 'N/A'}")
-                        except psycopg2.Error as e:
-                            logger.error(f"Hiba az insert során: {str(e)}, sor: {row}")
-                            error_entries.append(f"Sor: {row} - Hiba: {str(e)}")
-                            if conn:
-                                conn.rollback()
-                if imported_count > 0:
-                    flash(f"✅ {imported_count} új hely importálva!", "success")
-                if duplicate_entries:
-                    flash(f"⚠️ {len(duplicate_entries)} duplikált bejegyzés nem importálódott: {', '.join(duplicate_entries)}", "warning")
-                if error_entries:
-                    flash(f"⚠️ {len(error_entries)} hiba történt az importálás során: {', '.join(error_entries)}", "warning")
+            os.makedirs(IMPORT_UPLOAD_DIR, exist_ok=True)
+            path = os.path.join(IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}.csv")
+            file.save(path)
+            job_id = import_runner.submit(file.filename, path, session['user'].get('email'))
+            logger.info(f"Import feladat létrehozva: {job_id} ({file.filename})")
+            flash("⏳ Az importálás elindult, az állapota ezen az oldalon követhető.", "info")
+            return redirect(url_for("import_status", job_id=job_id))
         except psycopg2.Error as e:
-            logger.error(f"Tranzakciós hiba a CSV importálás során: {str(e)}")
+            logger.error(f"Adatbázis hiba az import feladat létrehozásakor: {str(e)}")
             flash("⚠️ Tranzakciós hiba az importálás során, kérlek próbáld újra!", "danger")
         except Exception as e:
-            logger.error(f"Váratlan hiba a CSV importálás során: {str(e)}")
+            logger.error(f"Váratlan hiba a CSV feltöltése során: {str(e)}")
             flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
-        finally:
-            if conn:
-                release_db_connection(conn)
-            os.remove(file_path)
+        return redirect(url_for("import_csv"))
+    return render_template("import.html", max_mb=IMPORT_MAX_MB)
+
+# A feltöltés méretkorlátját a Flask (MAX_CONTENT_LENGTH) ellenőrzi a fájl beolvasása előtt
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    if request.endpoint != "import_csv":
+        return e
+    flash(f"⚠️ A fájl túl nagy! Maximum {IMPORT_MAX_MB}MB engedélyezett.", "danger")
+    return redirect(url_for("import_csv"))
+
+def import_job_json(job):
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "created_at": job["created_at"].isoformat(),
+        "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+        "total_bytes": job["total_bytes"],
+        "bytes_done": job["bytes_done"],
+        "rows_processed": job["records_done"],
+        "imported": job["imported"],
+        "duplicates": job["duplicates"],
+        "errors": job["errors"],
+        "duplicate_samples": job["duplicate_samples"],
+        "error_samples": job["error_samples"],
+        "message": job["message"],
+    }
+
+@app.route("/import/<job_id>")
+def import_status(job_id):
+    if 'user' not in session:
+        flash("⚠️ Kérlek, jelentkezz be a CSV importálásához!", "danger")
+        return redirect(url_for("login"))
+    try:
+        job = get_import_job(job_id)
+    except psycopg2.Error as e:
+        logger.error(f"Hiba az import állapot lekérdezése során: {str(e)}")
+        flash("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!", "danger")
         return redirect(url_for("index"))
-    return render_template("import.html")
+    if not job:
+        flash("❌ Az import feladat nem található!", "danger")
+        return redirect(url_for("import_csv"))
+    return render_template("import_status.html", job=import_job_json(job), sample_limit=IMPORT_SAMPLE_LIMIT)
+
+@app.route("/api/import/<job_id>")
+def api_import_status(job_id):
+    if 'user' not in session:
+        return jsonify({"error": "Kérlek, jelentkezz be!"}), 401
+    try:
+        job = get_import_job(job_id)
+    except psycopg2.Error as e:
+        logger.error(f"Hiba az import állapot lekérdezése során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    if not job:
+        return jsonify({"error": "Az import feladat nem található!"}), 404
+    response = jsonify(import_job_json(job))
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 @app.route("/delete/<int:id>", methods=["POST"])
 def delete(id):
     if 'user' not in session or session.get('user', {}).get('role') != 'admin':
         flash("⚠️ Kérlek, jelentkezz be adminisztrátorként a hely törléséhez!", "danger")
         return redirect(url_for("login"))
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            logger.debug(f"Próbálom törölni a helyet id={id}")
-            cursor.execute("DELETE FROM places WHERE id = %s", (id,))
-            logger.debug(f"Törlés eredménye: {cursor.rowcount} sor érintett")
-        conn.commit()
-        flash("🗑️ Hely sikeresen törölve!", "success")
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                logger.debug("Próbálom törölni a helyet id=%s", id)
+                cursor.execute("DELETE FROM places WHERE id = %s", (id,))
+                logger.debug("Törlés eredménye: %s sor érintett", cursor.rowcount)
+            conn.commit()
+            mark_places_changed()
+            flash("🗑️ Hely sikeresen törölve!", "success")
     except psycopg2.OperationalError as e:
         logger.error(f"Kapcsolat hiba a hely törlése során: {str(e)}")
         flash("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!", "danger")
     except Exception as e:
         logger.error(f"Hiba történt a hely törlése során: {str(e)}")
         flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
-    finally:
-        if conn:
-            release_db_connection(conn)
     return redirect(url_for("index"))
 
 @app.route("/edit/<int:id>", methods=["GET", "POST"])
@@ -328,17 +1407,7 @@ def edit(id):
     if 'user' not in session or session.get('user', {}).get('role') != 'admin':
         flash("⚠️ Kérlek, jelentkezz be adminisztrátorként a hely szerkesztéséhez!", "danger")
         return redirect(url_for("login"))
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            logger.debug(f"Próbálom lekérdezni a helyet id={id}")
-            cursor.execute("SELECT * FROM places WHERE id = %s", (id,))
-            place = cursor.fetchone()
-            logger.debug(f"Lekérdezett hely: {place}")
-        if not place:
-            flash("❌ A hely nem található!", "danger")
-            return redirect(url_for("index"))
         if request.method == "POST":
             name = request.form["name"].strip()
             east = round(float(request.form["east"].strip()), 6)
@@ -348,27 +1417,44 @@ def edit(id):
             if not (is_valid_coordinate(str(east), is_longitude=True) and is_valid_coordinate(str(north))):
                 flash("⚠️ Érvénytelen koordináta formátum vagy tartomány!", "danger")
                 return redirect(url_for("edit", id=id))
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT 1 FROM places WHERE name = %s AND id != %s", (name, id))
-                if cursor.fetchone():
-                    flash("⚠️ Ez a név már létezik egy másik rekordban!", "warning")
-                    return redirect(url_for("edit", id=id))
-                cursor.execute("SELECT 1 FROM places WHERE east = %s AND id != %s", (east, id))
-                if cursor.fetchone():
-                    flash("⚠️ Ez a Kelet koordináta már létezik egy másik rekordban!", "warning")
-                    return redirect(url_for("edit", id=id))
-                cursor.execute("SELECT 1 FROM places WHERE north = %s AND id != %s", (north, id))
-                if cursor.fetchone():
-                    flash("⚠️ Ez az Észak koordináta már létezik egy másik rekordban!", "warning")
-                    return redirect(url_for("edit", id=id))
-                cursor.execute("UPDATE places SET name = %s, east = %s, north = %s, address = %s, notes = %s WHERE id = %s", (name, east, north, address, notes, id))
-            conn.commit()
+            # Egyetlen utasítás: a nem létező helyet a RETURNING, az ütközést az egyedi index jelzi
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    conflict = check_unenforced_uniqueness(cursor, name, east, north, exclude_id=id)
+                    if conflict:
+                        flash(PLACE_EDIT_CONFLICT_MESSAGES[conflict], "warning")
+                        return redirect(url_for("edit", id=id))
+                    duplicate = None if request.form.get("allow_near_duplicate") else find_near_duplicate(cursor, name, east, north, exclude_id=id)
+                    if duplicate:
+                        flash(near_duplicate_message(duplicate), "warning")
+                        return redirect(url_for("edit", id=id))
+                    cursor.execute("""
+                        UPDATE places SET name = %s, east = %s, north = %s, address = %s, notes = %s
+                        WHERE id = %s
+                        RETURNING id
+                    """, (name, east, north, address, notes, id))
+                    updated = cursor.fetchone()
+                if not updated:
+                    flash("❌ A hely nem található!", "danger")
+                    return redirect(url_for("index"))
+                conn.commit()
+            mark_places_changed()
             flash("✅ A hely sikeresen módosítva!", "success")
             return redirect(url_for("index"))
-        return render_template("edit.html", place=place, form_data=request.form if request.method == "POST" else None)
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                logger.debug("Próbálom lekérdezni a helyet id=%s", id)
+                cursor.execute("SELECT * FROM places WHERE id = %s", (id,))
+                place = cursor.fetchone()
+                logger.debug("Lekérdezett hely: %s", place)
+        if not place:
+            flash("❌ A hely nem található!", "danger")
+            return redirect(url_for("index"))
+        return render_template("edit.html", place=place, form_data=None)
     except psycopg2.errors.UniqueViolation as e:
-        logger.error(f"Egyediség megsértése: {str(e)}")
-        flash("⚠️ Ez a hely már létezik (mezők egyediek kell legyenek)!", "warning")
+        logger.warning(f"Egyediség megsértése: {str(e).strip()}")
+        conflict = UNIQUE_CONSTRAINT_FIELDS.get(e.diag.constraint_name)
+        flash(PLACE_EDIT_CONFLICT_MESSAGES.get(conflict, PLACE_CONFLICT_FALLBACK), "warning")
         return redirect(url_for("edit", id=id))
     except psycopg2.OperationalError as e:
         logger.error(f"Kapcsolati hiba a hely szerkesztése során: {str(e)}")
@@ -377,39 +1463,70 @@ def edit(id):
     except Exception as e:
         logger.error(f"Hiba történt a hely szerkesztése során: {str(e)}")
         flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
-    finally:
-        if conn:
-            release_db_connection(conn)
     return redirect(url_for("index"))
 
+EXPORT_HEADER = ("Név", "Kelet", "Észak", "Cím", "Megjegyzések")
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 2000))
+
 @app.route("/export")
 def export_csv():
     if 'user' not in session:
         flash("⚠️ Kérlek, jelentkezz be a CSV exportálásához!", "danger")
         return redirect(url_for("login"))
-    conn = None
+    pool = conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT name, east, north, address, notes FROM places")
-            places = cursor.fetchall()
-        csv_data = "Név,Kelet,Észak,Cím,Megjegyzések\n"
-        for place in places:
-            csv_data += f"{place['name']},{place['east']},{place['north']},{place['address']},{place['notes']}\n"
-        response = Response(csv_data.encode("utf-8-sig"), mimetype="text/csv")
-        response.headers["Content-Disposition"] = "attachment; filename=helyek_export.csv"
-        return response
+        # A kapcsolat a válasz lezárásáig marad kikölcsönözve, ezért itt kézzel kezeljük
+        pool, conn = get_read_connection(places_version.current()[0])
+        # Szerveroldali (named) kurzor: a sorok EXPORT_BATCH_SIZE méretű adagokban jönnek át
+        cursor = conn.cursor(name="places_export", cursor_factory=TUPLE_CURSOR)
+        cursor.itersize = EXPORT_BATCH_SIZE
+        cursor.execute("SELECT name, east, north, address, notes FROM places")
     except psycopg2.OperationalError as e:
         logger.error(f"Kapcsolati hiba a CSV exportálás során: {str(e)}")
         flash("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!", "danger")
+        if conn:
+            release_db_connection(conn, pool)
         return redirect(url_for("index"))
     except Exception as e:
         logger.error(f"Hiba történt a CSV exportálás során: {str(e)}")
         flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
-        return redirect(url_for("index"))
-    finally:
         if conn:
-            release_db_connection(conn)
+            release_db_connection(conn, pool)
+        return redirect(url_for("index"))
+
+    def generate():
+        # A fejléc még az első adag lekérése előtt kimegy a kliensnek
+        yield encode_csv_rows([EXPORT_HEADER], header=True)
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield encode_csv_rows(rows)
+
+    def cleanup():
+        # A válasz lezárásakor fut, akkor is, ha a kliens megszakította a letöltést
+        try:
+            cursor.close()
+            conn.rollback()
+        except psycopg2.Error as e:
+            logger.error(f"Hiba az export kurzor lezárása során: {str(e)}")
+        finally:
+            release_db_connection(conn, pool)
+
+    response = export_response(generate())
+    response.call_on_close(cleanup)
+    return response
+
+# Egy CSV adag; az első (fejléc) adag BOM-mal kezdődik, hogy az Excel UTF-8-ként nyissa meg
+def encode_csv_rows(rows, header=False):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8-sig" if header else "utf-8")
+
+def export_response(body):
+    response = Response(body, mimetype="text/csv")
+    response.headers["Content-Disposition"] = "attachment; filename=helyek_export.csv"
+    return response
 
 @app.route("/login", methods=["GET", "POST"])
 def login():
@@ -423,14 +1540,19 @@ def login():
             flash("⚠️ Kérlek, add meg az email címet és a jelszót!", "danger")
             return redirect(url_for("login"))
         try:
-            user = auth.get_user_by_email(email)
-            logger.debug(f"Felhasználó custom claims: {user.custom_claims}")
-            role = user.custom_claims.get('role', 'user') if user.custom_claims else 'user'
-            session['user'] = {'email': user.email, 'uid': user.uid, 'role': role}
+            # A gyorsítótárat itt megkerüljük: egy másik workerben törölt vagy letiltott
+            # felhasználó se jelentkezhessen be a USER_CACHE_TTL lejártáig
+            user = user_directory.fresh_user_by_email(email)
+            if user.disabled:
+                logger.warning(f"Letiltott felhasználó próbált bejelentkezni: {email}")
+                flash("⚠️ Hibás email cím vagy jelszó!", "danger")
+                return redirect(url_for("login"))
+            logger.debug("Felhasználó custom claims: %s", user.custom_claims)
+            session['user'] = {'email': user.email, 'uid': user.uid, 'role': user.role}
             session.permanent = True
             flash("✅ Bejelentkezés sikeres!", "success")
             return redirect(url_for("index"))
-        except auth.UserNotFoundError:
+        except UserNotFound:
             logger.warning(f"Nem létező felhasználó próbált bejelentkezni: {email}")
             flash("⚠️ Hibás email cím vagy jelszó!", "danger")
             return redirect(url_for("login"))
@@ -448,11 +1570,17 @@ def logout():
         flash("✅ Sikeresen kijelentkeztél!", "success")
     return redirect(url_for("index"))
 
-@app.route("/ping", methods=['GET'])
+# Könnyű végpont: nincs sablon és adatbázis, a session csak változás esetén íródik.
+# state=hidden: a felhasználó utolsó látható lapja elrejtődött (sendBeacon, POST)
+# state=visible: újra látható lap, illetve a ritka szívverés
+@app.route("/ping", methods=['GET', 'POST'])
 def ping():
-    logger.debug("Ping received")
     if 'user' in session:
-        session['last_seen'] = datetime.now(UTC)
+        if request.args.get('state') == 'hidden':
+            if 'hidden_at' not in session:
+                session['hidden_at'] = int(time.time())
+        else:
+            session.pop('hidden_at', None)
     return '', 204  # No Content válasz
 
 @app.route("/clear-sessions", methods=['GET'])
@@ -461,35 +1589,623 @@ def clear_sessions():
     session.clear()  # Törli az aktuális session-t
     return redirect(url_for("login"))
 
+PLACE_FIELDS = ("id", "name", "east", "north", "address", "notes")
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+
+# A lapozó kurzor a lap utolsó sorának (name, id) párja, URL-biztos base64 JSON-ként
+def encode_page_cursor(name, id):
+    return base64.urlsafe_b64encode(json.dumps([name, id]).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_page_cursor(token):
+    try:
+        name, id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Érvénytelen lapozó kurzor: {token}") from e
+    if not isinstance(name, str) or not isinstance(id, int):
+        raise ValueError(f"Érvénytelen lapozó kurzor: {token}")
+    return name, id
+
+def like_pattern(text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def parse_places_query(args):
+    fields = PLACE_FIELDS
+    if args.get("fields"):
+        fields = tuple(field.strip() for field in args["fields"].split(",") if field.strip())
+        unknown = [field for field in fields if field not in PLACE_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Ismeretlen mező(k): {', '.join(unknown)}")
+    paginated = "limit" in args or "after" in args
+    limit = None
+    if paginated:
+        try:
+            limit = int(args.get("limit", API_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValueError("A limit paraméternek egész számnak kell lennie!")
+        if not 1 <= limit <= API_MAX_LIMIT:
+            raise ValueError(f"A limit 1 és {API_MAX_LIMIT} között lehet!")
+    after = decode_page_cursor(args["after"]) if args.get("after") else None
+    q = args.get("q", "").strip()
+    return fields, limit, after, q
+
+# Egy lap lekérdezése: (name, id) szerinti kulcsalapú lapozás a places_name_id_idx indexen.
+# A limit+1-edik sor csak azt jelzi, hogy van-e következő lap.
+def places_page_query(fields, limit=None, after=None, q=""):
+    conditions = []
+    params = []
+    # Minden keresőszónak szerepelnie kell; a places_search_trgm_idx index ezt a kifejezést fedi le
+    for term in q.split():
+        conditions.append("places_search_text(name, address, notes) LIKE places_fold(%s)")
+        params.append(like_pattern(term))
+    if after:
+        conditions.append("(name, id) > (%s, %s)")
+        params.extend(after)
+    columns = ", ".join(dict.fromkeys(("name", "id") + tuple(fields)))
+    sql = f"SELECT {columns} FROM places"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY name, id"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit + 1)
+    return sql, params
+
+def fetch_places_page(conn, fields, limit=None, after=None, q=""):
+    sql, params = places_page_query(fields, limit, after, q)
+    with conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+        cursor.execute(sql, params)
+        return places_page_result(cursor.fetchall(), fields, limit)
+
+# Ugyanaz a lap oszloponként (mező -> lista), soronkénti dict építése nélkül; a tömör
+# JSON, a MessagePack és a pontpuffer formátum ebből készül
+def fetch_places_columns(conn, fields, limit=None, after=None, q=""):
+    sql, params = places_page_query(fields, limit, after, q)
+    with conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+        cursor.execute(sql, params)
+        return places_columns_result(cursor.fetchall(), fields, limit)
+
+# A places_page_query sorainak feldolgozása (name, id, majd a mezők sorrendjében);
+# bármilyen indexelhető sorral működik, így az aszinkron driver rekordjaival is
+def split_places_page(rows, limit):
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_page_cursor(rows[-1][0], rows[-1][1])
+    return rows, None
+
+def places_page_result(rows, fields, limit):
+    rows, next_cursor = split_places_page(rows, limit)
+    selected = list(dict.fromkeys(("name", "id") + tuple(fields)))
+    positions = [(field, selected.index(field)) for field in fields]
+    return [{field: row[i] for field, i in positions} for row in rows], next_cursor
+
+def places_columns_result(rows, fields, limit):
+    rows, next_cursor = split_places_page(rows, limit)
+    selected = list(dict.fromkeys(("name", "id") + tuple(fields)))
+    values = list(zip(*rows)) if rows else [()] * len(selected)
+    by_field = dict(zip(selected, values))
+    return {field: list(by_field[field]) for field in fields}, next_cursor
+
+def negotiate_places_format(req):
+    fmt = req.args.get("format")
+    if fmt is None:
+        # format nélkül csak a MessagePack választható Accept fejléccel; minden más JSON
+        if "msgpack" in available_formats() and req.accept_mimetypes.best_match(["application/json", "application/msgpack"]) == "application/msgpack":
+            return "msgpack"
+        return "json"
+    if fmt not in PLACES_FORMATS:
+        raise ValueError(f"Ismeretlen formátum: {fmt} (lehetséges: {', '.join(PLACES_FORMATS)})")
+    if fmt not in available_formats():
+        raise ValueError(f"A(z) {fmt} formátum nem elérhető ezen a szerveren")
+    return fmt
+
+def negotiate_encoding(req):
+    for encoding in available_encodings():
+        if req.accept_encodings[encoding]:
+            return encoding
+    return None
+
+def build_places_body(fmt, fields, limit, after, q):
+    if fmt == "json":
+        return encode_places_page(fmt, limit, cached_places_page(fields, limit, after, q))
+    version, _ = places_version.current()
+    with read_connection(version) as conn:
+        page = fetch_places_columns(conn, POINT_BUFFER_FIELDS if fmt == "f32" else fields, limit, after, q)
+    return encode_places_page(fmt, limit, page)
+
+# page: json formátumnál (dict lista, kurzor), a többinél (oszlopok, kurzor)
+def encode_places_page(fmt, limit, page):
+    data, next_cursor = page
+    if fmt == "json":
+        # Paraméterek nélkül a régi formátum marad: a teljes lista egy tömbként
+        payload = data if limit is None else {"items": data, "next": next_cursor}
+        return app.json.dumps(payload).encode("utf-8"), next_cursor
+    if fmt == "f32":
+        return encode_point_buffer(data), next_cursor
+    return encode_columns(data, next_cursor, fmt, app.json.dumps), next_cursor
+
 @app.route("/api/places", methods=["GET"])
 def api_places():
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM places ORDER BY name")
-            places = cursor.fetchall()
-        places_list = [{"id": place["id"], "name": place["name"], "east": place["east"], "north": place["north"], "address": place["address"], "notes": place["notes"]} for place in places]
-        return jsonify(places_list)
+        fields, limit, after, q = parse_places_query(request.args)
+        fmt = negotiate_places_format(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    encoding = negotiate_encoding(request)
+    try:
+        version, updated_at = places_version.current()
+        key = ("api", fmt, fields, limit, after, q)
+        etag = places_etag(version, key, encoding)
+        if request.if_none_match.contains(etag):
+            return not_modified_response(etag, updated_at)
+        cached = cached_places_body(key, encoding, version)
+        if cached is None:
+            cached = store_places_body(key, encoding, version, build_places_body(fmt, fields, limit, after, q))
+        return places_body_response(cached, fmt, etag, updated_at).make_conditional(request)
     except psycopg2.OperationalError as e:
         logger.error(f"Kapcsolati hiba az API lekérdezés során: {str(e)}")
         return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
     except Exception as e:
         logger.error(f"Hiba történt az API lekérdezés során: {str(e)}")
         return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
-    finally:
-        if conn:
-            release_db_connection(conn)
+
+# Az ETag a tábla verziójából, a lekérdezés paramétereiből és a reprezentációból
+# (formátum, tömörítés) áll; ha a kliens ugyanezt küldi vissza, a 304 válaszhoz
+# nem kell adatbázis kör
+def places_etag(version, key, encoding):
+    return f"places-{version}-{zlib.crc32(repr(key + (encoding,)).encode('utf-8')):08x}"
+
+# A tömörített változat is a gyorsítótárba kerül, így verziónként egyszer tömörítünk.
+# A bejegyzés (body, kurzor) vagy tömörítve (body, kurzor, kódolás).
+def cached_places_body(key, encoding, version):
+    cached = places_cache.get(key + (encoding,), version)
+    if cached is None:
+        raw = places_cache.get(key, version)
+        if raw is not None:
+            cached = compress_places_body(key, encoding, version, raw)
+    return cached
+
+def store_places_body(key, encoding, version, raw):
+    places_cache.put(key, version, raw)
+    return compress_places_body(key, encoding, version, raw)
+
+def compress_places_body(key, encoding, version, raw):
+    if encoding and len(raw[0]) >= COMPRESS_MIN_BYTES:
+        cached = (compress_body(raw[0], encoding), raw[1], encoding)
+        places_cache.put(key + (encoding,), version, cached)
+        return cached
+    return raw
+
+def places_body_response(cached, fmt, etag, updated_at):
+    body, next_cursor = cached[0], cached[1]
+    response = Response(body, mimetype=PLACES_FORMATS[fmt])
+    if len(cached) > 2:
+        response.content_encoding = cached[2]
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    response.vary.update(("Accept", "Accept-Encoding"))
+    set_cache_headers(response, etag, updated_at)
+    return response
+
+def set_cache_headers(response, etag, updated_at):
+    response.set_etag(etag)
+    response.last_modified = updated_at
+    # A kliens tárolhatja, de minden használat előtt újra kell ellenőriznie
+    response.cache_control.no_cache = True
+
+def not_modified_response(etag, updated_at):
+    response = Response(status=304)
+    set_cache_headers(response, etag, updated_at)
+    return response
+
+GEO_MAX_RESULTS = 5000
+NEAREST_MAX_RESULTS = 100
+# A GiST KNN fokokban mér; a jelölteket haversine távolság szerint rendezzük újra
+# (az első körben n * NEAREST_OVERSAMPLE jelölttel, lásd nearest_places)
+NEAREST_OVERSAMPLE = 4
+
+def parse_float_args(args, names):
+    try:
+        return [float(args[name]) for name in names]
+    except KeyError as e:
+        raise ValueError(f"Hiányzó paraméter: {e.args[0]}")
+    except ValueError:
+        raise ValueError(f"Érvénytelen szám a paraméterek között: {', '.join(names)}")
+
+def parse_bbox_arg(args):
+    parts = args.get("bbox", "").split(",")
+    if len(parts) != 4:
+        raise ValueError("A bbox formátuma: min_east,min_north,max_east,max_north")
+    try:
+        min_east, min_north, max_east, max_north = (float(part) for part in parts)
+    except ValueError:
+        raise ValueError("Érvénytelen szám a bbox paraméterben!")
+    return min(min_east, max_east), min(min_north, max_north), max(min_east, max_east), max(min_north, max_north)
+
+def parse_int_arg(args, name, default, maximum):
+    try:
+        value = int(args.get(name, default))
+    except ValueError:
+        raise ValueError(f"A {name} paraméternek egész számnak kell lennie!")
+    if not 1 <= value <= maximum:
+        raise ValueError(f"A {name} 1 és {maximum} között lehet!")
+    return value
+
+def geo_place(record, distance=None):
+    place = {"id": record[0], "east": record[1], "north": record[2], "name": record[3]}
+    if distance is not None:
+        place["distance_m"] = round(distance, 1)
+    return place
+
+@app.route("/api/places/bbox", methods=["GET"])
+def api_places_bbox():
+    try:
+        min_east, min_north, max_east, max_north = parse_bbox_arg(request.args)
+        limit = parse_int_arg(request.args, "limit", GEO_MAX_RESULTS, GEO_MAX_RESULTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        if GEO_BACKEND == "memory":
+            records = get_geo_index().bbox(min_east, min_north, max_east, max_north, limit + 1)
+        else:
+            with db_connection() as conn, conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+                cursor.execute("""
+                    SELECT id, east, north, name FROM places
+                    WHERE point(east, north) <@ box(point(%s, %s), point(%s, %s))
+                    ORDER BY name, id
+                    LIMIT %s
+                """, (min_east, min_north, max_east, max_north, limit + 1))
+                records = cursor.fetchall()
+        return jsonify({"items": [geo_place(record) for record in records[:limit]], "truncated": len(records) > limit})
+    except psycopg2.OperationalError as e:
+        logger.error(f"Kapcsolati hiba a térbeli lekérdezés során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    except Exception as e:
+        logger.error(f"Hiba történt a térbeli lekérdezés során: {str(e)}")
+        return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+# A legközelebbi n hely haversine távolság szerint, (távolság, rekord) párokként. A GiST
+# KNN a fokokban mért euklideszi távolság szerint ad jelölteket, ami a hosszúsági fok
+# rövidülése miatt más sorrend; ha a jelöltek közti n-edik haversine távolságnál közelebb
+# lehet még be nem olvasott hely (a leghátsó jelölt fok távolságából becsülve), több
+# jelölttel újrakérdezünk.
+def nearest_places(cursor, east, north, n):
+    limit = n * NEAREST_OVERSAMPLE
+    while True:
+        cursor.execute("""
+            SELECT id, east, north, name, point(east, north) <-> point(%s, %s) FROM places
+            ORDER BY point(east, north) <-> point(%s, %s)
+            LIMIT %s
+        """, (east, north, east, north, limit))
+        candidates = cursor.fetchall()
+        found = sorted(((haversine_m(east, north, record[1], record[2]), record[:4]) for record in candidates), key=lambda item: item[0])[:n]
+        if len(candidates) < limit or found[-1][0] <= min_distance_beyond_degrees(east, candidates[-1][4]):
+            return found
+        limit *= NEAREST_OVERSAMPLE
+
+@app.route("/api/places/nearest", methods=["GET"])
+def api_places_nearest():
+    try:
+        east, north = parse_float_args(request.args, ("east", "north"))
+        n = parse_int_arg(request.args, "n", 10, NEAREST_MAX_RESULTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        if GEO_BACKEND == "memory":
+            found = get_geo_index().nearest(east, north, n)
+        else:
+            with db_connection() as conn, conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+                found = nearest_places(cursor, east, north, n)
+        return jsonify({"items": [geo_place(record, distance) for distance, record in found]})
+    except psycopg2.OperationalError as e:
+        logger.error(f"Kapcsolati hiba a térbeli lekérdezés során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    except Exception as e:
+        logger.error(f"Hiba történt a térbeli lekérdezés során: {str(e)}")
+        return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+# A teljes tábla közeli duplikátum párjai (adminoknak, pl. utólagos takarításhoz). A
+# rácsos átvizsgálás 100 000 helyen néhány száz ms; az eredmény a places verzióhoz kötve
+# a gyorsítótárba kerül, így ismételt lekérés csak adatváltozás után számol újra.
+@app.route("/api/places/duplicates", methods=["GET"])
+def api_places_duplicates():
+    if session.get('user', {}).get('role') != 'admin':
+        return jsonify({"error": "Csak adminisztrátorok számára elérhető!"}), 403
+    try:
+        radius_m, min_similarity = parse_float_args(
+            {"radius_m": DEDUP_RADIUS_M, "similarity": DEDUP_NAME_SIMILARITY, **request.args.to_dict()}, ("radius_m", "similarity"))
+        if not (0 < radius_m <= DEDUP_MAX_RADIUS_M and 0 < min_similarity <= 1):
+            raise ValueError(f"A radius_m 0 és {DEDUP_MAX_RADIUS_M} között, a similarity 0 és 1 között lehet!")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        version, _ = places_version.current()
+        key = ("duplicates", radius_m, min_similarity)
+        pairs = places_cache.get(key, version)
+        if pairs is None:
+            with read_connection(version) as conn, conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+                cursor.execute("SELECT id, east, north, name FROM places ORDER BY id")
+                records = cursor.fetchall()
+            pairs = [{"a": geo_place(a), "b": geo_place(b), "distance_m": round(distance, 1), "similarity": round(similarity, 3)}
+                     for a, b, distance, similarity in find_duplicate_pairs(records, radius_m, min_similarity)]
+            places_cache.put(key, version, pairs)
+        return jsonify({"count": len(pairs), "pairs": pairs})
+    except psycopg2.OperationalError as e:
+        logger.error(f"Kapcsolati hiba a duplikátumkeresés során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    except Exception as e:
+        logger.error(f"Hiba történt a duplikátumkeresés során: {str(e)}")
+        return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+# Egy válasz legfeljebb ennyi cellát fedhet le (kb. 64 csempényi képernyő), így a válasz
+# mérete a képernyőtől függ, nem a tábla méretétől
+CLUSTER_MAX_CELLS = 64 * CLUSTER_CELLS_PER_TILE * CLUSTER_CELLS_PER_TILE
+
+def parse_zoom_arg(args):
+    try:
+        zoom = int(args["zoom"])
+    except KeyError:
+        raise ValueError("Hiányzó paraméter: zoom")
+    except ValueError:
+        raise ValueError("A zoom paraméternek egész számnak kell lennie!")
+    if not 0 <= zoom <= CLUSTER_MAX_ZOOM:
+        raise ValueError(f"A zoom 0 és {CLUSTER_MAX_ZOOM} között lehet!")
+    return zoom
+
+def cluster_cell_size(zoom):
+    return 360.0 / (CLUSTER_CELLS_PER_TILE * 2 ** zoom)
+
+# Térképes klaszterek: a bbox-ot fedő cellák összesítései az adott zoom szinten
+# (darab, súlypont, legfeljebb CLUSTER_SAMPLE_SIZE minta id). A cellák CLUSTER_INDEX_MAX_ZOOM
+# szintig a places_clusters táblából jönnek, amit a triggerek minden írásnál frissítenek,
+# így a lekérdezés a tábla méretétől függetlenül legfeljebb CLUSTER_MAX_CELLS sort olvas.
+@app.route("/api/places/clusters", methods=["GET"])
+def api_places_clusters():
+    try:
+        min_east, min_north, max_east, max_north = parse_bbox_arg(request.args)
+        zoom = parse_zoom_arg(request.args)
+        size = cluster_cell_size(zoom)
+        # cx a hosszúság (north), cy a szélesség (east) szerinti cellaindex, mint a places_cluster_keys-ben
+        min_cx, max_cx = math.floor(min_north / size), math.floor(max_north / size)
+        min_cy, max_cy = math.floor(min_east / size), math.floor(max_east / size)
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > CLUSTER_MAX_CELLS:
+            raise ValueError("A bbox túl nagy ehhez a zoom szinthez, kérlek nagyíts rá vagy kisebb zoom szintet kérj!")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        version, updated_at = places_version.current()
+        key = ("clusters", zoom, min_cx, max_cx, min_cy, max_cy)
+        etag = f"clusters-{version}-{zlib.crc32(repr(key).encode('utf-8')):08x}"
+        if request.if_none_match.contains(etag):
+            return not_modified_response(etag, updated_at)
+        clusters = places_cache.get(key, version)
+        if clusters is None:
+            with read_connection(version) as conn, conn.cursor(cursor_factory=TUPLE_CURSOR) as cursor:
+                if zoom <= CLUSTER_INDEX_MAX_ZOOM:
+                    cursor.execute("""
+                        SELECT count, sum_east / count, sum_north / count, sample_ids FROM places_clusters
+                        WHERE zoom = %s AND cx BETWEEN %s AND %s AND cy BETWEEN %s AND %s AND count > 0
+                        ORDER BY cy, cx
+                    """, (zoom, min_cx, max_cx, min_cy, max_cy))
+                else:
+                    # A cellák határán lévő pontokat a box mindkét szomszédnak adná; a floor szűrés dönt
+                    cursor.execute("""
+                        SELECT count(*), avg(east), avg(north), (array_agg(id ORDER BY id))[1:%(sample)s] FROM places
+                        WHERE point(east, north) <@ box(point(%(min_cy)s * %(size)s, %(min_cx)s * %(size)s),
+                                                        point((%(max_cy)s + 1) * %(size)s, (%(max_cx)s + 1) * %(size)s))
+                            AND floor(north / %(size)s) BETWEEN %(min_cx)s AND %(max_cx)s
+                            AND floor(east / %(size)s) BETWEEN %(min_cy)s AND %(max_cy)s
+                        GROUP BY floor(east / %(size)s), floor(north / %(size)s)
+                        ORDER BY floor(east / %(size)s), floor(north / %(size)s)
+                    """, {"sample": CLUSTER_SAMPLE_SIZE, "size": size, "min_cx": min_cx, "max_cx": max_cx, "min_cy": min_cy, "max_cy": max_cy})
+                clusters = [{"count": count, "east": round(east, 6), "north": round(north, 6), "ids": ids}
+                            for count, east, north, ids in cursor.fetchall()]
+            places_cache.put(key, version, clusters)
+        response = jsonify({"zoom": zoom, "cell_size": size, "clusters": clusters})
+        set_cache_headers(response, etag, updated_at)
+        return response
+    except psycopg2.OperationalError as e:
+        logger.error(f"Kapcsolati hiba a klaszterek lekérdezése során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    except Exception as e:
+        logger.error(f"Hiba történt a klaszterek lekérdezése során: {str(e)}")
+        return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+ROUTE_MAX_STOPS = int(os.environ.get("ROUTE_MAX_STOPS", 500))
+
+# A megállók azonosítói: POST JSON törzsben ({"ids": [...]}, sok megállónál ez ajánlott),
+# vagy ids=1,2,3 paraméterként
+def parse_stop_ids(req):
+    if req.method == "POST":
+        body = req.get_json(silent=True)
+        ids = body.get("ids") if isinstance(body, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+            raise ValueError('A kérés törzse {"ids": [azonosítók]} formátumú JSON legyen!')
+    else:
+        try:
+            ids = [int(value) for value in req.args.get("ids", "").split(",") if value.strip()]
+        except ValueError:
+            raise ValueError("Az ids paraméter vesszővel elválasztott egész számok listája legyen!")
+    if not ids:
+        raise ValueError("Legalább egy megálló azonosítója szükséges!")
+    if len(ids) > ROUTE_MAX_STOPS:
+        raise ValueError(f"Legfeljebb {ROUTE_MAX_STOPS} megálló adható meg!")
+    return ids
+
+# Páronkénti távolságok (haversine, egész méterre kerekítve) a megadott sorrendben:
+# distances_m[i][j] az ids[i] és ids[j] helyek távolsága. Sok megállónál a JSON előállítása
+# a számítás többszöröse; format=u32 esetén bináris válasz jön (lásd routing.encode_distance_matrix).
+@app.route("/api/places/distance-matrix", methods=["GET", "POST"])
+def api_places_distance_matrix():
+    if 'user' not in session:
+        return jsonify({"error": "Bejelentkezés szükséges!"}), 401
+    try:
+        ids = parse_stop_ids(request)
+        fmt = request.args.get("format", "json")
+        if fmt not in ("json", "u32"):
+            raise ValueError(f"Ismeretlen formátum: {fmt} (lehetséges: json, u32)")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        matrix = get_place_coordinates().distance_matrix(ids)
+        if fmt == "u32":
+            return Response(encode_distance_matrix(ids, matrix), mimetype="application/octet-stream")
+        return jsonify({"ids": ids, "distances_m": matrix.round().astype(int).tolist()})
+    except UnknownPlaces as e:
+        return jsonify({"error": str(e), "missing": e.ids}), 404
+    except psycopg2.OperationalError as e:
+        logger.error(f"Kapcsolati hiba a távolságmátrix számítása során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    except Exception as e:
+        logger.error(f"Hiba történt a távolságmátrix számítása során: {str(e)}")
+        return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+# Bejárási sorrend az első megállóból (pl. telephely) indulva: legközelebbi szomszéd,
+# majd 2-opt javítás. round_trip=0 esetén az út nem tér vissza a kiindulópontra.
+# Az eredmény a places verzióhoz kötve a gyorsítótárba kerül.
+@app.route("/api/places/visit-order", methods=["GET", "POST"])
+def api_places_visit_order():
+    if 'user' not in session:
+        return jsonify({"error": "Bejelentkezés szükséges!"}), 401
+    try:
+        ids = parse_stop_ids(request)
+        if len(set(ids)) != len(ids):
+            raise ValueError("Egy megálló csak egyszer szerepelhet!")
+        round_trip = request.args.get("round_trip", "1") not in ("0", "false")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        version, _ = places_version.current()
+        key = ("visit-order", tuple(ids), round_trip)
+        route = places_cache.get(key, version)
+        if route is None:
+            matrix = get_place_coordinates().distance_matrix(ids)
+            order = visit_order(matrix, round_trip)
+            legs = route_legs(matrix, order, round_trip)
+            route = {
+                "order": [ids[position] for position in order.tolist()],
+                "round_trip": round_trip,
+                "distance_m": round(float(legs.sum())),
+                "legs_m": legs.round().astype(int).tolist(),
+            }
+            places_cache.put(key, version, route)
+        return jsonify(route)
+    except UnknownPlaces as e:
+        return jsonify({"error": str(e), "missing": e.ids}), 404
+    except psycopg2.OperationalError as e:
+        logger.error(f"Kapcsolati hiba a bejárási sorrend számítása során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    except Exception as e:
+        logger.error(f"Hiba történt a bejárási sorrend számítása során: {str(e)}")
+        return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+SYNC_DEFAULT_LIMIT = 1000
+SYNC_MAX_LIMIT = 5000
+
+# Szinkron kurzor: [alsó határ, utolsó (xid, id) lapozás közben, teljes letöltés-e].
+# Az alsó határ egy pillanatkép xmin értéke: az ennél kisebb azonosítójú tranzakciók akkor
+# már mind lezárultak, így a tőle kezdődő (>=) módosítások között minden benne van, amit
+# a kliens még nem látott (néhány módosítást legfeljebb kétszer kap meg).
+def encode_sync_cursor(floor, after=None, full=False):
+    return base64.urlsafe_b64encode(json.dumps([floor, after, full]).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_sync_cursor(token):
+    try:
+        floor, after, full = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Érvénytelen szinkron kurzor: {token}") from e
+    valid_after = after is None or (isinstance(after, list) and len(after) == 2 and all(isinstance(value, int) for value in after))
+    if not isinstance(floor, int) or floor < 0 or not valid_after or not isinstance(full, bool):
+        raise ValueError(f"Érvénytelen szinkron kurzor: {token}")
+    return floor, tuple(after) if after else None, full
+
+# A módosítások (change_xid, id) szerint rendezve, lapozva; az első lap a floor-tól indul,
+# a további lapok a kulcs szerint folytatják. A lapozás alatt az első lap xmin értéke
+# marad az alsó határ, így a közben lezáruló, korábban indult tranzakciók a következő
+# szinkronban jönnek. Teljes letöltésnél (since nélkül) a törlések nem kellenek.
+def fetch_place_changes(conn, floor, after, full, limit):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS xmin")
+        xmin = cursor.fetchone()["xmin"]
+        if after:
+            condition, params = "(change_xid, id) > (%s::text::xid8, %s)", [str(after[0]), after[1]]
+        else:
+            condition, params = "change_xid >= %s::text::xid8", [str(floor)]
+        sql = f"""
+            SELECT change_xid::text::bigint AS xid, id, false AS deleted, name, east, north, address, notes, updated_at
+            FROM places WHERE {condition}
+        """
+        if not full:
+            sql += f"""
+                UNION ALL
+                SELECT change_xid::text::bigint, id, true, NULL, NULL, NULL, NULL, NULL, deleted_at
+                FROM places_tombstones WHERE {condition}
+            """
+            params *= 2
+        cursor.execute(sql + " ORDER BY xid, id LIMIT %s", params + [limit + 1])
+        rows = cursor.fetchall()
+    floor = min(floor, xmin) if after else xmin
+    more = len(rows) > limit
+    rows = rows[:limit]
+    upserts = [{field: row[field] for field in PLACE_FIELDS} | {"updated_at": row["updated_at"].isoformat()}
+               for row in rows if not row["deleted"]]
+    deletions = [row["id"] for row in rows if row["deleted"]]
+    if more:
+        return upserts, deletions, encode_sync_cursor(floor, [rows[-1]["xid"], rows[-1]["id"]], full), True
+    return upserts, deletions, encode_sync_cursor(floor), False
+
+# Delta szinkron offline / mobil klienseknek:
+#   GET /api/places/changes            -> az összes hely (első szinkron)
+#   GET /api/places/changes?since=...  -> azóta módosult helyek és törölt azonosítók
+# Amíg "more" igaz, a kapott kurzorral azonnal folytatni kell; utána a kurzort a
+# következő szinkronig el kell tárolni.
+@app.route("/api/places/changes", methods=["GET"])
+def api_place_changes():
+    try:
+        limit = parse_int_arg(request.args, "limit", SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT)
+        if request.args.get("since"):
+            floor, after, full = decode_sync_cursor(request.args["since"])
+        else:
+            floor, after, full = 0, None, True
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        version, updated_at = places_version.current()
+        etag = f"changes-{version}-{zlib.crc32(repr((floor, after, full, limit)).encode('utf-8')):08x}"
+        if request.if_none_match.contains(etag):
+            return not_modified_response(etag, updated_at)
+        with db_connection() as conn:
+            upserts, deletions, cursor_token, more = fetch_place_changes(conn, floor, after, full, limit)
+        response = jsonify({"upserts": upserts, "deletions": deletions, "cursor": cursor_token, "more": more})
+        set_cache_headers(response, etag, updated_at)
+        return response.make_conditional(request)
+    except psycopg2.OperationalError as e:
+        logger.error(f"Kapcsolati hiba a szinkron lekérdezés során: {str(e)}")
+        return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+    except Exception as e:
+        logger.error(f"Hiba történt a szinkron lekérdezés során: {str(e)}")
+        return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+@app.route("/api/pool-stats", methods=["GET"])
+def pool_stats():
+    if session.get('user', {}).get('role') != 'admin':
+        return jsonify({"error": "Csak adminisztrátorok számára elérhető!"}), 403
+    stats = db_pool.stats()
+    if replica_pools:
+        stats["replicas"] = read_db.stats()
+    return jsonify(stats)
 
 @app.route("/users", methods=["GET"])
 def users():
     if 'user' not in session or session.get('user', {}).get('role') != 'admin':
         flash("⚠️ Kérlek, jelentkezz be adminisztrátorként a felhasználók megtekintéséhez!", "danger")
         return redirect(url_for("login"))
+    # Firebase oldaltokenes lapozás: csak az aktuális oldal töltődik le
+    page_token = request.args.get("page_token") or None
     try:
-        users = auth.list_users().iterate_all()
-        user_list = [{"email": user.email, "role": user.custom_claims.get('role', 'user') if user.custom_claims else 'user', "uid": user.uid} for user in users]
-        return render_template("users.html", users=user_list)
+        user_list, next_page_token = user_directory.list_users(page_token, USERS_PAGE_SIZE)
+        return render_template("users.html", users=user_list, next_page_token=next_page_token, first_page=page_token is None)
     except Exception as e:
         logger.error(f"Hiba a felhasználók lekérdezése során: {str(e)}")
         flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
@@ -508,12 +2224,11 @@ def add_user():
             flash("⚠️ Kérlek, add meg az email címet és a jelszót!", "danger")
             return redirect(url_for("add_user"))
         try:
-            user = auth.create_user(email=email, password=password)
-            auth.set_custom_user_claims(user.uid, {"role": role})
+            user_directory.create_user(email, password, role)
             logger.info(f"Új felhasználó létrehozva: email={email}, role={role}")
             flash("✅ Új felhasználó sikeresen létrehozva!", "success")
             return redirect(url_for("users"))
-        except auth.EmailAlreadyExistsError:
+        except EmailAlreadyExists:
             logger.warning(f"Már létezik felhasználó ezzel az emaillel: {email}")
             flash("⚠️ Ez az email cím már regisztrálva van!", "danger")
             return redirect(url_for("add_user"))
@@ -529,15 +2244,15 @@ def edit_user(uid):
         flash("⚠️ Kérlek, jelentkezz be adminisztrátorként a felhasználó szerkesztéséhez!", "danger")
         return redirect(url_for("login"))
     try:
-        user = auth.get_user(uid)
+        user = user_directory.get_user(uid)
         if request.method == "POST":
             role = request.form.get("role", "user")
-            auth.set_custom_user_claims(uid, {"role": role})
+            user_directory.set_role(uid, role)
             logger.info(f"Felhasználó szerkesztve: email={user.email}, új szerepkör={role}")
             flash("✅ Felhasználó sikeresen szerkesztve!", "success")
             return redirect(url_for("users"))
         return render_template("edit_user.html", user=user)
-    except auth.UserNotFoundError:
+    except UserNotFound:
         logger.error(f"Nem létező felhasználó szerkesztése: uid={uid}")
         flash("⚠️ A felhasználó nem található!", "danger")
         return redirect(url_for("users"))
@@ -552,11 +2267,11 @@ def delete_user(uid):
         flash("⚠️ Kérlek, jelentkezz be adminisztrátorként a felhasználó törléséhez!", "danger")
         return redirect(url_for("login"))
     try:
-        auth.delete_user(uid)
+        user_directory.delete_user(uid)
         logger.info(f"Felhasználó törölve: uid={uid}")
         flash("✅ Felhasználó sikeresen törölve!", "success")
         return redirect(url_for("users"))
-    except auth.UserNotFoundError:
+    except UserNotFound:
         logger.error(f"Nem létező felhasználó törlése: uid={uid}")
         flash("⚠️ A felhasználó nem található!", "danger")
         return redirect(url_for("users"))
@@ -570,4 +2285,4 @@ if __name__ == "__main__":
     print(app.url_map)
     port = int(os.environ.get("PORT", 5000))
     logger.info(f"Alkalmazás indítása a {port} porton...")
-    serve(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    serve(create_app(), host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,417 @@
+import asyncio
+import functools
+import inspect
+import io
+import logging
+import os
+import re
+import time
+
+import asyncpg
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import flash, jsonify, redirect, request, session, url_for
+from werkzeug.exceptions import HTTPException
+
+import app as poi
+from dbpool import ReplicaSet
+from metrics import observe_query
+
+logger = logging.getLogger(__name__)
+
+# Aszinkron (ASGI) kiszolgálási mód: uvicorn --workers 4 asgi:app
+# - az olvasó végpontok (/, /api/places, /export, /ping) az eseményhurkon futnak asyncpg
+#   poollal, így egy worker sok, adatbázisra váró kérést szolgál ki egyszerre szálak nélkül;
+#   a replikák (DATABASE_REPLICA_URLS) és a statement_timeout szabályok a szinkron móddal azonosak
+# - minden más végpont (írások, import, bejelentkezés, felhasználókezelés) a Flask appon fut
+#   egy korlátos szálkészletben (ASGI_WSGI_THREADS), így a Firebase hívások sem
+#   blokkolják az eseményhurkot
+# Az útválasztás, a session, a before/after_request kampók, a sablonok, a verzióhoz kötött
+# gyorsítótár és a válaszformátumok közösek a szinkron móddal (gunicorn "app:create_app()"),
+# amely változatlanul használható.
+
+ASYNC_DB_POOL_MIN = int(os.environ.get("ASYNC_DB_POOL_MIN", 1))
+ASYNC_DB_POOL_MAX = int(os.environ.get("ASYNC_DB_POOL_MAX", 20))
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 8))
+
+# Ezeket a hibákat a szinkron mód psycopg2.OperationalError ágának megfelelően kezeljük
+DB_CONNECTION_ERRORS = (asyncpg.PostgresConnectionError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError)
+
+# Nincs szabad kapcsolat DB_POOL_TIMEOUT-on belül (a szinkron PoolTimeout párja)
+class SlotTimeout(asyncio.TimeoutError):
+    pass
+
+# A psycopg2 (libpq) a PGOPTIONS -c kapcsolóit alkalmazza, az asyncpg nem; ugyanazt a
+# környezetet (pl. search_path) server_settings-ként adjuk át
+def pgoptions_settings(options):
+    return dict(re.findall(r"-c\s*([\w.]+)=(\S+)", options or ""))
+
+# %s helyőrzők ($1, $2, ...) alakra, hogy a közös lekérdezésépítők (places_page_query) itt is használhatók legyenek
+def numbered_placeholders(sql):
+    counter = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s|%%", lambda m: f"${next(counter)}" if m.group() == "%s" else "%", sql)
+
+# Streamelt válasz: a fejlécek a Flask válaszból (session süti, after_request), a törzs
+# aszinkron generátorból jön. Az on_close (mint a werkzeug call_on_close) a válasz
+# lezárásakor mindenképp lefut, akkor is, ha a generátor el sem indult (HEAD, hiba).
+class StreamedResponse:
+    def __init__(self, response, chunks, on_close=None):
+        self.response = response
+        self.chunks = chunks
+        self.on_close = on_close
+
+    async def close(self):
+        try:
+            await self.chunks.aclose()
+        finally:
+            if self.on_close is not None:
+                await self.on_close()
+
+# asyncpg pool FIFO kiadással. Az asyncpg pool kiadása nem sorrendtartó (az asyncio.Queue-n
+# az újonnan érkezők megelőzhetik a már felébresztett várakozókat), így túlterhelésnél egyes
+# kérések a timeoutig éheznek. A pool méretű FIFO szemafor után a pool már várakozás nélkül ad.
+class AsyncPool:
+    def __init__(self, pool, max_size):
+        self.pool = pool
+        self.slots = asyncio.Semaphore(max_size)
+
+    @classmethod
+    async def create(cls, dsn, **kwargs):
+        return cls(await asyncpg.create_pool(dsn, **kwargs), kwargs["max_size"])
+
+    async def acquire(self):
+        start = time.perf_counter()
+        waited = self.slots.locked()
+        try:
+            await asyncio.wait_for(self.slots.acquire(), poi.DB_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise SlotTimeout(f"Nincs szabad adatbázis kapcsolat {poi.DB_POOL_TIMEOUT} mp alatt") from None
+        if waited and poi.request_metrics:
+            poi.request_metrics.observe_pool_wait(time.perf_counter() - start)
+        try:
+            return await self.pool.acquire()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    async def release(self, conn):
+        try:
+            await self.pool.release(conn)
+        finally:
+            self.slots.release()
+
+    async def close(self):
+        await self.pool.close()
+
+class AsyncApp:
+    def __init__(self, flask_app, wsgi_threads=ASGI_WSGI_THREADS):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads)
+        self.pool = None
+        self.replicas = ReplicaSet([], poi.DB_REPLICA_RETRY_AFTER)
+        self.views = {
+            "index": self.index,
+            "api_places": self.api_places,
+            "export_csv": self.export_csv,
+            "ping": poi.ping,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] == "http" and self.pool is not None:
+            endpoint, args = self.match(scope)
+            if endpoint in self.views:
+                await self.dispatch(self.views[endpoint], args, scope, receive, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    def match(self, scope):
+        adapter = self.flask_app.url_map.bind("localhost", script_name=scope.get("root_path") or None)
+        try:
+            return adapter.match(scope["path"], scope["method"])
+        except HTTPException:
+            # 404, 405, átirányítás: a Flask kezeli
+            return None, None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.error(f"Az aszinkron kiszolgálás indítása nem sikerült: {str(e)}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for pool in self.replicas.replicas:
+                    await pool.close()
+                if self.pool is not None:
+                    await self.pool.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        # Beállítások ellenőrzése és séma migráció (blokkoló), majd a worker előmelegítése
+        # (verzió figyelő, a szinkron végpontok poolja) a háttérben, mint gunicorn alatt
+        await asyncio.to_thread(poi.create_app)
+        await asyncio.to_thread(poi.startup.ensure_started)
+        # Ezen a poolon csak az olvasó végpontok futnak: az alap statement_timeout az
+        # interaktív keret, az export a saját tranzakciójában emeli meg
+        settings = pgoptions_settings(os.environ.get("PGOPTIONS"))
+        settings["statement_timeout"] = str(poi.READ_STATEMENT_TIMEOUT_MS)
+        options = dict(min_size=ASYNC_DB_POOL_MIN, max_size=ASYNC_DB_POOL_MAX, server_settings=settings)
+        self.pool = await AsyncPool.create(poi.DATABASE_URL, **options)
+        replicas = []
+        for url in poi.DATABASE_REPLICA_URLS:
+            # Az elérhetetlen replika nem akasztja meg az indulást: min_size=0, a kapcsolatok
+            # az első olvasáskor nyílnak, a hiba akkor veszi ki a replikát a forgásból
+            replicas.append(await AsyncPool.create(url, **dict(options, min_size=0, timeout=poi.DB_REPLICA_CONNECT_TIMEOUT)))
+        self.replicas = ReplicaSet(replicas, poi.DB_REPLICA_RETRY_AFTER)
+        logger.info(f"Aszinkron pool elindult ({ASYNC_DB_POOL_MIN}-{ASYNC_DB_POOL_MAX} kapcsolat, {len(replicas)} replika), worker {os.getpid()}")
+
+    # A Flask wsgi_app / full_dispatch_request menete, a view-t az eseményhurkon várva
+    async def dispatch(self, view, args, scope, receive, send):
+        body = await read_body(receive)
+        ctx = self.flask_app.request_context(build_environ(scope, io.BytesIO(body)))
+        error = stream = None
+        ctx.push()
+        try:
+            try:
+                if poi.startup.started:
+                    rv = self.flask_app.preprocess_request()
+                else:
+                    # Amíg a worker nem indult el (pl. a séma ellenőrzése induláskor nem sikerült),
+                    # a before_request kampók blokkoló adatbázis munkát végezhetnek; ezek szálon
+                    # futnak, a kérés kontextusa (contextvars) átmegy
+                    rv = await asyncio.to_thread(self.flask_app.preprocess_request)
+                if rv is None:
+                    rv = view(**args)
+                    if inspect.isawaitable(rv):
+                        rv = await rv
+            except Exception as e:
+                rv = self.flask_app.handle_user_exception(e)
+            if isinstance(rv, StreamedResponse):
+                stream, rv = rv, rv.response
+            response = self.flask_app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            if stream is not None:
+                await stream.close()
+                stream = None
+            response = self.flask_app.handle_exception(e)
+        finally:
+            ctx.pop(error)
+
+        headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in response.headers.items()]
+        if stream is not None:
+            headers = [header for header in headers if header[0] != b"content-length"]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        if stream is None:
+            await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else response.get_data()})
+            return
+        try:
+            if scope["method"] != "HEAD":
+                async for chunk in stream.chunks:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await stream.close()
+
+    # A szinkron ReadRouter.getconn párja: (pool, kapcsolat, tranzakció). Replikán a
+    # friss-ellenőrzés és az olvasás egy REPEATABLE READ, csak olvasó tranzakcióban fut;
+    # a primaryn nincs tranzakció (None). A foglalt replikát átugorjuk, a hibásat kivesszük.
+    async def acquire_read(self, min_version):
+        for pool in self.replicas.candidates():
+            try:
+                conn = await pool.acquire()
+            except SlotTimeout:
+                continue
+            except DB_CONNECTION_ERRORS as e:
+                self.replicas.mark_down(pool, e)
+                continue
+            try:
+                transaction = conn.transaction(isolation="repeatable_read", readonly=True)
+                await transaction.start()
+                fresh = await conn.fetchval("SELECT version FROM places_version") >= min_version
+            except (asyncpg.PostgresError, *DB_CONNECTION_ERRORS) as e:
+                conn.terminate()
+                await pool.release(conn)
+                self.replicas.mark_down(pool, e)
+                continue
+            if fresh:
+                self.replicas.record("replica_reads")
+                return pool, conn, transaction
+            await self.close_read(pool, conn, transaction)
+            self.replicas.record("lagging")
+        conn = await self.pool.acquire()
+        if self.replicas:
+            self.replicas.record("primary_reads")
+        return self.pool, conn, None
+
+    async def close_read(self, pool, conn, transaction):
+        try:
+            if transaction is not None and not conn.is_closed():
+                await transaction.rollback()
+        except (asyncpg.PostgresError, *DB_CONNECTION_ERRORS):
+            conn.terminate()
+        finally:
+            await pool.release(conn)
+
+    # min_version megadásakor olvasó kapcsolaton (replika vagy primary), különben a primaryn
+    async def fetch(self, sql, params=(), min_version=None):
+        if min_version is None:
+            pool, conn, transaction = self.pool, await self.pool.acquire(), None
+        else:
+            pool, conn, transaction = await self.acquire_read(min_version)
+        start = time.perf_counter()
+        try:
+            return await conn.fetch(numbered_placeholders(sql), *params)
+        except DB_CONNECTION_ERRORS as e:
+            if pool is not self.pool:
+                self.replicas.mark_down(pool, e)
+            raise
+        finally:
+            observe_query(sql, time.perf_counter() - start)
+            await self.close_read(pool, conn, transaction)
+
+    async def current_version(self):
+        cached = poi.places_version.cached()
+        if cached is not None:
+            return cached
+        version, updated_at = (await self.fetch("SELECT version, updated_at FROM places_version"))[0]
+        return poi.places_version.refreshed(version, updated_at)
+
+    # A teljes lista (limit nélkül) feldolgozása, kódolása és tömörítése több tíz ms is
+    # lehet, ezt szálon futtatjuk; a lapok (legfeljebb API_MAX_LIMIT sor) a hurkon maradnak
+    @staticmethod
+    async def run_cpu(offload, func, *args):
+        if offload:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    # A szinkron cached_places_page párja, ugyanazokkal a gyorsítótár kulcsokkal
+    async def cached_places_page(self, fields, limit=None, after=None, q=""):
+        version, _ = await self.current_version()
+        key = ("page", fields, limit, after, q)
+        page = poi.places_cache.get(key, version)
+        if page is None:
+            rows = await self.fetch(*poi.places_page_query(fields, limit, after, q), min_version=version)
+            page = await self.run_cpu(limit is None, poi.places_page_result, rows, fields, limit)
+            poi.places_cache.put(key, version, page)
+        return page
+
+    async def index(self):
+        search = request.args.get("search", "").strip()
+        try:
+            after = poi.decode_page_cursor(request.args["after"]) if request.args.get("after") else None
+            places, next_cursor = await self.cached_places_page(poi.PLACE_FIELDS, poi.INDEX_PAGE_SIZE, after, search)
+            return poi.render_index(places, next_cursor, search)
+        except ValueError as e:
+            logger.warning(str(e))
+            return redirect(url_for("index", search=search or None))
+        except DB_CONNECTION_ERRORS as e:
+            logger.error(f"Kapcsolati hiba a főoldal lekérdezése során: {str(e)}")
+            return poi.render_index_error("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!")
+        except Exception as e:
+            logger.error(f"Hiba a főoldal lekérdezése során: {str(e)}")
+            return poi.render_index_error("⚠️ Általános hiba történt, kérlek próbáld újra később!")
+
+    async def api_places(self):
+        try:
+            fields, limit, after, q = poi.parse_places_query(request.args)
+            fmt = poi.negotiate_places_format(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        encoding = poi.negotiate_encoding(request)
+        full = limit is None
+        try:
+            version, updated_at = await self.current_version()
+            key = ("api", fmt, fields, limit, after, q)
+            etag = poi.places_etag(version, key, encoding)
+            if request.if_none_match.contains(etag):
+                return poi.not_modified_response(etag, updated_at)
+            cached = await self.run_cpu(full, poi.cached_places_body, key, encoding, version)
+            if cached is None:
+                if fmt == "json":
+                    page = await self.cached_places_page(fields, limit, after, q)
+                else:
+                    columns = poi.POINT_BUFFER_FIELDS if fmt == "f32" else fields
+                    rows = await self.fetch(*poi.places_page_query(columns, limit, after, q), min_version=version)
+                    page = await self.run_cpu(full, poi.places_columns_result, rows, columns, limit)
+                cached = await self.run_cpu(full, self.encode_places_body, key, encoding, version, fmt, limit, page)
+            return poi.places_body_response(cached, fmt, etag, updated_at).make_conditional(request)
+        except DB_CONNECTION_ERRORS as e:
+            logger.error(f"Kapcsolati hiba az API lekérdezés során: {str(e)}")
+            return jsonify({"error": "Adatbázis kapcsolati hiba, kérlek próbáld újra később!"}), 500
+        except Exception as e:
+            logger.error(f"Hiba történt az API lekérdezés során: {str(e)}")
+            return jsonify({"error": "Általános hiba történt, kérlek próbáld újra később!"}), 500
+
+    @staticmethod
+    def encode_places_body(key, encoding, version, fmt, limit, page):
+        return poi.store_places_body(key, encoding, version, poi.encode_places_page(fmt, limit, page))
+
+    async def export_csv(self):
+        if 'user' not in session:
+            flash("⚠️ Kérlek, jelentkezz be a CSV exportálásához!", "danger")
+            return redirect(url_for("login"))
+        pool = conn = transaction = None
+        try:
+            # A kapcsolat a stream végéig marad kikölcsönözve; a szerveroldali kurzor
+            # EXPORT_BATCH_SIZE méretű adagokban olvas, tranzakción belül
+            version, _ = await self.current_version()
+            pool, conn, transaction = await self.acquire_read(version)
+            if transaction is None:
+                transaction = conn.transaction()
+                await transaction.start()
+            await conn.execute(f"SET LOCAL statement_timeout = {int(poi.EXPORT_STATEMENT_TIMEOUT_MS)}")
+            cursor = await conn.cursor("SELECT name, east, north, address, notes FROM places")
+        except DB_CONNECTION_ERRORS as e:
+            logger.error(f"Kapcsolati hiba a CSV exportálás során: {str(e)}")
+            flash("⚠️ Adatbázis kapcsolati hiba, kérlek próbáld újra később!", "danger")
+            if conn:
+                await self.close_read(pool, conn, transaction)
+            return redirect(url_for("index"))
+        except Exception as e:
+            logger.error(f"Hiba történt a CSV exportálás során: {str(e)}")
+            flash("⚠️ Általános hiba történt, kérlek próbáld újra később!", "danger")
+            if conn:
+                await self.close_read(pool, conn, transaction)
+            return redirect(url_for("index"))
+        return StreamedResponse(poi.export_response(None), self.export_chunks(cursor),
+                                functools.partial(self.close_export, pool, conn, transaction))
+
+    @staticmethod
+    async def export_chunks(cursor):
+        yield poi.encode_csv_rows([poi.EXPORT_HEADER], header=True)
+        while True:
+            rows = await cursor.fetch(poi.EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield poi.encode_csv_rows(rows)
+
+    # A válasz lezárásakor fut, akkor is, ha a kliens megszakította a letöltést
+    async def close_export(self, pool, conn, transaction):
+        try:
+            await transaction.rollback()
+        except Exception as e:
+            logger.error(f"Hiba az export kurzor lezárása során: {str(e)}")
+        finally:
+            await pool.release(conn)
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+app = AsyncApp(poi.app)
@@ -0,0 +1,133 @@
+"""Térképes klaszterek: előre számolt places_clusters cellák vs. lekérdezésenkénti csoportosítás.
+
+Futtatás:
+    DATABASE_URL=postgresql://... python benchmarks/bench_clusters.py --places 100000,1000000
+
+Az alkalmazás sémáját (places_clusters tábla és triggerek) használja, ezért előtte
+egyszer el kell indítani az appot. Minden méret egy tranzakcióban fut, ami a végén
+visszagörgetődik, így a places táblán nem marad nyoma. Méri:
+- a szintetikus helyek beszúrását a klaszter triggerekkel és nélkülük (import),
+- egy hely hozzáadását + törlését (egyedi szerkesztés),
+- zoom szintenként egy képernyőnyi (6 x 4 csempe) véletlen nézetre a klaszterek
+  lekérdezését a places_clusters táblából, illetve a places tábla bbox-án futó
+  GROUP BY-jal, valamint a visszaadott klaszterek és a nézetbe eső helyek számát.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import psycopg2
+import psycopg2.extras
+
+# Magyarország befoglaló téglalapja (east = szélesség, north = hosszúság, mint a places táblában)
+EAST_RANGE = (45.74, 48.58)
+NORTH_RANGE = (16.11, 22.90)
+SCREEN_TILES = (6, 4)
+CLUSTER_TRIGGERS = ("places_clusters_insert", "places_clusters_update", "places_clusters_delete")
+
+def synthetic_places(count, seed=42):
+    rnd = random.Random(seed)
+    return [(f"Klaszter mérés {i}", round(rnd.uniform(*EAST_RANGE), 6), round(rnd.uniform(*NORTH_RANGE), 6)) for i in range(count)]
+
+def insert_places(cursor, places):
+    start = time.perf_counter()
+    psycopg2.extras.execute_values(cursor, "INSERT INTO places (name, east, north) VALUES %s", places, page_size=5000)
+    return time.perf_counter() - start
+
+def add_and_delete_place(cursor):
+    cursor.execute("INSERT INTO places (name, east, north) VALUES ('Klaszter egyedi', 47.1, 19.2) RETURNING id")
+    cursor.execute("DELETE FROM places WHERE id = %s", (cursor.fetchone()[0],))
+
+def set_cluster_triggers(cursor, enabled):
+    for trigger in CLUSTER_TRIGGERS:
+        cursor.execute(f"ALTER TABLE places {'ENABLE' if enabled else 'DISABLE'} TRIGGER {trigger}")
+
+def random_viewports(zoom, cells_per_tile, count, seed=7):
+    rnd = random.Random(seed + zoom)
+    tile = 360.0 / 2 ** zoom
+    span_north, span_east = SCREEN_TILES[0] * tile, SCREEN_TILES[1] * tile
+    for _ in range(count):
+        east = rnd.uniform(EAST_RANGE[0], max(EAST_RANGE[0], EAST_RANGE[1] - span_east))
+        north = rnd.uniform(NORTH_RANGE[0], max(NORTH_RANGE[0], NORTH_RANGE[1] - span_north))
+        size = tile / cells_per_tile
+        yield (east, north, east + span_east, north + span_north), size
+
+def stored_clusters(cursor, zoom, bbox, size):
+    min_east, min_north, max_east, max_north = bbox
+    cursor.execute("""
+        SELECT count, sum_east / count, sum_north / count, sample_ids FROM places_clusters
+        WHERE zoom = %s AND cx BETWEEN %s AND %s AND cy BETWEEN %s AND %s AND count > 0
+    """, (zoom, int(min_north // size), int(max_north // size), int(min_east // size), int(max_east // size)))
+    return cursor.fetchall()
+
+def grouped_clusters(cursor, zoom, bbox, size, sample_size):
+    min_east, min_north, max_east, max_north = bbox
+    # A cellahatárokhoz igazított bbox (a határon lévő pontokat a floor szűrés osztja ki),
+    # hogy ugyanazokat a cellákat adja, mint a tárolt változat
+    cursor.execute("""
+        SELECT count(*), avg(east), avg(north), (array_agg(id ORDER BY id))[1:%s] FROM places
+        WHERE point(east, north) <@ box(point(%s, %s), point(%s, %s))
+            AND floor(north / %s) BETWEEN %s AND %s AND floor(east / %s) BETWEEN %s AND %s
+        GROUP BY floor(north / %s), floor(east / %s)
+    """, (sample_size, (min_east // size) * size, (min_north // size) * size, (max_east // size + 1) * size,
+          (max_north // size + 1) * size, size, min_north // size, max_north // size, size, min_east // size, max_east // size,
+          size, size))
+    return cursor.fetchall()
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", default="100000", help="vesszővel elválasztott helyszámok")
+    parser.add_argument("--zooms", default="6,9,12", help="legfeljebb a CLUSTER_INDEX_MAX_ZOOM értéke")
+    parser.add_argument("--views", type=int, default=20, help="nézetek száma zoom szintenként")
+    parser.add_argument("--cells-per-tile", type=int, default=4, help="a CLUSTER_CELLS_PER_TILE értéke")
+    parser.add_argument("--sample-size", type=int, default=5, help="a CLUSTER_SAMPLE_SIZE értéke")
+    args = parser.parse_args()
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        sys.exit("A DATABASE_URL környezetváltozó szükséges")
+
+    conn = psycopg2.connect(dsn)
+    try:
+        for count in (int(value) for value in args.places.split(",")):
+            places = synthetic_places(count)
+            with conn.cursor() as cursor:
+                set_cluster_triggers(cursor, False)
+                plain = insert_places(cursor, places)
+                conn.rollback()
+                with_triggers = insert_places(cursor, places)
+                cursor.execute("ANALYZE places")
+                cursor.execute("ANALYZE places_clusters")
+                single, _ = timed(lambda: add_and_delete_place(cursor), 50)
+                print(f"\n{count} hely: beszúrás trigger nélkül {plain:.2f} s, klaszter triggerekkel {with_triggers:.2f} s; "
+                      f"egy hely hozzáadása + törlése {single * 1000:.1f} ms")
+                print(f"{'zoom':>5} {'tárolt (ms)':>12} {'GROUP BY (ms)':>14} {'klaszter':>9} {'hely a nézetben':>16}")
+                for zoom in (int(value) for value in args.zooms.split(",")):
+                    stored_times, grouped_times, cluster_counts, place_counts = [], [], [], []
+                    for bbox, size in random_viewports(zoom, args.cells_per_tile, args.views):
+                        elapsed, stored = timed(lambda: stored_clusters(cursor, zoom, bbox, size), 3)
+                        stored_times.append(elapsed)
+                        elapsed, grouped = timed(lambda: grouped_clusters(cursor, zoom, bbox, size, args.sample_size), 3)
+                        grouped_times.append(elapsed)
+                        assert sorted(row[0] for row in stored) == sorted(row[0] for row in grouped)
+                        cluster_counts.append(len(stored))
+                        place_counts.append(sum(row[0] for row in stored))
+                    print(f"{zoom:>5} {statistics.median(stored_times) * 1000:>12.2f} {statistics.median(grouped_times) * 1000:>14.2f} "
+                          f"{max(cluster_counts):>9} {max(place_counts):>16}")
+            conn.rollback()
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
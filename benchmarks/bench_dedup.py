@@ -0,0 +1,110 @@
+"""Közeli duplikátumok keresése: rácsos teljes átvizsgálás vs. páronkénti összevetés.
+
+Futtatás:
+    python benchmarks/bench_dedup.py --places 10000,100000,300000
+
+A helyeket szintetikusan generálja (adatbázis nem kell), és --duplicates darab beültetett
+duplikátumot tesz melléjük (pár méterre, ékezet-, írásjel- vagy kiegészítésbeli
+eltéréssel a névben), valamint ugyanennyi "csapdát": azonos szélességű, de távoli, más
+nevű helyet, amit a régi koordinátánkénti egyediség tévesen elutasított. Méri a
+find_duplicate_pairs idejét és a beültetett párok megtalálását; a páronkénti (n²)
+összevetés idejét --naive méretű mintán méri és a teljes méretre vetíti. A mintán azt is
+ellenőrzi, hogy az import sorrendi szűrése (NearDuplicateIndex) ugyanazokat a helyeket
+ejti ki, mint a megtartott helyekkel való páronkénti összevetés.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DEFAULT_MIN_SIMILARITY, DEFAULT_RADIUS_M, NearDuplicateIndex, find_duplicate_pairs, find_duplicates  # noqa: E402
+from geoindex import METERS_PER_DEGREE  # noqa: E402
+
+EAST_RANGE = (45.74, 48.58)
+NORTH_RANGE = (16.11, 22.90)
+WORDS = ("Biofarm", "Kossuth", "pékség", "vendégház", "major", "tanya", "kút", "kilátó", "múzeum", "templom",
+         "Szent István", "Duna", "Tisza", "erdei", "pihenő", "panzió", "kávézó", "piac", "híd", "park")
+VARIANTS = (lambda name: name + " külső telep", lambda name: name.upper(), lambda name: name.replace("é", "e").replace("ő", "õ"),
+            lambda name: name + "!", lambda name: name.replace(" ", "  "))
+
+def synthetic_places(count, duplicates, seed=42):
+    rnd = random.Random(seed)
+    places = [(i, round(rnd.uniform(*EAST_RANGE), 6), round(rnd.uniform(*NORTH_RANGE), 6),
+               f"{' '.join(rnd.sample(WORDS, rnd.randint(1, 3)))} {i}") for i in range(count)]
+    planted = set()
+    for j in range(duplicates):
+        original = places[rnd.randrange(count)]
+        offset = rnd.uniform(1, 30) / METERS_PER_DEGREE
+        place_id = count + 2 * j
+        places.append((place_id, round(original[1] + offset, 6), original[2], rnd.choice(VARIANTS)(original[3])))
+        planted.add((original[0], place_id))
+        # Csapda: azonos szélesség, távoli pont, más név
+        places.append((place_id + 1, original[1], round(rnd.uniform(*NORTH_RANGE), 6), f"Raktár {place_id + 1}"))
+    rnd.shuffle(places)
+    return places, planted
+
+def naive_pairs(places, radius_m, min_similarity):
+    pairs = []
+    for position, place in enumerate(places):
+        for distance, similarity, other in find_duplicates(place[3], place[1], place[2], places[:position], radius_m, min_similarity):
+            pairs.append((other, place, distance, similarity))
+    return pairs
+
+# Sorrendi szűrés (mint az importnál): egy hely kiesik, ha egy korábban megtartott hely duplikátuma
+def naive_rejected(places, radius_m, min_similarity):
+    kept, rejected = [], []
+    for place in places:
+        if find_duplicates(place[3], place[1], place[2], kept, radius_m, min_similarity):
+            rejected.append(place[0])
+        else:
+            kept.append(place)
+    return rejected
+
+def indexed_rejected(places, radius_m, min_similarity):
+    index = NearDuplicateIndex(max(abs(place[1]) for place in places), radius_m, min_similarity)
+    rejected = []
+    for place in places:
+        if index.find(place[3], place[1], place[2]):
+            rejected.append(place[0])
+        else:
+            index.add(place)
+    return rejected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", default="10000,100000", help="vesszővel elválasztott helyszámok")
+    parser.add_argument("--duplicates", type=int, default=1000)
+    parser.add_argument("--radius-m", type=float, default=DEFAULT_RADIUS_M)
+    parser.add_argument("--similarity", type=float, default=DEFAULT_MIN_SIMILARITY)
+    parser.add_argument("--naive", type=int, default=3000, help="a páronkénti összevetés mintamérete")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"sugár {args.radius_m:g} m, névhasonlóság >= {args.similarity:g}")
+    print(f"{'hely':>8} {'rács (ms)':>10} {'páronként (becsült s)':>22} {'pár':>6} {'beültetett megtalálva':>22} {'csapda':>7}")
+    for count in (int(value) for value in args.places.split(",")):
+        places, planted = synthetic_places(count, args.duplicates)
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            pairs = find_duplicate_pairs(places, args.radius_m, args.similarity)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        found = {tuple(sorted((a[0], b[0]))) for a, b, _, _ in pairs}
+        recall = sum(tuple(sorted(pair)) in found for pair in planted)
+        traps = sum(1 for a, b, _, _ in pairs if a[3].startswith("Raktár") or b[3].startswith("Raktár"))
+        # A páronkénti összevetés ideje a helyek számával négyzetesen nő
+        sample = places[:args.naive]
+        start = time.perf_counter()
+        naive = naive_pairs(sample, args.radius_m, args.similarity)
+        naive_time = (time.perf_counter() - start) * (len(places) / len(sample)) ** 2
+        sample_pairs = {(a[0], b[0]) for a, b, _, _ in naive}
+        assert sample_pairs == {(a[0], b[0]) for a, b, _, _ in find_duplicate_pairs(sample, args.radius_m, args.similarity)}
+        assert naive_rejected(sample, args.radius_m, args.similarity) == indexed_rejected(sample, args.radius_m, args.similarity)
+        print(f"{len(places):>8} {best * 1000:>10.0f} {naive_time:>22.0f} {len(pairs):>6} {f'{recall}/{len(planted)}':>22} {traps:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Térbeli lekérdezések mérése: teljes lista + kliensoldali szűrés vs. rácsindex vs. GiST.
+
+Futtatás:
+    python benchmarks/bench_geo.py --places 300000
+    DATABASE_URL=postgresql://... python benchmarks/bench_geo.py --places 300000 --db
+
+A --db kapcsolóval egy ideiglenes (TEMP) táblán méri a GiST pont indexet is;
+a valódi places táblához nem nyúl.
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geoindex import GridIndex, haversine_m, min_distance_beyond_degrees  # noqa: E402
+
+# Magyarország befoglaló téglalapja (east = szélesség, north = hosszúság, mint a places táblában)
+EAST_RANGE = (45.74, 48.58)
+NORTH_RANGE = (16.11, 22.90)
+
+def synthetic_places(count, seed=42):
+    rnd = random.Random(seed)
+    return [(i, round(rnd.uniform(*EAST_RANGE), 6), round(rnd.uniform(*NORTH_RANGE), 6), f"Hely {i}") for i in range(1, count + 1)]
+
+def random_viewports(count, seed=7, span=0.05):
+    rnd = random.Random(seed)
+    for _ in range(count):
+        east = rnd.uniform(EAST_RANGE[0], EAST_RANGE[1] - span)
+        north = rnd.uniform(NORTH_RANGE[0], NORTH_RANGE[1] - span)
+        yield east, north, east + span, north + span
+
+def random_points(count, seed=11):
+    rnd = random.Random(seed)
+    return [(rnd.uniform(*EAST_RANGE), rnd.uniform(*NORTH_RANGE)) for _ in range(count)]
+
+def timed(func, repeat):
+    samples = []
+    for args in repeat:
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+def full_scan_bbox(places, min_east, min_north, max_east, max_north):
+    return [p for p in places if min_east <= p[1] <= max_east and min_north <= p[2] <= max_north]
+
+def full_scan_nearest(places, east, north, n=10):
+    return sorted(places, key=lambda p: haversine_m(east, north, p[1], p[2]))[:n]
+
+def db_setup(dsn, places):
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE TEMP TABLE bench_places (id integer PRIMARY KEY, east double precision, north double precision, name text)")
+        buffer = io.StringIO("".join(f"{p[0]}\t{p[1]}\t{p[2]}\t{p[3]}\n" for p in places))
+        cursor.copy_from(buffer, "bench_places", columns=("id", "east", "north", "name"))
+        cursor.execute("CREATE INDEX ON bench_places USING gist (point(east, north))")
+        cursor.execute("ANALYZE bench_places")
+    conn.commit()
+    return conn
+
+def db_bbox(conn, min_east, min_north, max_east, max_north):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id, east, north, name FROM bench_places WHERE point(east, north) <@ box(point(%s, %s), point(%s, %s)) ORDER BY name, id LIMIT 5001", (min_east, min_north, max_east, max_north))
+        return cursor.fetchall()
+
+# Az app nearest_places útja: KNN jelöltek, haversine újrarendezés, és bővítés, amíg a
+# be nem olvasott helyek között lehet közelebbi
+def db_nearest(conn, east, north, n=10):
+    limit = n * 4
+    with conn.cursor() as cursor:
+        while True:
+            cursor.execute("SELECT id, east, north, name, point(east, north) <-> point(%s, %s) FROM bench_places "
+                           "ORDER BY point(east, north) <-> point(%s, %s) LIMIT %s", (east, north, east, north, limit))
+            candidates = cursor.fetchall()
+            found = sorted(candidates, key=lambda p: haversine_m(east, north, p[1], p[2]))[:n]
+            if len(candidates) < limit or haversine_m(east, north, found[-1][1], found[-1][2]) <= min_distance_beyond_degrees(east, candidates[-1][4]):
+                return found
+            limit *= 4
+
+def db_full_scan(conn, *args):
+    # A jelenlegi kliens útja: a teljes lista letöltése, majd szűrés
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id, east, north, name FROM bench_places")
+        return cursor.fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--db", action="store_true", help="GiST index mérése a DATABASE_URL adatbázisban")
+    args = parser.parse_args()
+
+    places = synthetic_places(args.places)
+    viewports = list(random_viewports(args.queries))
+    points = random_points(args.queries)
+    scan_queries = max(3, args.queries // 10)
+
+    start = time.perf_counter()
+    index = GridIndex(places)
+    print(f"{args.places} hely, rácsindex felépítése: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"{'módszer':<40} {'medián ms':>10} {'max ms':>10}")
+    rows = [
+        ("bbox / teljes lista szűrése", timed(lambda *v: full_scan_bbox(places, *v), viewports[:scan_queries])),
+        ("bbox / rácsindex", timed(index.bbox, viewports)),
+        ("nearest(10) / teljes lista rendezése", timed(lambda *p: full_scan_nearest(places, *p), points[:scan_queries])),
+        ("nearest(10) / rácsindex", timed(index.nearest, points)),
+    ]
+    if args.db:
+        conn = db_setup(os.environ["DATABASE_URL"], places)
+        rows += [
+            ("teljes lista letöltése a DB-ből", timed(lambda *v: db_full_scan(conn), viewports[:scan_queries])),
+            ("bbox / GiST", timed(lambda *v: db_bbox(conn, *v), viewports)),
+            ("nearest(10) / GiST KNN", timed(lambda *p: db_nearest(conn, *p), points)),
+        ]
+        conn.close()
+    for label, (median, worst) in rows:
+        print(f"{label:<40} {median:>10.2f} {worst:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Tétlen böngészőlapok által keltett ping-forgalom: régi vs. új láthatósági mechanizmus.
+
+Futtatás (Node.js kell hozzá):
+    python benchmarks/bench_ping.py --users 200 --tabs 3
+
+A kliensoldalt ténylegesen lefuttatja: a templates/base.html láthatósági szkriptjét (és
+összevetésként a régi, lapnként 15 másodpercenként pingelő szkriptet) Node alatt,
+felhasználónként --tabs látható, tétlen lappal, közös localStorage-dzsal és virtuális
+órával, --duration másodpercnyi időre, és megszámolja a kiküldött /ping kéréseket.
+A szerveroldalon az új szkript egy felhasználójának kéréssorozatát (a virtuális
+időpontokkal) visszajátssza az appon (Flask test client, memóriabeli felhasználókkal),
+és méri a kérésenkénti kiszolgálási időt és a Set-Cookie fejléces válaszok számát. A régi
+szerver minden válaszban újraírta a sütit, így ott a Set-Cookie a kérések számával egyezik.
+Tétlen lapoknál a 15 perces inaktivitási korlát után a szerver kilépteti a felhasználót;
+a lapok (újratöltésig) ezután is pingelnek, ezeket is számoljuk.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A régi base.html pingje (a sablonkifejezések nélkül): minden látható lap 15 mp-enként
+OLD_CLIENT = """
+    let pingInterval;
+    function startPing() {
+        pingInterval = setInterval(() => {
+            if (document.visibilityState === 'visible') {
+                fetch('/ping', { method: 'GET', credentials: 'include' }).catch(error => console.error('Ping error:', error));
+            }
+        }, 15000);
+    }
+    startPing();
+"""
+
+# Virtuális óra és időzítők, lapokként külön document/window, közös localStorage. A
+# kimenet a kérések listája: [lap, idő ms-ben, URL].
+HARNESS = """
+const [tabs, durationMs, scripts] = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+let now = 0, nextTimer = 1;
+const timers = new Map(), sent = [], store = {};
+const localStorage = {getItem: k => k in store ? store[k] : null, setItem: (k, v) => { store[k] = String(v); }};
+const FakeDate = {now: () => now};
+const results = {};
+for (const [label, source] of Object.entries(scripts)) {
+    for (const k of Object.keys(store)) delete store[k];
+    timers.clear(); sent.length = 0; now = 0;
+    for (let tab = 0; tab < tabs; tab++) {
+        // A lapok az első percben, egymás után nyílnak meg
+        now = Math.floor(tab * 60000 / tabs);
+        const listeners = {};
+        const document = {visibilityState: 'visible', addEventListener: (e, f) => { listeners[e] = f; }};
+        const window = {addEventListener: () => {}};
+        const navigator = {sendBeacon: url => { sent.push([tab, now, url]); return true; }};
+        const fetch = url => { sent.push([tab, now, url]); return Promise.resolve(); };
+        const setInterval = (fn, ms) => { const id = nextTimer++; timers.set(id, {fn, ms, at: now + ms}); return id; };
+        const clearInterval = id => { timers.delete(id); };
+        new Function('document', 'window', 'localStorage', 'navigator', 'fetch', 'setInterval', 'clearInterval', 'Date', source)(
+            document, window, localStorage, navigator, fetch, setInterval, clearInterval, FakeDate);
+    }
+    while (timers.size) {
+        let id = null, due = Infinity;
+        for (const [key, timer] of timers) if (timer.at < due) { id = key; due = timer.at; }
+        if (due > durationMs) break;
+        now = due;
+        const timer = timers.get(id);
+        timer.at += timer.ms;
+        timer.fn();
+    }
+    results[label] = sent.slice();
+}
+console.log(JSON.stringify(results));
+"""
+
+def new_client_script(heartbeat_interval_ms):
+    with open(os.path.join(ROOT, "templates", "base.html"), encoding="utf-8") as f:
+        page = f.read()
+    start = page.index(">", page.index("<script")) + 1
+    script = page[start:page.index("</script>")]
+    return (script.replace("{{ 'true' if session.user else 'false' }}", "true")
+                  .replace("{{ heartbeat_interval_ms }}", str(heartbeat_interval_ms)))
+
+def run_clients(tabs, duration, heartbeat_interval_ms):
+    node = shutil.which("node")
+    if not node:
+        sys.exit("A méréshez Node.js (node) szükséges")
+    scripts = {"old": OLD_CLIENT, "new": new_client_script(heartbeat_interval_ms)}
+    output = subprocess.run([node, "-e", HARNESS], input=json.dumps([tabs, duration * 1000, scripts]),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+# Az új kliens kéréseinek visszajátszása egy felhasználó sessionjével, virtuális idővel
+def replay(poi, requests):
+    client = poi.app.test_client()
+    base = time.time()
+    with client.session_transaction() as sess:
+        # Mint a bejelentkezés után
+        sess.update(user={'email': 'bench@example.com', 'uid': 'bench', 'role': 'user'},
+                    last_activity=int(base), last_seen=int(base))
+    cookies = 0
+    elapsed = 0.0
+    logged_out_at = None
+    for _, at_ms, url in sorted(requests, key=lambda request: request[1]):
+        # A süti aláírása is ezt az órát használja, ezért a session ellenőrzése is alatta fut
+        with mock.patch.object(poi.time, "time", return_value=base + at_ms / 1000):
+            start = time.perf_counter()
+            response = client.get(url)
+            elapsed += time.perf_counter() - start
+            if logged_out_at is None:
+                with client.session_transaction() as sess:
+                    if 'user' not in sess:
+                        logged_out_at = at_ms / 1000
+        assert response.status_code == 204, response.status_code
+        cookies += 'Set-Cookie' in response.headers
+    return elapsed / max(len(requests), 1), cookies, logged_out_at
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tabs", type=int, default=2, help="nyitott, látható lapok felhasználónként")
+    parser.add_argument("--duration", type=int, default=3600, help="szimulált időtartam másodpercben")
+    args = parser.parse_args()
+
+    os.environ.setdefault("USER_DIRECTORY", "memory")
+    import app as poi
+    # A séma ellenőrzése ne az első mért kérésre essen
+    poi.create_app()
+    heartbeat_interval_ms = int(poi.session_timeout.heartbeat_interval * 1000)
+    sent = run_clients(args.tabs, args.duration, heartbeat_interval_ms)
+    per_request, new_cookies, logged_out_at = replay(poi, sent["new"])
+    old_requests = len(sent["old"]) * args.users
+    new_requests = len(sent["new"]) * args.users
+    print(f"{args.users} felhasználó x {args.tabs} tétlen lap, {args.duration} mp")
+    print(f"{'séma':<8} {'kérés':>10} {'kérés/mp':>10} {'Set-Cookie':>12} {'szerver CPU (mp)':>17}")
+    print(f"{'régi':<8} {old_requests:>10} {old_requests / args.duration:>10.2f} {old_requests:>12} {old_requests * per_request:>17.2f}")
+    print(f"{'új':<8} {new_requests:>10} {new_requests / args.duration:>10.2f} {new_cookies * args.users:>12} {new_requests * per_request:>17.2f}")
+    print(f"megtakarítás: {(old_requests - new_requests) / args.duration:.2f} kérés/mp ({old_requests / max(new_requests, 1):.0f}x kevesebb); "
+          f"/ping kiszolgálása {per_request * 1e6:.0f} µs/kérés (a régi sor ugyanezzel a kérésenkénti idővel becsülve)")
+    if logged_out_at is not None:
+        # A tétlen lapok csak pingelnek, ez nem számít aktivitásnak
+        print(f"az új szerver a felhasználót {logged_out_at:.0f} mp után inaktivitás miatt kiléptette")
+
+if __name__ == "__main__":
+    main()
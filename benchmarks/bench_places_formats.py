@@ -0,0 +1,88 @@
+"""Az /api/places válaszformátumainak mérése: szerializálási idő és átvitt bájtok.
+
+Futtatás:
+    python benchmarks/bench_places_formats.py --places 100000
+
+A helyeket szintetikusan generálja (adatbázis nem kell), és minden formátumra
+(json, columns, msgpack, f32) méri a szerializálás idejét, valamint a válasz méretét
+tömörítés nélkül, gzip-pel és (ha a brotli csomag telepítve van) br-rel.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from places_formats import (POINT_BUFFER_FIELDS, available_encodings, available_formats, compress_body,  # noqa: E402
+                            decode_point_buffer, encode_columns, encode_point_buffer)
+
+EAST_RANGE = (45.74, 48.58)
+NORTH_RANGE = (16.11, 22.90)
+FIELDS = ("id", "name", "east", "north", "address", "notes")
+
+# Az app ugyanezzel a JSON providerrel szerializál
+dumps = Flask(__name__).json.dumps
+
+def synthetic_rows(count, seed=42):
+    rnd = random.Random(seed)
+    return [(i, f"Hely {i}", round(rnd.uniform(*EAST_RANGE), 6), round(rnd.uniform(*NORTH_RANGE), 6),
+             f"Utca {i}, Város", "megjegyzés" if rnd.random() < 0.2 else "") for i in range(1, count + 1)]
+
+# Mindegyik a lekérdezés eredményéből (tuple sorok) indul, mint az app
+def encode_json(rows):
+    return dumps([dict(zip(FIELDS, row)) for row in rows]).encode("utf-8")
+
+def encode_format(fmt, rows):
+    if fmt == "json":
+        return encode_json(rows)
+    fields = POINT_BUFFER_FIELDS if fmt == "f32" else FIELDS
+    indexes = [FIELDS.index(field) for field in fields]
+    columns = {field: [row[i] for row in rows] for field, i in zip(fields, indexes)}
+    if fmt == "f32":
+        return encode_point_buffer(columns)
+    return encode_columns(columns, None, fmt, dumps)
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.places)
+    encodings = available_encodings()
+    print(f"{args.places} hely; formátumok: {', '.join(available_formats())}; tömörítés: {', '.join(encodings)}")
+    header = f"{'formátum':<10} {'szerializálás (ms)':>19} {'nyers (KB)':>11}"
+    for encoding in encodings:
+        header += f" {encoding + ' (KB)':>10} {encoding + ' (ms)':>10}"
+    print(header)
+    baseline = None
+    for fmt in available_formats():
+        serialize_time, body = best_of(lambda: encode_format(fmt, rows), args.repeat)
+        if fmt == "f32":
+            ids, coordinates = decode_point_buffer(body)
+            assert len(ids) == args.places and abs(float(coordinates[1][0]) - rows[1][2]) < 1e-5
+        line = f"{fmt:<10} {serialize_time * 1000:>19.1f} {len(body) / 1024:>11.0f}"
+        for encoding in encodings:
+            compress_time, compressed = best_of(lambda: compress_body(body, encoding), args.repeat)
+            line += f" {len(compressed) / 1024:>10.0f} {compress_time * 1000:>10.1f}"
+            if fmt == "json" and encoding == "gzip":
+                baseline = len(compressed)
+        print(line)
+    if baseline:
+        print(f"(a json + gzip {baseline / 1024:.0f} KB a viszonyítási alap)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Távolságmátrix és bejárási sorrend: NumPy tömbök vs. páronkénti Python számítás.
+
+Futtatás:
+    python benchmarks/bench_routing.py --places 1000000 --stops 100,300,500
+
+Szintetikus helyekből (adatbázis nem kell) építi fel a koordináta pillanatképet, majd
+megállószámonként --repeat véletlen megállólistán méri:
+- a távolságmátrixot a PlaceCoordinates-en és páronként a geoindex.haversine_m-mel,
+- a mátrix JSON és bináris (u32) kódolását,
+- a legközelebbi szomszéd + 2-opt bejárási sorrendet, az út hosszát a puszta
+  legközelebbi szomszédhoz és a megadott (véletlen) sorrendhez viszonyítva.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geoindex import haversine_m  # noqa: E402
+from routing import (PlaceCoordinates, encode_distance_matrix, nearest_neighbour_order, route_length,  # noqa: E402
+                     visit_order)
+
+# Magyarország befoglaló téglalapja (east = szélesség, north = hosszúság, mint a places táblában)
+EAST_RANGE = (45.74, 48.58)
+NORTH_RANGE = (16.11, 22.90)
+
+def synthetic_coordinates(count, seed=42):
+    rnd = np.random.default_rng(seed)
+    ids = rnd.permutation(np.arange(1, count + 1))
+    return ids, rnd.uniform(*EAST_RANGE, count).round(6), rnd.uniform(*NORTH_RANGE, count).round(6)
+
+def pairwise_matrix(points):
+    return [[haversine_m(east1, north1, east2, north2) for east2, north2 in points] for east1, north1 in points]
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=1000000)
+    parser.add_argument("--stops", default="100,300,500", help="vesszővel elválasztott megállószámok")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ids, east, north = synthetic_coordinates(args.places)
+    elapsed, coordinates = timed(lambda: PlaceCoordinates(ids, east, north))
+    print(f"pillanatkép: {args.places} hely, {elapsed * 1000:.0f} ms, "
+          f"{(coordinates.ids.nbytes + coordinates.lat.nbytes + coordinates.lon.nbytes) / 2 ** 20:.0f} MB")
+    points = dict(zip(ids.tolist(), zip(east.tolist(), north.tolist())))
+    rnd = random.Random(7)
+    print(f"{'megálló':>8} {'mátrix (ms)':>12} {'páronként (ms)':>15} {'JSON (ms)':>10} {'u32 (ms)':>9} "
+          f"{'sorrend (ms)':>13} {'út / legk. szomszéd':>20} {'út / megadott':>14}")
+    for stops in (int(value) for value in args.stops.split(",")):
+        results = {name: [] for name in ("matrix", "pairwise", "json", "u32", "order", "vs_nn", "vs_given")}
+        for _ in range(args.repeat):
+            selected = rnd.sample(range(1, args.places + 1), stops)
+            elapsed, matrix = timed(lambda: coordinates.distance_matrix(selected))
+            results["matrix"].append(elapsed)
+            elapsed, pairwise = timed(lambda: pairwise_matrix([points[place_id] for place_id in selected]))
+            results["pairwise"].append(elapsed)
+            assert np.allclose(matrix, pairwise, rtol=0, atol=1e-3)
+            results["json"].append(timed(lambda: json.dumps({"ids": selected, "distances_m": matrix.round().astype(int).tolist()}))[0])
+            results["u32"].append(timed(lambda: encode_distance_matrix(selected, matrix))[0])
+            elapsed, order = timed(lambda: visit_order(coordinates.distance_matrix(selected)))
+            results["order"].append(elapsed)
+            length = route_length(matrix, order)
+            results["vs_nn"].append(length / route_length(matrix, nearest_neighbour_order(matrix)))
+            results["vs_given"].append(length / route_length(matrix, np.arange(stops)))
+        median = {name: statistics.median(values) for name, values in results.items()}
+        print(f"{stops:>8} {median['matrix'] * 1000:>12.1f} {median['pairwise'] * 1000:>15.0f} {median['json'] * 1000:>10.1f} "
+              f"{median['u32'] * 1000:>9.1f} {median['order'] * 1000:>13.1f} {median['vs_nn']:>20.3f} {median['vs_given']:>14.3f}")
+
+if __name__ == "__main__":
+    main()
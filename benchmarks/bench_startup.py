@@ -0,0 +1,121 @@
+"""Hidegindítás mérése: gunicorn indítástól az első kiszolgált kérésig.
+
+Futtatás (a szokásos DATABASE_URL / FIREBASE_CONFIG környezettel):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --app app:app --no-preload   # a régi indítás
+
+Minden körben elindítja a gunicornt, és a --path címet pollozza az első 200-as
+válaszig. Ezután --workers * 4 párhuzamos kérést küld, hogy minden worker
+kiszolgáljon legalább egyet ("mind kész"), végül a workerek memóriáját is jelenti
+(RSS és, ha a psutil elérhető, a megosztott lapokat arányosan számoló PSS).
+Külön méri az app modul importjának idejét is.
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def get_status(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+def worker_memory(master_pid):
+    if psutil is None:
+        return None, None
+    rss = pss = 0
+    for child in psutil.Process(master_pid).children():
+        try:
+            info = child.memory_full_info()
+        except psutil.Error:
+            continue
+        rss += info.rss
+        pss += getattr(info, "pss", 0)
+    return rss / 2**20, pss / 2**20
+
+def one_start(args):
+    port = free_port()
+    command = [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-b", f"127.0.0.1:{port}", "--chdir", REPO_DIR]
+    if args.preload:
+        command.append("--preload")
+    command.append(args.app)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first = None
+        while time.perf_counter() - start < args.timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"A gunicorn leállt (kilépési kód: {process.returncode})")
+            try:
+                if get_status(port, args.path) == 200:
+                    first = time.perf_counter() - start
+                    break
+            except OSError:
+                pass
+            time.sleep(0.01)
+        if first is None:
+            raise RuntimeError("Nem érkezett válasz az időkorláton belül")
+        threads = [threading.Thread(target=get_status, args=(port, args.path)) for _ in range(args.workers * 4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        everyone = time.perf_counter() - start
+        time.sleep(1)
+        rss, pss = worker_memory(process.pid)
+        return first, everyone, rss, pss
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(30)
+
+def import_time(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="app:create_app()")
+    parser.add_argument("--no-preload", dest="preload", action="store_false")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--path", default="/api/places?limit=1")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    imports = [import_time("app") for _ in range(args.repeat)]
+    runs = [one_start(args) for _ in range(args.repeat)]
+    median = lambda values: statistics.median(values) if all(v is not None for v in values) else None
+    print(f"{args.app} ({args.workers} worker, {'--preload' if args.preload else 'preload nélkül'}), {args.repeat} kör mediánja:")
+    print(f"  app import:            {median(imports) * 1000:8.0f} ms")
+    print(f"  első válasz:           {median([r[0] for r in runs]) * 1000:8.0f} ms")
+    print(f"  minden worker válaszolt: {median([r[1] for r in runs]) * 1000:6.0f} ms")
+    rss, pss = median([r[2] for r in runs]), median([r[3] for r in runs])
+    if rss is not None:
+        print(f"  workerek memóriája:    {rss:8.0f} MB RSS, {pss:.0f} MB PSS")
+
+if __name__ == "__main__":
+    main()
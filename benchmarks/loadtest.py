@@ -0,0 +1,519 @@
+"""Terheléses mérés: az app gunicorn (vagy uvicorn) alatt, párhuzamos kliensekkel, szintetikus adatokon.
+
+Futtatás:
+    DATABASE_URL=postgresql://... python benchmarks/loadtest.py --sizes 1000,100000,1000000
+    python benchmarks/loadtest.py --compare eredmeny-regi.json eredmeny-uj.json
+
+Minden adatméretre (--sizes) újratölti a --schema sémát (alapból "loadtest";
+a PGOPTIONS search_path-szal az app ezt látja places táblaként, így a public
+sémához nem nyúl), elindítja a gunicornt (benchmarks/loadtest_app.py, Firebase
+helyett memóriabeli felhasználókezeléssel; --server uvicorn esetén az aszinkron
+módot, benchmarks/loadtest_asgi.py), bejelentkezik, majd végpontonként
+--duration másodpercig --concurrency párhuzamos klienssel terhel. A teljes táblát
+visszaadó végpontok (teljes lista, export) --heavy-concurrency klienssel futnak,
+a CSV import pedig egymás után --import-runs alkalommal, a feladat befejezéséig mérve.
+
+Végpontonként p50/p90/p99 válaszidőt, átbocsátást és a workerek
+memóriáját (RSS összeg: előtte, csúcs, utána) jelenti, és az eredményt JSON-ba
+írja (--output, alapból benchmarks/results/loadtest-<commit>-<idő>.json).
+A --compare két ilyen fájlt vet össze; --threshold fölötti p99 romlásnál 1-gyel lép ki.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import datetime, UTC
+
+import psycopg2
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+LOADTEST_USER = "loadtest@example.com"
+
+# Egyedi koordináták mikrofokos rácson (az app egyedi indexei miatt). A feltöltés a rács
+# első részéből mintavételez, az importok a fennmaradó részből kapnak sorban értékeket.
+EAST_MIN, NORTH_MIN = 45.74, 16.11
+EAST_SEED_SLOTS, NORTH_SEED_SLOTS = 2_000_000, 6_000_000
+SEED_CHUNK_ROWS = 100_000
+
+def endpoint_scenarios(rnd_viewport, rnd_point):
+    # (név, elérési út generátor, nehéz-e)
+    return [
+        ("index", lambda rnd: "/", False),
+        ("index_search", lambda rnd: "/?search=" + urllib.parse.quote(f"Hely {rnd.randrange(1000):03d}"), False),
+        ("api_places_page", lambda rnd: "/api/places?limit=100", False),
+        ("api_places_search", lambda rnd: f"/api/places?limit=100&q=hely+{rnd.randrange(1000):03d}", False),
+        ("api_places_bbox", lambda rnd: "/api/places/bbox?bbox=" + ",".join(f"{v:.5f}" for v in rnd_viewport(rnd)), False),
+        ("api_places_nearest", lambda rnd: "/api/places/nearest?east={:.5f}&north={:.5f}&n=20".format(*rnd_point(rnd)), False),
+        ("api_places_changes", lambda rnd: "/api/places/changes?limit=1000", False),
+        ("api_places_full", lambda rnd: "/api/places", True),
+        ("api_places_f32", lambda rnd: "/api/places?format=f32", True),
+        ("export_csv", lambda rnd: "/export", True),
+    ]
+
+def random_viewport(rnd, span=0.05):
+    east = rnd.uniform(45.74, 48.58 - span)
+    north = rnd.uniform(16.11, 22.90 - span)
+    return east, north, east + span, north + span
+
+def random_point(rnd):
+    return rnd.uniform(45.74, 48.58), rnd.uniform(16.11, 22.90)
+
+# --- adatbázis ---
+
+def reset_schema(dsn, schema, size, seed=42):
+    rnd = random.Random(seed)
+    east_slots = rnd.sample(range(EAST_SEED_SLOTS), size)
+    north_slots = rnd.sample(range(NORTH_SEED_SLOTS), size)
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+            cursor.execute(f'CREATE SCHEMA "{schema}"')
+            # A régi séma alapja; a többit (indexek, triggerek, segédtáblák) az app indításkor pótolja
+            cursor.execute(f'''CREATE TABLE "{schema}".places (
+                id serial PRIMARY KEY,
+                name text NOT NULL,
+                east double precision NOT NULL,
+                north double precision NOT NULL,
+                address text,
+                notes text
+            )''')
+            for start in range(0, size, SEED_CHUNK_ROWS):
+                buffer = io.StringIO()
+                for i in range(start, min(start + SEED_CHUNK_ROWS, size)):
+                    east = round(EAST_MIN + east_slots[i] * 1e-6, 6)
+                    north = round(NORTH_MIN + north_slots[i] * 1e-6, 6)
+                    notes = "megjegyzés" if i % 5 == 0 else ""
+                    buffer.write(f"Hely {i:07d}\t{east}\t{north}\tUtca {i % 997}, Város {i % 3109}\t{notes}\n")
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY "{schema}".places (name, east, north, address, notes) FROM STDIN', buffer)
+            cursor.execute(f'ANALYZE "{schema}".places')
+        conn.commit()
+    finally:
+        conn.close()
+
+def drop_schema(dsn, schema):
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+        conn.commit()
+    finally:
+        conn.close()
+
+# --- szerver ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(args, port, upload_dir, log_file):
+    env = dict(os.environ)
+    env.update(
+        PGOPTIONS=f"-c search_path={args.schema},public",
+        USER_DIRECTORY="memory",
+        LOADTEST_USER=LOADTEST_USER,
+        APP_ENV="production",
+        IMPORT_UPLOAD_DIR=upload_dir,
+    )
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    if args.server == "uvicorn":
+        command = [sys.executable, "-m", "uvicorn", "--workers", str(args.workers), "--host", "127.0.0.1",
+                   "--port", str(port), "--app-dir", BENCH_DIR, "--no-access-log", "loadtest_asgi:app"]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-b", f"127.0.0.1:{port}",
+                   "--timeout", "600", "--chdir", BENCH_DIR, "loadtest_app:app"]
+    process = subprocess.Popen(command, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"A(z) {args.server} leállt indulás közben (kilépési kód: {process.returncode})")
+        try:
+            status, _, _ = Client(port).request("GET", "/api/places?limit=1")
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_server(process)
+    raise RuntimeError(f"A(z) {args.server} {args.startup_timeout} mp alatt nem indult el")
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def worker_pids(master_pid):
+    if psutil:
+        return [child.pid for child in psutil.Process(master_pid).children()]
+    pids = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # a 4. mező a szülő pid; a 2. (comm) szóközt is tartalmazhat, ezért a ")" után bontunk
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == master_pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return pids
+
+def rss_bytes(pid):
+    if psutil:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+# Egyetlen uvicorn worker külön felügyelő folyamat nélkül fut, ekkor maga a folyamat a worker
+def workers_rss(master_pid):
+    return sum(rss_bytes(pid) for pid in worker_pids(master_pid) or [master_pid])
+
+class MemorySampler(threading.Thread):
+    def __init__(self, master_pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak = workers_rss(master_pid)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, workers_rss(self.master_pid))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+# --- kliens ---
+
+class Client:
+    def __init__(self, port, cookie=None, timeout=600):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        self.cookie = cookie
+
+    # (státusz, fejlécek, bájtok száma); a törzset darabonként olvassuk, nem tartjuk meg
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            size = 0
+            while chunk := response.read(65536):
+                size += len(chunk)
+            return response.status, response, size
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            raise
+
+    def get_json(self, path):
+        headers = {"Cookie": self.cookie} if self.cookie else {}
+        try:
+            self.conn.request("GET", path, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, json.loads(response.read())
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            raise
+
+def login(port):
+    status, response, _ = Client(port).request("POST", "/login", body=urllib.parse.urlencode({"email": LOADTEST_USER, "password": "x"}),
+                                              headers={"Content-Type": "application/x-www-form-urlencoded"})
+    cookie = (response.getheader("Set-Cookie") or "").split(";", 1)[0]
+    if status != 302 or not cookie.startswith("session="):
+        raise RuntimeError(f"Sikertelen bejelentkezés (státusz: {status})")
+    return cookie
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def summarize(name, size, concurrency, latencies, errors, total_bytes, elapsed, rss_before, rss_peak, rss_after, **extra):
+    latencies = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 2)
+    result = {
+        "size": size,
+        "endpoint": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p90_ms": ms(percentile(latencies, 0.90)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "mean_ms": ms(sum(latencies) / len(latencies) if latencies else None),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mb_per_s": round(total_bytes / elapsed / 1e6, 2) if elapsed else None,
+        "rss_before_mb": round(rss_before / 2**20, 1),
+        "rss_peak_mb": round(rss_peak / 2**20, 1),
+        "rss_after_mb": round(rss_after / 2**20, 1),
+    }
+    result.update(extra)
+    return result
+
+def run_endpoint(port, master_pid, cookie, size, name, make_path, concurrency, duration, warmup, seed):
+    # Bemelegítés (gyorsítótárak, kapcsolatok), ami nem számít bele az eredménybe
+    warm = Client(port, cookie)
+    for i in range(warmup):
+        warm.request("GET", make_path(random.Random(seed + i)))
+    latencies, errors, total_bytes = [], [0], [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(index):
+        rnd = random.Random(seed * 1000 + index)
+        client = Client(port, cookie)
+        local, local_errors, local_bytes = [], 0, 0
+        barrier.wait()
+        while True:
+            start = time.perf_counter()
+            if start >= deadline[0] and local:
+                break
+            try:
+                status, _, size_ = client.request("GET", make_path(rnd))
+                ok = status == 200
+                local_bytes += size_
+            except (http.client.HTTPException, OSError):
+                ok = False
+            local.append(time.perf_counter() - start)
+            local_errors += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+            total_bytes[0] += local_bytes
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    rss_before = workers_rss(master_pid)
+    sampler = MemorySampler(master_pid)
+    sampler.start()
+    started = time.perf_counter()
+    deadline[0] = started + duration
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    rss_peak = sampler.stop()
+    return summarize(name, size, concurrency, latencies, errors[0], total_bytes[0], elapsed,
+                     rss_before, rss_peak, workers_rss(master_pid))
+
+def import_csv_body(rows, offset):
+    lines = ["Név,Kelet,Észak,Cím,Megjegyzések"]
+    for i in range(rows):
+        slot = offset + i
+        lines.append(f"Import {slot:08d},{EAST_MIN + (EAST_SEED_SLOTS + slot) * 1e-6:.6f},"
+                     f"{NORTH_MIN + (NORTH_SEED_SLOTS + slot) * 1e-6:.6f},\"Utca {i}, Város\",import")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def multipart_body(field, filename, data):
+    boundary = "loadtest" + os.urandom(8).hex()
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n").encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+# Az import háttérfeladat: a mért idő a feltöltéstől a feladat befejezéséig tart
+def run_import(port, master_pid, cookie, size, rows, runs, offset=0):
+    client = Client(port, cookie)
+    latencies, submit_latencies, errors = [], [], 0
+    rss_before = workers_rss(master_pid)
+    sampler = MemorySampler(master_pid)
+    sampler.start()
+    started = time.perf_counter()
+    for run in range(runs):
+        body, content_type = multipart_body("file", f"loadtest-{run}.csv", import_csv_body(rows, offset + run * rows))
+        start = time.perf_counter()
+        status, response, _ = client.request("POST", "/import", body=body, headers={"Content-Type": content_type})
+        submit_latencies.append(time.perf_counter() - start)
+        location = response.getheader("Location") or ""
+        if status != 302 or "/import/" not in location:
+            errors += 1
+            continue
+        job_id = location.rstrip("/").rsplit("/", 1)[1]
+        while True:
+            status, job = client.get_json(f"/api/import/{job_id}")
+            if status != 200:
+                errors += 1
+                break
+            if job["status"] in ("done", "failed"):
+                if job["status"] != "done" or job["imported"] != rows:
+                    errors += 1
+                break
+            time.sleep(0.1)
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    rss_peak = sampler.stop()
+    submit_latencies.sort()
+    return summarize("import_csv", size, 1, latencies, errors, 0, elapsed, rss_before, rss_peak, workers_rss(master_pid),
+                     import_rows=rows, submit_p50_ms=round(percentile(submit_latencies, 0.5) * 1000, 2),
+                     rows_per_s=round(rows * len(latencies) / sum(latencies), 1) if latencies else None)
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "ismeretlen"
+
+def print_header():
+    print(f"{'méret':>8} {'végpont':<20} {'kérés':>6} {'hiba':>5} {'p50 ms':>9} {'p99 ms':>9} {'kérés/s':>8} {'RSS csúcs MB':>13}")
+
+def print_results(results):
+    for r in results:
+        print(f"{r['size']:>8} {r['endpoint']:<20} {r['requests']:>6} {r['errors']:>5} {r['p50_ms'] or 0:>9.1f} "
+              f"{r['p99_ms'] or 0:>9.1f} {r['throughput_rps'] or 0:>8.1f} {r['rss_peak_mb']:>13.1f}")
+
+def run(args):
+    dsn = args.database_url
+    if not dsn:
+        sys.exit("DATABASE_URL (vagy --database-url) szükséges")
+    if args.schema == "public":
+        sys.exit("A public séma nem használható, a mérés minden méretnél eldobja a sémát")
+    selected = set(args.endpoints.split(",")) if args.endpoints else None
+    scenarios = [s for s in endpoint_scenarios(random_viewport, random_point) if selected is None or s[0] in selected]
+    results = []
+    meta = {
+        "commit": git_commit(),
+        "started_at": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "server": args.server,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "heavy_concurrency": args.heavy_concurrency,
+        "duration_s": args.duration,
+        "env": args.env,
+    }
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+        for size in args.sizes:
+            print(f"== {size} hely: feltöltés...", flush=True)
+            start = time.perf_counter()
+            reset_schema(dsn, args.schema, size)
+            print(f"   feltöltve {time.perf_counter() - start:.1f} mp alatt; {args.server} indítása ({args.workers} worker)...", flush=True)
+            port = free_port()
+            log_path = os.path.join(tmp, f"{args.server}-{size}.log")
+            with open(log_path, "w") as log_file:
+                start = time.perf_counter()
+                try:
+                    process = start_server(args, port, tmp, log_file)
+                except RuntimeError:
+                    with open(log_path) as f:
+                        print(f.read()[-4000:], file=sys.stderr)
+                    raise
+                startup = time.perf_counter() - start
+                try:
+                    cookie = login(port)
+                    print_header()
+                    for name, make_path, heavy in scenarios:
+                        concurrency = args.heavy_concurrency if heavy else args.concurrency
+                        result = run_endpoint(port, process.pid, cookie, size, name, make_path, concurrency,
+                                              args.duration, 1 if heavy else args.warmup, args.seed)
+                        result["startup_s"] = round(startup, 2)
+                        results.append(result)
+                        print_results([result])
+                    if selected is None or "import_csv" in selected:
+                        result = run_import(port, process.pid, cookie, size, args.import_rows, args.import_runs)
+                        results.append(result)
+                        print_results([result])
+                finally:
+                    stop_server(process)
+        if not args.keep_schema:
+            drop_schema(dsn, args.schema)
+    meta["finished_at"] = datetime.now(UTC).isoformat()
+    output = args.output or os.path.join(BENCH_DIR, "results", f"loadtest-{meta['commit']}-{datetime.now(UTC):%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, ensure_ascii=False)
+    print()
+    print_header()
+    print_results(results)
+    print(f"eredmény: {output}")
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    old_results = {(r["size"], r["endpoint"]): r for r in old["results"]}
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    print(f"{'méret':>8} {'végpont':<20} {'p50 ms':>20} {'p99 ms':>20} {'kérés/s':>20}")
+    regressions = []
+    change = lambda a, b: f"{a or 0:.1f}→{b or 0:.1f} ({(b / a - 1) * 100:+.0f}%)" if a and b else f"{a}→{b}"
+    for r in new["results"]:
+        o = old_results.get((r["size"], r["endpoint"]))
+        if o is None:
+            continue
+        print(f"{r['size']:>8} {r['endpoint']:<20} {change(o['p50_ms'], r['p50_ms']):>20} "
+              f"{change(o['p99_ms'], r['p99_ms']):>20} {change(o['throughput_rps'], r['throughput_rps']):>20}")
+        if o["p99_ms"] and r["p99_ms"] and r["p99_ms"] > o["p99_ms"] * (1 + threshold / 100):
+            regressions.append((r["size"], r["endpoint"]))
+    if regressions:
+        print(f"p99 romlás {threshold:.0f}% fölött: " + ", ".join(f"{endpoint} ({size})" for size, endpoint in regressions))
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--schema", default="loadtest", help="a mérés ezt a sémát tölti fel és dobja el")
+    parser.add_argument("--sizes", type=lambda value: [int(v) for v in value.split(",")], default=[1000, 100000])
+    parser.add_argument("--server", choices=("gunicorn", "uvicorn"), default="gunicorn",
+                        help="szinkron (gunicorn, Procfile) vagy aszinkron (uvicorn asgi:app) kiszolgálás")
+    parser.add_argument("--workers", type=int, default=4, help="workerek száma (mint a Procfile-ban)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--heavy-concurrency", type=int, default=2, help="párhuzamosság a teljes táblát adó végpontoknál")
+    parser.add_argument("--duration", type=float, default=10.0, help="végpontonkénti mérési idő (mp)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--endpoints", help="vesszővel elválasztott végpontnevek (alapból mind, plusz import_csv)")
+    parser.add_argument("--import-rows", type=int, default=10000)
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("--env", action="append", default=[], metavar="KULCS=ÉRTÉK", help="további környezetváltozó az apphoz")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-schema", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("RÉGI", "ÚJ"))
+    parser.add_argument("--threshold", type=float, default=20.0, help="megengedett p99 romlás (%%) a --compare-nél")
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+    run(args)
+
+if __name__ == "__main__":
+    main()
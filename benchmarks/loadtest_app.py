@@ -0,0 +1,17 @@
+"""A terheléses méréshez indított app (gunicorn loadtest_app:app).
+
+Memóriabeli felhasználókezeléssel fut (Firebase nélkül), és létrehozza a mérő
+admin felhasználót, amellyel a kliensek bejelentkeznek.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["USER_DIRECTORY"] = "memory"
+
+import app as poi  # noqa: E402
+
+LOADTEST_USER = os.environ.get("LOADTEST_USER", "loadtest@example.com")
+
+app = poi.create_app()
+poi.user_directory.create_user(LOADTEST_USER, None, "admin")
@@ -0,0 +1,10 @@
+"""A terheléses méréshez indított aszinkron app (uvicorn loadtest_asgi:app).
+
+Ugyanaz, mint a loadtest_app (memóriabeli felhasználók, mérő admin), az asgi.py
+aszinkron kiszolgálásával.
+"""
+from loadtest_app import poi  # noqa: F401  (beállítja a környezetet és létrehozza a mérő felhasználót)
+
+import asgi  # noqa: E402
+
+app = asgi.app
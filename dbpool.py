@@ -0,0 +1,338 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+# OperationalError leszármazott, így a meglévő "Adatbázis kapcsolati hiba" ágak kezelik
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+# Szálbiztos kapcsolat pool (a waitress szálakon szolgál ki, a SimpleConnectionPool ehhez nem jó).
+# - legfeljebb maxconn kapcsolat, üres pool esetén korlátos várakozás (timeout) alvás-újrapróbálás helyett
+# - ellenőrző SELECT 1 csak akkor, ha a kapcsolat idle_check másodpercnél régebben állt,
+#   vagy az előző használatnál kapcsolati hiba történt
+# - a visszaadott kapcsolat nyitott tranzakcióját visszagörgeti, a halott kapcsolatot eldobja
+# - a konstruktor nem nyit kapcsolatot; a prewarm() (pl. háttérszálból) tölti fel minconn-ig,
+#   különben az első kiadások nyitják meg. Fork után (gunicorn --preload) a gyermek folyamat
+#   nem használja a szülő kapcsolatait: üres poollal indul, a szülőét pedig nem zárja le.
+# - wait_observer: opcionális függvény, amely minden várakozással járó kiadás után megkapja
+#   a várakozás idejét (mp); a zár alatt hívódik, ezért gyorsnak kell lennie
+# - session_options: a megnyitott kapcsolatok set_session() beállításai (pl. csak olvasó replika)
+# - statement_timeout (kiadásonként, ms; None = a szerver alapértéke): munkamenet szinten
+#   állítjuk be, és kapcsolatonként megjegyezzük, így csak akkor kerül egy körbe, ha az
+#   előző használat más értéket kért
+class ConnectionPool:
+    def __init__(self, dsn, minconn=1, maxconn=5, timeout=5.0, idle_check=30.0, wait_observer=None,
+                 session_options=None, **connect_kwargs):
+        if maxconn < 1 or minconn > maxconn:
+            raise ValueError("Érvénytelen pool méret: minconn <= maxconn és maxconn >= 1 kell")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self.wait_observer = wait_observer
+        self.session_options = session_options
+        self.connect_kwargs = connect_kwargs
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []  # (kapcsolat, utolsó használat ideje, gyanús-e)
+        self._size = 0
+        self._statement_timeouts = {}  # kapcsolat -> beállított statement_timeout (ms)
+        self._cond = threading.Condition()
+        self._stats = {"checkouts": 0, "waits": 0, "wait_time": 0.0, "timeouts": 0, "broken": 0, "created": 0, "validations": 0}
+
+    def _check_fork(self):
+        # A szülőtől örökölt kapcsolatokat (és az esetleg zárolt Condition-t) eldobjuk; a close()
+        # a közös socketen a szülő kapcsolatát is lezárná, ezért csak elengedjük őket
+        if self._pid != os.getpid():
+            self._reset()
+
+    # Feltöltés minconn nyitott kapcsolatig; a visszatérési érték a megnyitott kapcsolatok száma
+    def prewarm(self):
+        self._check_fork()
+        opened = 0
+        while True:
+            with self._cond:
+                if self._size >= self.minconn:
+                    return opened
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                self._discard(None)
+                raise
+            opened += 1
+            self.putconn(conn)
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        if self.session_options:
+            conn.set_session(**self.session_options)
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def getconn(self, timeout=None, statement_timeout=None):
+        self._check_fork()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = None
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if waited is None:
+                        waited = time.monotonic()
+                        self._stats["waits"] += 1
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        self._record_wait(time.monotonic() - waited)
+                        raise PoolTimeout(f"Nincs szabad adatbázis kapcsolat {timeout:.1f} mp várakozás után")
+                    self._cond.wait(remaining)
+                if waited is not None:
+                    self._record_wait(time.monotonic() - waited)
+                    waited = None
+                if self._idle:
+                    # LIFO: a legutóbb használt kapcsolat a legvalószínűbb, hogy még él
+                    conn, last_used, suspect = self._idle.pop()
+                else:
+                    self._size += 1
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._discard(None)
+                    raise
+            elif suspect or conn.closed or time.monotonic() - last_used > self.idle_check:
+                if not self._validate(conn):
+                    self._discard(conn)
+                    continue
+            if self._statement_timeouts.get(conn) != statement_timeout:
+                try:
+                    self._set_statement_timeout(conn, statement_timeout)
+                except psycopg2.Error as e:
+                    logger.warning(f"A statement_timeout beállítása nem sikerült, a kapcsolat eldobva: {str(e).strip()}")
+                    self._discard(conn)
+                    continue
+            with self._cond:
+                self._stats["checkouts"] += 1
+            return conn
+
+    def _record_wait(self, seconds):
+        self._stats["wait_time"] += seconds
+        if self.wait_observer is not None:
+            self.wait_observer(seconds)
+
+    # Autocommitban egyetlen kör; tranzakción belül a visszagörgetés visszavonná
+    def _set_statement_timeout(self, conn, statement_timeout):
+        autocommit = conn.autocommit
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                if statement_timeout is None:
+                    cursor.execute("SET statement_timeout TO DEFAULT")
+                else:
+                    cursor.execute("SET statement_timeout = %s", (int(statement_timeout),))
+        finally:
+            conn.autocommit = autocommit
+        self._statement_timeouts[conn] = statement_timeout
+
+    def _validate(self, conn):
+        with self._cond:
+            self._stats["validations"] += 1
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Érvénytelen kapcsolat eldobva: {str(e).strip()}")
+            return False
+
+    def _discard(self, conn):
+        if conn is not None:
+            self._statement_timeouts.pop(conn, None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._size -= 1
+            if conn is not None:
+                self._stats["broken"] += 1
+            self._cond.notify()
+
+    def putconn(self, conn, suspect=False):
+        if conn.closed:
+            self._discard(conn)
+            return
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._discard(conn)
+            return
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+        with self._cond:
+            self._idle.append((conn, time.monotonic(), suspect))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None, statement_timeout=None):
+        conn = self.getconn(timeout, statement_timeout)
+        suspect = False
+        try:
+            yield conn
+        except psycopg2.errors.QueryCanceled:
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            suspect = True
+            raise
+        finally:
+            self.putconn(conn, suspect=suspect)
+
+    def stats(self):
+        self._check_fork()
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self._size, idle=len(self._idle), in_use=self._size - len(self._idle),
+                         minconn=self.minconn, maxconn=self.maxconn)
+        stats["wait_time"] = round(stats["wait_time"], 6)
+        return stats
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._statement_timeouts.pop(conn, None)
+            conn.close()
+
+# Olvasó replikák forgatása és állapota; a szinkron ReadRouter és az aszinkron kiszolgálás
+# (asgi.py) is ezt használja. A replikák tetszőleges objektumok (poolok). Kapcsolódási hiba
+# után a replika retry_after másodpercig kimarad a forgásból, utána újra próbálkozunk vele.
+class ReplicaSet:
+    def __init__(self, replicas, retry_after=30.0):
+        self.replicas = list(replicas)
+        self.retry_after = retry_after
+        self._down_until = [0.0] * len(self.replicas)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stats = {"replica_reads": 0, "primary_reads": 0, "lagging": 0, "failures": 0}
+
+    def __len__(self):
+        return len(self.replicas)
+
+    # Az elérhető replikák körbeforgó sorrendben (minden hívás a következővel kezd)
+    def candidates(self):
+        if not self.replicas:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (start + 1) % len(self.replicas)
+        order = list(range(start, len(self.replicas))) + list(range(start))
+        return [self.replicas[i] for i in order if self._down_until[i] <= now]
+
+    def mark_down(self, replica, error):
+        index = self.replicas.index(replica)
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry_after
+            self._stats["failures"] += 1
+        logger.warning(f"A(z) {index + 1}. replika {self.retry_after:.0f} mp-re kimarad a forgásból: {str(error).strip()}")
+
+    def record(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(replicas=len(self.replicas), down=sum(until > now for until in self._down_until))
+        return stats
+
+# Olvasások elosztása: az első elérhető és elég friss replika kapcsolatát adja, különben a
+# primaryét. Az is_fresh(kapcsolat, követelmény) ellenőrzés a replikán az olvasással egy
+# tranzakcióban fut (a replika poolok ehhez REPEATABLE READ munkamenettel nyílnak), így az
+# ellenőrzött állapot az, amit az olvasás is lát. A foglalt (PoolTimeout) replikát csak
+# átugorjuk; a használat közbeni kapcsolati hiba is kiveszi a replikát a forgásból, de az
+# adott kérést nem ismételjük meg.
+class ReadRouter:
+    def __init__(self, primary, replicas=(), is_fresh=None, retry_after=30.0):
+        self.primary = primary
+        self.replicas = ReplicaSet(replicas, retry_after)
+        self.is_fresh = is_fresh
+
+    def prewarm(self):
+        opened = 0
+        for pool in self.replicas.replicas:
+            try:
+                opened += pool.prewarm()
+            except psycopg2.OperationalError as e:
+                self.replicas.mark_down(pool, e)
+        return opened
+
+    # (pool, kapcsolat); a kapcsolatot a pool.putconn()-nal kell visszaadni
+    def getconn(self, requirement=None, statement_timeout=None):
+        for pool in self.replicas.candidates():
+            try:
+                conn = pool.getconn(statement_timeout=statement_timeout)
+            except PoolTimeout:
+                continue
+            except psycopg2.OperationalError as e:
+                self.replicas.mark_down(pool, e)
+                continue
+            try:
+                fresh = self.is_fresh is None or requirement is None or self.is_fresh(conn, requirement)
+            except psycopg2.Error as e:
+                pool.putconn(conn, suspect=True)
+                self.replicas.mark_down(pool, e)
+                continue
+            if fresh:
+                self.replicas.record("replica_reads")
+                return pool, conn
+            pool.putconn(conn)
+            self.replicas.record("lagging")
+        conn = self.primary.getconn(statement_timeout=statement_timeout)
+        if self.replicas:
+            self.replicas.record("primary_reads")
+        return self.primary, conn
+
+    @contextmanager
+    def connection(self, requirement=None, statement_timeout=None):
+        pool, conn = self.getconn(requirement, statement_timeout)
+        suspect = False
+        try:
+            yield conn
+        except psycopg2.errors.QueryCanceled:
+            # statement_timeout: a kapcsolat ép, a replika is
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            suspect = True
+            if pool is not self.primary:
+                self.replicas.mark_down(pool, e)
+            raise
+        finally:
+            pool.putconn(conn, suspect=suspect)
+
+    def stats(self):
+        stats = self.replicas.stats()
+        stats["pools"] = [pool.stats() for pool in self.replicas.replicas]
+        return stats
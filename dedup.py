@@ -0,0 +1,136 @@
+import math
+import re
+import unicodedata
+
+from geoindex import METERS_PER_DEGREE, haversine_m
+
+# Közeli duplikátumok felismerése: két hely akkor számít ugyanannak, ha legfeljebb
+# radius_m méterre vannak egymástól, és a nevük (ékezet- és kisbetű-függetlenül)
+# legalább min_similarity mértékben hasonló. A koordináták sorrendje a geoindex
+# modulé (east = szélesség, north = hosszúság).
+DEFAULT_RADIUS_M = 100.0
+DEFAULT_MIN_SIMILARITY = 0.7
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+_COMBINING = re.compile(r"[\u0300-\u036f]+")
+
+# Kisbetűs, ékezet nélküli, írásjelek helyett szóközzel elválasztott alak
+# (a places_fold SQL függvény általánosabb párja: bármely latin ékezetet levág)
+def fold_name(name):
+    folded = (name or "").casefold()
+    if not folded.isascii():
+        folded = _COMBINING.sub("", unicodedata.normalize("NFKD", folded))
+    return " ".join(_NON_ALNUM.sub(" ", folded).split())
+
+# A pg_trgm-hez hasonló szavankénti trigramok ("  a", " ab", "abc", ..., "yz ")
+def name_trigrams(folded):
+    grams = set()
+    for word in folded.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# 0..1 közötti hasonlóság két fold_name alakú névre: 1, ha az egyik név szavai mind
+# megvannak a másikban ("Biofarm Gyula" ~ "Biofarm Gyula külső telep"), különben a
+# trigramok Dice együtthatója (elírások, eltérő ragozás)
+def name_similarity(a, b):
+    if a == b:
+        return 1.0 if a else 0.0
+    words_a, words_b = set(a.split()), set(b.split())
+    if not words_a or not words_b:
+        return 0.0
+    if words_a <= words_b or words_b <= words_a:
+        return 1.0
+    grams_a, grams_b = name_trigrams(a), name_trigrams(b)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+# A (east, north) körüli, legalább radius_m sugarú kört befoglaló téglalap fokokban
+# (min_east, min_north, max_east, max_north): a GiST pont indexes jelöltkereséshez
+def bounding_box(east, north, radius_m):
+    d_east = radius_m / METERS_PER_DEGREE
+    # A hosszúsági fok a sarkok felé rövidül; a téglalap távolabbi szélességével számolunk
+    d_north = min(180.0, d_east / max(math.cos(math.radians(min(90.0, abs(east) + d_east))), 1e-6))
+    return east - d_east, north - d_north, east + d_east, north + d_north
+
+# A name nevű, (east, north) pontban lévő hely duplikátumai a candidates (id, east, north,
+# name) rekordok közül: (távolság m, hasonlóság, rekord) hármasok, távolság szerint
+def find_duplicates(name, east, north, candidates, radius_m=DEFAULT_RADIUS_M, min_similarity=DEFAULT_MIN_SIMILARITY):
+    folded = fold_name(name)
+    matches = []
+    for record in candidates:
+        distance = haversine_m(east, north, record[1], record[2])
+        if distance <= radius_m:
+            similarity = name_similarity(folded, fold_name(record[3]))
+            if similarity >= min_similarity:
+                matches.append((distance, similarity, tuple(record)))
+    matches.sort(key=lambda match: (match[0], match[2][0]))
+    return matches
+
+# Teljes átvizsgálás: minden duplikátum pár egyszer, (a, b, távolság m, hasonlóság) alakban,
+# ahol a a records sorrendjében korábbi; a párok b, majd a sorrendjében jönnek.
+# A pontok fokokban mért rácsba kerülnek: a cella radius_m magas, és a legészakibb
+# (legdélibb) ponton is legalább radius_m széles, így egy pont radius_m-en belüli
+# szomszédai a saját és a 8 szomszédos cellában vannak. Minden cellát csak önmagával és
+# 4 "előre" eső szomszédjával vetünk össze, így minden közeli pár egyszer kerül elő, n²
+# összehasonlítás nélkül; a nevek egységesítése is csak a közeli pároknál fut.
+def find_duplicate_pairs(records, radius_m=DEFAULT_RADIUS_M, min_similarity=DEFAULT_MIN_SIMILARITY):
+    records = [tuple(record) for record in records]
+    if not records:
+        return []
+    height = radius_m / METERS_PER_DEGREE
+    widest = min(90.0, max(abs(record[1]) for record in records) + height)
+    width = min(360.0, height / max(math.cos(math.radians(widest)), 1e-6))
+    cells = {}
+    for position, (_, east, north, _) in enumerate(records):
+        cells.setdefault((math.floor(north / width), math.floor(east / height)), []).append(position)
+    close = []
+    for (cx, cy), members in cells.items():
+        for i, a in enumerate(members):
+            close.extend((a, b) for b in members[i + 1:])
+        for key in ((cx + 1, cy - 1), (cx + 1, cy), (cx + 1, cy + 1), (cx, cy + 1)):
+            others = cells.get(key)
+            if others:
+                close.extend((a, b) if a < b else (b, a) for a in members for b in others)
+    folded = {}
+    pairs = []
+    for a, b in sorted(close, key=lambda pair: (pair[1], pair[0])):
+        first, second = records[a], records[b]
+        distance = haversine_m(first[1], first[2], second[1], second[2])
+        if distance > radius_m:
+            continue
+        for position in (a, b):
+            if position not in folded:
+                folded[position] = fold_name(records[position][3])
+        similarity = name_similarity(folded[a], folded[b])
+        if similarity >= min_similarity:
+            pairs.append((first, second, distance, similarity))
+    return pairs
+
+# Folyamatosan bővülő rácsindex a sorrendi szűréshez (pl. import lineno sorrendben): a find
+# a már felvett rekordok közül adja a legközelebbi duplikátumot, az add felvesz egy rekordot.
+# A cellák a find_duplicate_pairs-éi: radius_m magasak, és a max_abs_east szélességen is
+# legalább radius_m szélesek, így egy pont szomszédai a saját és a 8 szomszédos cellában vannak.
+class NearDuplicateIndex:
+    def __init__(self, max_abs_east, radius_m=DEFAULT_RADIUS_M, min_similarity=DEFAULT_MIN_SIMILARITY):
+        self.radius_m = radius_m
+        self.min_similarity = min_similarity
+        self.height = radius_m / METERS_PER_DEGREE
+        widest = min(90.0, abs(max_abs_east) + self.height)
+        self.width = min(360.0, self.height / max(math.cos(math.radians(widest)), 1e-6))
+        self.cells = {}
+
+    def _cell(self, east, north):
+        return math.floor(north / self.width), math.floor(east / self.height)
+
+    # (távolság m, hasonlóság, rekord) vagy None
+    def find(self, name, east, north):
+        cx, cy = self._cell(east, north)
+        candidates = [record for dx in (-1, 0, 1) for dy in (-1, 0, 1) for record in self.cells.get((cx + dx, cy + dy), ())]
+        if not candidates:
+            return None
+        matches = find_duplicates(name, east, north, candidates, self.radius_m, self.min_similarity)
+        return matches[0] if matches else None
+
+    def add(self, record):
+        record = tuple(record)
+        self.cells.setdefault(self._cell(record[1], record[2]), []).append(record)
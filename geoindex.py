@@ -0,0 +1,101 @@
+import math
+
+# A helyek koordinátái úgy vannak tárolva, ahogy a térkép link is használja őket:
+# query=east,north, azaz az `east` oszlop a szélesség, a `north` a hosszúság
+# (lásd static/helyek_export.csv). A távolságszámítás is ezt a sorrendet követi.
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+def haversine_m(east1, north1, east2, north2):
+    lat1, lat2 = math.radians(east1), math.radians(east2)
+    dlat = lat2 - lat1
+    dlon = math.radians(north2 - north1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+# Alsó becslés méterben azokra a pontokra, amelyek fokokban mérve (euklideszi távolság a
+# east, north síkon) legalább degrees-re vannak a east szélességű ponttól. A hosszúsági fok
+# a sarkok felé rövidül, ezért a sáv legnagyobb szélességével számolunk.
+def min_distance_beyond_degrees(east, degrees):
+    widest_lat = min(90.0, abs(east) + degrees)
+    return degrees * METERS_PER_DEGREE * min(1.0, math.cos(math.radians(widest_lat)))
+
+# Egyszerű, memóriában tartott rácsindex (id, east, north, name) rekordokra.
+# Ha az adatbázisban nem használható a GiST pont index, ez szolgálja ki a
+# befoglaló téglalap és a legközelebbi N hely lekérdezéseket.
+class GridIndex:
+    def __init__(self, records, cell_size=0.05):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        for record in records:
+            self.cells.setdefault(self._cell(record[1], record[2]), []).append(tuple(record))
+            self.size += 1
+        if self.cells:
+            self.min_cx = min(cx for cx, _ in self.cells)
+            self.max_cx = max(cx for cx, _ in self.cells)
+            self.min_cy = min(cy for _, cy in self.cells)
+            self.max_cy = max(cy for _, cy in self.cells)
+
+    def __len__(self):
+        return self.size
+
+    def _cell(self, east, north):
+        return math.floor(east / self.cell_size), math.floor(north / self.cell_size)
+
+    def bbox(self, min_east, min_north, max_east, max_north, limit=None):
+        if not self.cells:
+            return []
+        min_cx, min_cy = self._cell(min_east, min_north)
+        max_cx, max_cy = self._cell(max_east, max_north)
+        min_cx, max_cx = max(min_cx, self.min_cx), min(max_cx, self.max_cx)
+        min_cy, max_cy = max(min_cy, self.min_cy), min(max_cy, self.max_cy)
+        result = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for record in self.cells.get((cx, cy), ()):
+                    if min_east <= record[1] <= max_east and min_north <= record[2] <= max_north:
+                        result.append(record)
+        result.sort(key=lambda record: (record[3], record[0]))
+        return result[:limit] if limit is not None else result
+
+    # Gyűrűnként táguló keresés: a k-adik találat távolsága alapján áll meg, amikor
+    # a még át nem vizsgált cellákban már biztosan nincs közelebbi pont.
+    def nearest(self, east, north, n=10):
+        if not self.cells or n <= 0:
+            return []
+        cx0, cy0 = self._cell(east, north)
+        max_ring = max(abs(cx0 - self.min_cx), abs(cx0 - self.max_cx), abs(cy0 - self.min_cy), abs(cy0 - self.max_cy))
+        found = []
+        ring = 0
+        while ring <= max_ring:
+            for cx, cy in self._ring_cells(cx0, cy0, ring):
+                for record in self.cells.get((cx, cy), ()):
+                    found.append((haversine_m(east, north, record[1], record[2]), record))
+            if len(found) >= n:
+                found.sort(key=lambda item: item[0])
+                del found[n:]
+                if found[-1][0] <= self._min_outside_distance(east, ring):
+                    break
+            ring += 1
+        found.sort(key=lambda item: item[0])
+        return found[:n]
+
+    @staticmethod
+    def _ring_cells(cx0, cy0, ring):
+        if ring == 0:
+            yield cx0, cy0
+            return
+        for cx in range(cx0 - ring, cx0 + ring + 1):
+            yield cx, cy0 - ring
+            yield cx, cy0 + ring
+        for cy in range(cy0 - ring + 1, cy0 + ring):
+            yield cx0 - ring, cy
+            yield cx0 + ring, cy
+
+    def _min_outside_distance(self, east, ring):
+        # A gyűrűn kívüli pontok legalább ring * cell_size fokra vannak; a hosszúsági
+        # fok a sarkok felé rövidül, ezért a sáv legnagyobb szélességével számolunk
+        degrees = ring * self.cell_size
+        widest_lat = min(90.0, abs(east) + degrees + self.cell_size)
+        return degrees * METERS_PER_DEGREE * min(1.0, math.cos(math.radians(widest_lat)))
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from dedup import DEFAULT_MIN_SIMILARITY, DEFAULT_RADIUS_M, NearDuplicateIndex
+
+# A CSV oszlopai (a régi export fejléce) és a places tábla megfelelő mezői
+IMPORT_COLUMNS = {"Név": "name", "Kelet": "east", "Észak": "north", "Cím": "address", "Megjegyzések": "notes"}
+IMPORT_FIELD_LABELS = {"name": "Név", "east": "Kelet", "north": "Észak"}
+# Duplikátum ellenőrzés sorrendje: azonos név, majd közeli, hasonló nevű hely (mint az egyedi hozzáadásnál)
+IMPORT_CONFLICT_LABELS = {"name": "Név", "near": "Közeli hasonló hely"}
+COORDINATE_DECIMALS = 6
+COORDINATE_LIMITS = {"east": 180.0, "north": 90.0}
+
+ERROR_NOT_A_NUMBER = "Érvénytelen koordináta"
+ERROR_OUT_OF_RANGE = "Érvénytelen koordináta formátum vagy tartomány"
+
+# Egy beolvasott darab eredménye, oszlopos formában:
+# - rows: az importálható sorok (lineno, name, east, north, address, notes); a duplikátumokról
+#   (meglévő helyekkel és a fájlon belül) az import_rows dönt
+# - errors: soronkénti hibajelentés (lineno, field, value, error)
+class ImportBatch:
+    __slots__ = ("rows", "errors", "record_count")
+
+    def __init__(self, rows, errors, record_count):
+        self.rows = rows
+        self.errors = errors
+        self.record_count = record_count
+
+    def row_tuples(self):
+        # Oszloponkénti tolist + zip: Python típusokat ad (int, float, str), és sokkal gyorsabb az itertuples-nél
+        return list(zip(*(self.rows[column].tolist() for column in self.rows.columns)))
+
+    def error_entries(self):
+        return [f"Sor {lineno}: {error} ({IMPORT_FIELD_LABELS.get(field, field)}: {value!r})"
+                for lineno, field, value, error in self.errors.itertuples(index=False, name=None)]
+
+# A CSV beolvasása oszloponként, szövegként (a C parserrel). A csv.DictReader-hez hasonlóan
+# a hiányzó mezők üresek, a fölösleges oszlopok elmaradnak, a lineno a rekord sorszáma
+# (a fejléc az 1.). chunk_rows megadásakor darabonként ad vissza DataFrame-eket.
+# Bináris fájlt is kaphat; ekkor a dekódolást (encoding) is a parser végzi, ami gyorsabb.
+def read_import_frames(csvfile, chunk_rows=None, encoding="utf-8-sig"):
+    try:
+        reader = pd.read_csv(csvfile, dtype=str, keep_default_na=False, na_filter=False, encoding=encoding,
+                             usecols=lambda column: column in IMPORT_COLUMNS, chunksize=chunk_rows)
+    except pd.errors.EmptyDataError:
+        return
+    lineno = 2
+    for frame in (reader if chunk_rows else [reader]):
+        frame = frame.reindex(columns=list(IMPORT_COLUMNS), fill_value="")
+        frame.insert(0, "lineno", np.arange(lineno, lineno + len(frame), dtype=np.int64))
+        lineno += len(frame)
+        yield frame
+
+# round(x, 6) tömbösítve. Az np.round a szorzás kerekítési hibája miatt a pontosan
+# félúton lévő (7 tizedesre ...5 végű) értékeknél eltérhet a Python round-tól; ezeket
+# (és csak ezeket) a Python round számolja, így az eredmény bitre azonos a régi úttal.
+def round_coordinates(values, decimals=COORDINATE_DECIMALS):
+    scale = 10.0 ** decimals
+    scaled = values * scale
+    with np.errstate(invalid="ignore"):
+        rounded = np.rint(scaled) / scale
+        near_half = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if near_half.size:
+        rounded[near_half] = [round(value, decimals) for value in values[near_half].tolist()]
+    return rounded
+
+# Az is_valid_coordinate(str(round(x, 6))) szabályai tömbökre: legfeljebb két egész jegy,
+# a tartományon belül. A régi ellenőrzés a str(float) alakra futott, ami 1e-4 alatti
+# nem nulla értéknél tudományos alakot ad ("5e-05"), így ezeket elutasította; ezt megtartjuk.
+def valid_coordinates(values, limit):
+    magnitude = np.abs(values)
+    with np.errstate(invalid="ignore"):
+        return np.isfinite(values) & (magnitude < 100) & (magnitude <= limit) & ~((magnitude > 0) & (magnitude < 1e-4))
+
+def describe_near_duplicate(name, other, distance):
+    return f"{name} ≈ {other} ({distance:.0f} m)"
+
+# Fájlon belüli ütközések a régi, soronként beszúró import szabálya szerint: lineno
+# sorrendben minden sort csak a már megtartott sorokhoz mérünk. Egy sor kiesik, ha a neve
+# egy korábban megtartott soré ("name"), vagy egy korábban megtartott, hasonló nevű sor
+# közelében van ("near"); a kieső sor a későbbieket már nem szorítja ki. A rows a meglévő
+# helyekkel nem ütköző (lineno, name, east, north) sorok lineno szerint rendezve; az
+# eredmény (lineno, field, value) hármasok.
+def in_file_conflicts(rows, radius_m=DEFAULT_RADIUS_M, min_similarity=DEFAULT_MIN_SIMILARITY):
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        return []
+    names = set()
+    near = NearDuplicateIndex(max(abs(row[2]) for row in rows), radius_m, min_similarity)
+    conflicts = []
+    for lineno, name, east, north in rows:
+        if name in names:
+            conflicts.append((lineno, "name", name))
+            continue
+        match = near.find(name, east, north)
+        if match:
+            distance, _, other = match
+            conflicts.append((lineno, "near", describe_near_duplicate(name, other[3], distance)))
+            continue
+        names.add(name)
+        near.add((lineno, east, north, name))
+    return conflicts
+
+# A szöveges mezők a még érvényes sorokra, szóközök nélkül. Listaértelmezéssel a str.strip
+# többszörösen gyorsabb a pandas .str.strip()-nél (az elemenként lambdát hív).
+def stripped_values(frame, column, valid):
+    return [value.strip() for value in frame[column].to_numpy()[valid].tolist()]
+
+def validate_import_frame(frame):
+    record_count = len(frame)
+    lineno = frame["lineno"].to_numpy()
+    valid = np.ones(record_count, dtype=bool)
+    coordinates = {}
+    error_parts = []
+    for column, field in (("Kelet", "east"), ("Észak", "north")):
+        raw = frame[column].to_numpy()
+        # A to_numeric a szóközöket maga kezeli, külön strip nem kell
+        parsed = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        rounded = round_coordinates(parsed)
+        # A "nan" szöveget a float() elfogadta, a régi út tartományhibaként jelezte
+        not_number = np.isnan(parsed)
+        missing = np.flatnonzero(not_number)
+        not_number[missing] = [value.strip().lower() not in ("nan", "+nan", "-nan") for value in raw[missing].tolist()]
+        out_of_range = ~not_number & ~valid_coordinates(rounded, COORDINATE_LIMITS[field])
+        # Soronként csak az első hibát jelentjük (mint a régi ciklus)
+        for mask, message in ((not_number, ERROR_NOT_A_NUMBER), (out_of_range, ERROR_OUT_OF_RANGE)):
+            mask = mask & valid
+            if mask.any():
+                error_parts.append(pd.DataFrame({"lineno": lineno[mask], "field": field, "value": raw[mask], "error": message}))
+            valid &= ~mask
+        coordinates[field] = rounded
+    errors = (pd.concat(error_parts).sort_values("lineno", kind="stable").reset_index(drop=True)
+              if error_parts else pd.DataFrame({"lineno": np.array([], dtype=np.int64), "field": [], "value": [], "error": []}))
+
+    rows = pd.DataFrame({
+        "lineno": lineno[valid],
+        "name": stripped_values(frame, "Név", valid),
+        "east": coordinates["east"][valid],
+        "north": coordinates["north"][valid],
+        "address": stripped_values(frame, "Cím", valid),
+        "notes": stripped_values(frame, "Megjegyzések", valid),
+    })
+    return ImportBatch(rows, errors, record_count)
@@ -0,0 +1,254 @@
+import bisect
+import contextvars
+import hmac
+import logging
+import os
+import threading
+import time
+
+import psycopg2.extensions
+import psycopg2.extras
+from flask import Response, request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SLOW_LOG_TOP_QUERIES = 5
+SLOW_LOG_SQL_CHARS = 160
+
+# Az aktuális kérés mérőszámai; kérésen kívül (háttérszálak, import) None, ekkor a
+# cursorok és a megfigyelők semmit sem mérnek
+_current = contextvars.ContextVar("request_stats", default=None)
+
+class RequestStats:
+    __slots__ = ("start", "db_time", "db_queries", "pool_wait", "firebase_time", "firebase_calls", "queries")
+
+    def __init__(self, breakdown):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.pool_wait = 0.0
+        self.firebase_time = 0.0
+        self.firebase_calls = 0
+        # SQL szöveg -> [darab, összidő]; csak bekapcsolt lassú kérés naplónál gyűjtjük
+        self.queries = {} if breakdown else None
+
+    def add_query(self, query, elapsed):
+        self.db_time += elapsed
+        self.db_queries += 1
+        if self.queries is not None:
+            sql = query if isinstance(query, str) else query.decode("utf-8", "replace") if isinstance(query, bytes) else str(query)
+            entry = self.queries.setdefault(" ".join(sql.split())[:SLOW_LOG_SQL_CHARS], [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+# Időmérő cursorok: kérésen belül lekérdezésenként két perf_counter hívás, azon kívül semmi.
+# A szerveroldali (nevesített) cursor lapozó FETCH-ei nem mennek át az execute-on, így
+# azokat nem számoljuk (a CSV export streamje amúgy is a válasz elküldése közben fut).
+class _TimedCursorMixin:
+    def execute(self, query, vars=None):
+        stats = _current.get()
+        if stats is None:
+            return super().execute(query, vars)
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            stats.add_query(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        stats = _current.get()
+        if stats is None:
+            return super().executemany(query, vars_list)
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            stats.add_query(query, time.perf_counter() - start)
+
+    def copy_expert(self, sql, file, size=8192):
+        stats = _current.get()
+        if stats is None:
+            return super().copy_expert(sql, file, size)
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            stats.add_query(sql, time.perf_counter() - start)
+
+# Más driveren (az aszinkron kiszolgálás asyncpg lekérdezései) futó lekérdezések beszámítása
+def observe_query(query, elapsed):
+    stats = _current.get()
+    if stats is not None:
+        stats.add_query(query, elapsed)
+
+class TimedCursor(_TimedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+class TimedDictCursor(_TimedCursorMixin, psycopg2.extras.DictCursor):
+    pass
+
+class TimedRealDictCursor(_TimedCursorMixin, psycopg2.extras.RealDictCursor):
+    pass
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names, values, *extra):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + [part for part in extra if part]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Egyszerű, folyamaton belüli metrikák. A zárolást a RequestMetrics végzi (kérésenként egyszer).
+class Counter:
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, lines, constant):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} counter")
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels, constant)} {_format_number(value)}")
+
+class Histogram:
+    def __init__(self, name, help, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # címkék -> [vödrönkénti darabszámok (+Inf-fel), összeg]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self, lines, constant):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_format_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, constant, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels, constant)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels, constant)} {cumulative}")
+
+# Kérésszintű mérések és Prometheus szöveges export (/metrics).
+# - végpontonkénti válaszidő hisztogram és kérésszám státuszkód szerint
+# - kérésenkénti DB idő és lekérdezésszám (az időmérő cursorokból)
+# - pool várakozás (csak a várakozással járó kiadások) és Firebase hívások ideje
+# - slow_request_ms megadásakor az ennél lassabb kéréseket lekérdezés-bontással naplózza
+# A metrikák workerenként (folyamatonként) gyűlnek, a worker címke a pid; több gunicorn
+# worker esetén egy lekérés egy worker adatait adja, a sorozatok így nem keverednek.
+# A /metrics végpont csak token megadásakor jön létre, és csak "Authorization: Bearer <token>"
+# fejléccel válaszol; token nélkül a mérés és a lassú kérések naplózása ugyanúgy fut.
+class RequestMetrics:
+    def __init__(self, app, slow_request_ms=None, token=None):
+        self.slow_threshold = slow_request_ms / 1000 if slow_request_ms else None
+        self.token = token
+        self._lock = threading.Lock()
+        self._collectors = []
+        self.requests = Counter("http_requests_total", "Kérések száma végpont, metódus és státusz szerint.",
+                                ("endpoint", "method", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "Válaszidő (a válasz első bájtjáig) végpontonként.",
+                                 ("endpoint", "method"), LATENCY_BUCKETS)
+        self.db_time = Histogram("http_request_db_seconds", "Kérésenkénti összes adatbázis idő végpontonként.",
+                                 ("endpoint",), DB_BUCKETS)
+        self.db_queries = Histogram("http_request_db_queries", "Kérésenkénti lekérdezésszám végpontonként.",
+                                    ("endpoint",), QUERY_COUNT_BUCKETS)
+        self.pool_wait = Histogram("db_pool_wait_seconds", "Várakozás szabad pool kapcsolatra (csak a várakozással járó kiadások).",
+                                   (), DB_BUCKETS)
+        self.firebase = Histogram("firebase_call_duration_seconds", "Firebase Admin hívások ideje metódus és eredmény szerint.",
+                                  ("method", "outcome"), LATENCY_BUCKETS)
+        # Elsőként fusson, hogy a többi before_request ideje (session, import indítás) is beleszámítson
+        app.before_request_funcs.setdefault(None, []).insert(0, self.start)
+        # Az after_request fordított sorrendben fut: a lista elején lévő utolsóként
+        app.after_request_funcs.setdefault(None, []).insert(0, self.record)
+        app.teardown_request(self.finish)
+        if token:
+            app.add_url_rule("/metrics", "metrics", self.expose)
+        else:
+            logger.info("METRICS_TOKEN nincs megadva, a /metrics végpont nem érhető el")
+
+    # Külső mérőszámok (pl. pool állapot): a függvény (név, típus, leírás, érték) négyeseket ad
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def start(self):
+        _current.set(RequestStats(self.slow_threshold is not None))
+
+    def record(self, response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.start
+        endpoint = request.endpoint or "<nincs>"
+        with self._lock:
+            self.requests.inc((endpoint, request.method, str(response.status_code)))
+            self.latency.observe((endpoint, request.method), elapsed)
+            self.db_time.observe((endpoint,), stats.db_time)
+            self.db_queries.observe((endpoint,), stats.db_queries)
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            self.log_slow_request(stats, elapsed, response.status_code)
+        return response
+
+    def finish(self, exc=None):
+        _current.set(None)
+
+    def log_slow_request(self, stats, elapsed, status):
+        top = sorted(stats.queries.items(), key=lambda item: item[1][1], reverse=True)[:SLOW_LOG_TOP_QUERIES]
+        breakdown = "".join(f"\n  {count}x {total * 1000:.1f} ms: {sql}" for sql, (count, total) in top)
+        logger.warning("Lassú kérés: %s %s -> %s, %.1f ms (DB: %.1f ms / %d lekérdezés, pool várakozás: %.1f ms, "
+                       "Firebase: %.1f ms / %d hívás)%s", request.method, request.path, status, elapsed * 1000,
+                       stats.db_time * 1000, stats.db_queries, stats.pool_wait * 1000,
+                       stats.firebase_time * 1000, stats.firebase_calls, breakdown)
+
+    # A ConnectionPool wait_observer-e
+    def observe_pool_wait(self, seconds):
+        stats = _current.get()
+        if stats is not None:
+            stats.pool_wait += seconds
+        with self._lock:
+            self.pool_wait.observe((), seconds)
+
+    # A FirebaseUserDirectory observer-e
+    def observe_firebase(self, method, seconds, outcome):
+        stats = _current.get()
+        if stats is not None:
+            stats.firebase_time += seconds
+            stats.firebase_calls += 1
+        with self._lock:
+            self.firebase.observe((method, outcome), seconds)
+
+    def render(self):
+        # A pid-et itt olvassuk ki: --preload esetén az objektum még a master folyamatban készül
+        worker = f'worker="{os.getpid()}"'
+        lines = []
+        with self._lock:
+            for metric in (self.requests, self.latency, self.db_time, self.db_queries, self.pool_wait, self.firebase):
+                metric.render(lines, worker)
+        for collector in self._collectors:
+            for name, kind, help, value in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{{{worker}}} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def expose(self):
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {self.token}"):
+            return Response("Hiányzó vagy hibás token\n", status=401, mimetype="text/plain")
+        return Response(self.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
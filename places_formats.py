@@ -0,0 +1,60 @@
+import gzip
+import struct
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Az /api/places válaszformátumai (format paraméter, vagy Accept: application/msgpack):
+# - json: a régi formátum (objektumok tömbje, lapozva {"items", "next"})
+# - columns: {"count", "columns": {mező: [értékek]}, "next"} párhuzamos tömbökkel
+# - msgpack: ugyanez MessagePack-ben (a msgpack csomag szükséges)
+# - f32: a térképréteghez: uint32 darabszám, int32 azonosítók, majd (east, north)
+#   float32 párok, mind little-endian; a következő lap kurzora az X-Next-Cursor fejlécben.
+#   A float32 kb. 0,5 m pontosságú a mi koordinátáinkon, megjelenítéshez elég.
+PLACES_FORMATS = {
+    "json": "application/json",
+    "columns": "application/json",
+    "msgpack": "application/msgpack",
+    "f32": "application/octet-stream",
+}
+POINT_BUFFER_FIELDS = ("id", "east", "north")
+# Ennél kisebb válaszokat nem érdemes tömöríteni
+COMPRESS_MIN_BYTES = 1024
+
+def available_formats():
+    return [fmt for fmt in PLACES_FORMATS if fmt != "msgpack" or msgpack]
+
+def available_encodings():
+    return (["br"] if brotli else []) + ["gzip"]
+
+def encode_columns(columns, next_cursor, fmt, dumps):
+    payload = {"count": len(next(iter(columns.values()), ())), "columns": columns, "next": next_cursor}
+    if fmt == "msgpack":
+        return msgpack.packb(payload, use_bin_type=True)
+    return dumps(payload).encode("utf-8")
+
+def encode_point_buffer(columns):
+    count = len(columns["id"])
+    coordinates = np.empty((count, 2), dtype="<f4")
+    coordinates[:, 0] = columns["east"]
+    coordinates[:, 1] = columns["north"]
+    return struct.pack("<I", count) + np.asarray(columns["id"], dtype="<i4").tobytes() + coordinates.tobytes()
+
+def decode_point_buffer(body):
+    count = struct.unpack_from("<I", body)[0]
+    ids = np.frombuffer(body, dtype="<i4", count=count, offset=4)
+    coordinates = np.frombuffer(body, dtype="<f4", count=2 * count, offset=4 + 4 * count).reshape(count, 2)
+    return ids, coordinates
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
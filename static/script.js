@@ -2,8 +2,20 @@ document.addEventListener("DOMContentLoaded", function () {
     let searchInput = document.getElementById("searchInput");
     let searchButton = document.getElementById("searchButton");
     let clearButton = document.getElementById("clearButton");
+    let placesTable = document.getElementById("placesTable");
+    let noPlacesAlert = document.getElementById("noPlacesAlert");
+    let loadMoreButton = document.getElementById("loadMoreButton");
 
-    // Debounce függvény: késlelteti a filterTable hívást
+    if (!placesTable) {
+        return;
+    }
+
+    const isAdmin = placesTable.dataset.admin === "1";
+    const pageSize = placesTable.dataset.pageSize || 50;
+    let currentSearch = searchInput ? searchInput.value.trim() : "";
+    let pendingRequest = null;
+
+    // Debounce függvény: késlelteti a keresés hívását
     function debounce(func, delay) {
         let timeoutId;
         return function (...args) {
@@ -12,34 +24,120 @@ document.addEventListener("DOMContentLoaded", function () {
         };
     }
 
-    // Debounced filterTable (300ms késleltetés)
-    const debouncedFilter = debounce(filterTable, 300);
+    function actionButton(tag, href, className, text) {
+        let element = document.createElement(tag);
+        element.href = href;
+        element.className = className;
+        element.textContent = text;
+        return element;
+    }
+
+    // Egy sor felépítése DOM API-val (textContent), így a mezők tartalma nem kerül HTML-ként értelmezésre
+    function renderRow(place) {
+        let row = document.createElement("tr");
+        [place.name, place.east, place.north, place.address, place.notes].forEach(value => {
+            let cell = document.createElement("td");
+            cell.textContent = value ?? "";
+            row.appendChild(cell);
+        });
+        let actions = document.createElement("td");
+        let mapLink = actionButton("a", `https://www.google.com/maps/search/?api=1&query=${place.east},${place.north}`, "btn btn-secondary-action-map btn-sm", "Térkép");
+        mapLink.target = "_blank";
+        actions.appendChild(mapLink);
+        if (isAdmin) {
+            actions.append(" ", actionButton("a", `/edit/${place.id}`, "btn btn-secondary-action-edit btn-sm", "Módosítás"), " ");
+            let form = document.createElement("form");
+            form.action = `/delete/${place.id}`;
+            form.method = "post";
+            form.style.display = "inline";
+            form.onsubmit = confirmDelete;
+            let button = document.createElement("button");
+            button.className = "btn btn-secondary-action-delete btn-sm";
+            button.textContent = "Törlés";
+            form.appendChild(button);
+            actions.appendChild(form);
+        }
+        row.appendChild(actions);
+        return row;
+    }
 
-    // Kereső input-ra kötés (realtime, de debounced)
-    searchInput.addEventListener("input", debouncedFilter);
-    searchButton.addEventListener("click", filterTable); // Gombra is marad
-    clearButton.addEventListener("click", clearSearch);
+    function setNextCursor(next) {
+        loadMoreButton.dataset.next = next || "";
+        loadMoreButton.style.display = next ? "" : "none";
+    }
 
-    function filterTable() {
-        let filter = searchInput.value.trim().toLowerCase();
-        let rows = document.querySelectorAll("#placesTable tr");
+    // Egy oldal lekérése a szerverről; a korábbi, még futó kérést megszakítjuk
+    function loadPage(after) {
+        if (pendingRequest) {
+            pendingRequest.abort();
+        }
+        pendingRequest = new AbortController();
+        let params = new URLSearchParams({ limit: pageSize });
+        if (currentSearch) {
+            params.set("q", currentSearch);
+        }
+        if (after) {
+            params.set("after", after);
+        }
+        return fetch(`/api/places?${params}`, { signal: pendingRequest.signal })
+            .then(response => response.json())
+            .then(page => {
+                if (page.error) {
+                    throw new Error(page.error);
+                }
+                if (!after) {
+                    placesTable.replaceChildren();
+                }
+                page.items.forEach(place => placesTable.appendChild(renderRow(place)));
+                noPlacesAlert.style.display = placesTable.children.length === 0 ? "block" : "none";
+                setNextCursor(page.next);
+            })
+            .catch(error => {
+                if (error.name === "AbortError") {
+                    return;
+                }
+                console.error("Hiba a helyek betöltése során:", error);
+                noPlacesAlert.style.display = "block";
+                noPlacesAlert.textContent = "Hiba történt a helyek betöltése során!";
+            });
+    }
 
-        rows.forEach(row => {
-            let cells = row.getElementsByTagName("td");
-            let match = Array.from(cells).some(cell => cell.textContent.toLowerCase().includes(filter));
-            row.style.display = match ? "" : "none";
-        });
+    function search() {
+        let value = searchInput.value.trim();
+        if (value === currentSearch) {
+            return;
+        }
+        currentSearch = value;
+        // A cím is kövesse a keresést, így frissítés után ugyanaz az oldal jelenik meg
+        let url = new URL(window.location);
+        url.searchParams.delete("after");
+        if (currentSearch) {
+            url.searchParams.set("search", currentSearch);
+        } else {
+            url.searchParams.delete("search");
+        }
+        history.replaceState(null, "", url);
+        loadPage(null);
     }
 
     function clearSearch() {
         searchInput.value = "";
-        filterTable(); // Ürítés után az összes elem újra látható lesz
+        search(); // Ürítés után az első oldal újra betöltődik
     }
 
-    // Keresőmező ürítése oldal frissítése után
-    searchInput.value = "";
+    loadMoreButton.addEventListener("click", function (event) {
+        event.preventDefault();
+        loadPage(loadMoreButton.dataset.next);
+    });
+
+    if (searchInput) {
+        // Kereső input-ra kötés (realtime, de debounced, 300ms késleltetés)
+        searchInput.addEventListener("input", debounce(search, 300));
+        searchButton.addEventListener("click", search); // Gombra is marad
+        clearButton.addEventListener("click", clearSearch);
+    }
 });
 
 function confirmDelete() {
     return confirm("⚠️ Biztosan törölni szeretnéd ezt a helyet? Ez a művelet nem visszavonható!");
-}
\ No newline at end of file
+}
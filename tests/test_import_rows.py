@@ -0,0 +1,27 @@
+# Az import_rows adatbázis tesztje; DATABASE_URL nélkül kimarad. A módosításokat a
+# tranzakció végén visszagörgetjük, a places táblán nem marad nyomuk.
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="DATABASE_URL nincs beállítva")
+
+@pytest.fixture
+def cursor():
+    import app
+    assert app.ensure_schema()
+    with app.db_connection() as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+        conn.rollback()
+
+def test_empty_text_fields_are_stored_as_empty_strings(cursor):
+    import app
+    cursor.execute("DELETE FROM places WHERE name IN ('', 'Üres mezős teszt hely')")
+    imported, duplicates = app.import_rows(cursor, [
+        (2, "Üres mezős teszt hely", 47.123456, 19.123456, "", ""),
+        (3, "", 46.123456, 18.123456, "", ""),
+    ])
+    assert (imported, duplicates) == (2, [])
+    cursor.execute("SELECT name, address, notes FROM places WHERE name IN ('', 'Üres mezős teszt hely') ORDER BY name")
+    assert [tuple(row) for row in cursor.fetchall()] == [("", "", ""), ("Üres mezős teszt hely", "", "")]
@@ -0,0 +1,58 @@
+# A places_clusters triggerek tesztjei; DATABASE_URL nélkül kimaradnak. A módosításokat
+# a tranzakció végén visszagörgetjük.
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="DATABASE_URL nincs beállítva")
+
+@pytest.fixture
+def cursor():
+    import app
+    assert app.ensure_schema()
+    with app.db_connection() as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+        conn.rollback()
+
+# A tárolt cellák eltérései a places táblából újraszámolt összesítésektől
+def cluster_mismatches(cursor):
+    import app
+    cursor.execute(f"""
+        WITH expected AS (
+            SELECT k.zoom, k.cx, k.cy, count(*) AS count, array_agg(p.id) AS ids
+            FROM places p, places_cluster_keys(p.east, p.north) k
+            GROUP BY k.zoom, k.cx, k.cy
+        )
+        SELECT coalesce(e.zoom, c.zoom), coalesce(e.cx, c.cx), coalesce(e.cy, c.cy), e.count, c.count, c.sample_ids
+        FROM expected e FULL JOIN places_clusters c USING (zoom, cx, cy)
+        WHERE e.count IS DISTINCT FROM c.count
+            OR cardinality(c.sample_ids) <> least(e.count, {app.CLUSTER_SAMPLE_SIZE})
+            OR NOT c.sample_ids <@ e.ids
+            OR cardinality(c.sample_ids) <> (SELECT count(DISTINCT id) FROM unnest(c.sample_ids) id)
+    """)
+    return cursor.fetchall()
+
+def test_moving_places_between_cells_keeps_samples_distinct(cursor):
+    # Egy cellából 4 hely kiköltözik, 1 beköltözik ugyanabban az UPDATE-ben
+    cursor.execute("""
+        INSERT INTO places (name, east, north)
+        SELECT 'Klaszter teszt ' || i, 10.001 + i * 0.0001, 10.001 FROM generate_series(1, 7) i
+        RETURNING id
+    """)
+    ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("INSERT INTO places (name, east, north) VALUES ('Klaszter teszt kint', 12.5, 12.5) RETURNING id")
+    outside = cursor.fetchone()[0]
+    cursor.execute("""
+        UPDATE places SET
+            east = CASE WHEN id = %s THEN 10.0015 ELSE 12.5 END,
+            north = CASE WHEN id = %s THEN 10.0015 ELSE 12.5 END
+        WHERE id = ANY(%s)
+    """, (outside, outside, ids[:4] + [outside]))
+    assert cluster_mismatches(cursor) == []
+
+def test_truncate_empties_clusters(cursor):
+    cursor.execute("INSERT INTO places (name, east, north) VALUES ('Klaszter teszt csonkítás', 10.5, 10.5)")
+    cursor.execute("TRUNCATE places CASCADE")
+    cursor.execute("SELECT count(*) FROM places_clusters")
+    assert cursor.fetchone()[0] == 0
@@ -0,0 +1,304 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class UserNotFound(Exception):
+    pass
+
+class EmailAlreadyExists(Exception):
+    pass
+
+# Egységes felhasználó rekord; a sablonok a uid, email, role és custom_claims mezőket használják,
+# a disabled (Firebase-ben letiltott fiók) a bejelentkezésnél számít
+class User:
+    __slots__ = ("uid", "email", "custom_claims", "disabled")
+
+    def __init__(self, uid, email, custom_claims=None, disabled=False):
+        self.uid = uid
+        self.email = email
+        self.custom_claims = dict(custom_claims or {})
+        self.disabled = disabled
+
+    @property
+    def role(self):
+        return self.custom_claims.get('role', 'user')
+
+    def __repr__(self):
+        return f"User(uid={self.uid!r}, email={self.email!r}, role={self.role!r})"
+
+# A felhasználókezelés felülete. Az app csak ezen keresztül éri el a Firebase-t,
+# így tesztekhez és mérésekhez a memóriabeli változat cserélhető be.
+class UserDirectory(ABC):
+    @abstractmethod
+    def get_user(self, uid):
+        ...
+
+    @abstractmethod
+    def get_user_by_email(self, email):
+        ...
+
+    # (felhasználók listája, következő oldal tokenje vagy None)
+    @abstractmethod
+    def list_users(self, page_token=None, max_results=50):
+        ...
+
+    @abstractmethod
+    def create_user(self, email, password, role="user"):
+        ...
+
+    @abstractmethod
+    def set_role(self, uid, role):
+        ...
+
+    @abstractmethod
+    def delete_user(self, uid):
+        ...
+
+# observer: opcionális függvény (metódus neve, idő mp-ben, "ok"/"error") minden Firebase hívás után
+class FirebaseUserDirectory(UserDirectory):
+    def __init__(self, auth_module, observer=None):
+        self.auth = auth_module
+        self.observer = observer
+
+    @staticmethod
+    def _user(record):
+        return User(record.uid, record.email, record.custom_claims, record.disabled)
+
+    def _call(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        except self.auth.UserNotFoundError as e:
+            raise UserNotFound(str(e)) from e
+        except self.auth.EmailAlreadyExistsError as e:
+            raise EmailAlreadyExists(str(e)) from e
+        finally:
+            if self.observer is not None:
+                self.observer(func.__name__, time.perf_counter() - start, outcome)
+
+    def get_user(self, uid):
+        return self._user(self._call(self.auth.get_user, uid))
+
+    def get_user_by_email(self, email):
+        return self._user(self._call(self.auth.get_user_by_email, email))
+
+    def list_users(self, page_token=None, max_results=50):
+        page = self._call(self.auth.list_users, page_token=page_token, max_results=max_results)
+        return [self._user(record) for record in page.users], page.next_page_token or None
+
+    def create_user(self, email, password, role="user"):
+        record = self._call(self.auth.create_user, email=email, password=password)
+        self._call(self.auth.set_custom_user_claims, record.uid, {"role": role})
+        return User(record.uid, record.email, {"role": role})
+
+    def set_role(self, uid, role):
+        self._call(self.auth.set_custom_user_claims, uid, {"role": role})
+
+    def delete_user(self, uid):
+        self._call(self.auth.delete_user, uid)
+
+# A tényleges felhasználókezelés az első használatkor jön létre (a factory hívásával, pl. a
+# Firebase inicializálása), így az app importját és a worker indulását nem lassítja
+class LazyUserDirectory(UserDirectory):
+    def __init__(self, factory):
+        self._factory = factory
+        self._directory = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            with self._lock:
+                if self._directory is None:
+                    self._directory = self._factory()
+        return self._directory
+
+    def get_user(self, uid):
+        return self.directory.get_user(uid)
+
+    def get_user_by_email(self, email):
+        return self.directory.get_user_by_email(email)
+
+    def list_users(self, page_token=None, max_results=50):
+        return self.directory.list_users(page_token, max_results)
+
+    def create_user(self, email, password, role="user"):
+        return self.directory.create_user(email, password, role)
+
+    def set_role(self, uid, role):
+        self.directory.set_role(uid, role)
+
+    def delete_user(self, uid):
+        self.directory.delete_user(uid)
+
+# Memóriabeli változat tesztekhez, mérésekhez és lokális fejlesztéshez (USER_DIRECTORY=memory)
+class InMemoryUserDirectory(UserDirectory):
+    def __init__(self, users=()):
+        self._users = {}
+        self._lock = threading.Lock()
+        for email, role in users:
+            self.create_user(email, None, role)
+
+    def get_user(self, uid):
+        with self._lock:
+            if uid not in self._users:
+                raise UserNotFound(f"Nincs felhasználó: uid={uid}")
+            user = self._users[uid]
+        return User(user.uid, user.email, user.custom_claims, user.disabled)
+
+    def get_user_by_email(self, email):
+        with self._lock:
+            for user in self._users.values():
+                if user.email == email:
+                    return User(user.uid, user.email, user.custom_claims, user.disabled)
+        raise UserNotFound(f"Nincs felhasználó: email={email}")
+
+    def list_users(self, page_token=None, max_results=50):
+        with self._lock:
+            uids = sorted(uid for uid in self._users if page_token is None or uid > page_token)
+            users = [self._users[uid] for uid in uids[:max_results]]
+            page = [User(user.uid, user.email, user.custom_claims, user.disabled) for user in users]
+        next_token = page[-1].uid if len(uids) > max_results else None
+        return page, next_token
+
+    def create_user(self, email, password, role="user"):
+        with self._lock:
+            if any(user.email == email for user in self._users.values()):
+                raise EmailAlreadyExists(f"Már létező email: {email}")
+            user = User(uuid.uuid4().hex, email, {"role": role})
+            self._users[user.uid] = user
+        return user
+
+    def set_role(self, uid, role):
+        with self._lock:
+            if uid not in self._users:
+                raise UserNotFound(f"Nincs felhasználó: uid={uid}")
+            self._users[uid].custom_claims["role"] = role
+
+    def delete_user(self, uid):
+        with self._lock:
+            if self._users.pop(uid, None) is None:
+                raise UserNotFound(f"Nincs felhasználó: uid={uid}")
+
+class TTLCache:
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def pop_matching(self, predicate):
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Gyorsítótárazó réteg: a rekordok (és így a szerepkörök) ttl másodpercig élnek.
+# A saját írások (létrehozás, szerepkör módosítás, törlés) azonnal érvénytelenítenek;
+# más workerek írásai legfeljebb ttl másodperc késéssel látszanak. A bejelentkezés ezért
+# a fresh_user_by_email-t használja, ami mindig a tényleges felhasználókezelést kérdezi.
+class CachedUserDirectory(UserDirectory):
+    def __init__(self, directory, ttl=60, max_entries=4096):
+        self.directory = directory
+        self.users = TTLCache(ttl, max_entries)
+        self.pages = TTLCache(ttl, 256)
+
+    def get_user(self, uid):
+        user = self.users.get(("uid", uid))
+        if user is None:
+            user = self.directory.get_user(uid)
+            self._remember(user)
+        return user
+
+    def get_user_by_email(self, email):
+        user = self.users.get(("email", email))
+        if user is None:
+            user = self.directory.get_user_by_email(email)
+            self._remember(user)
+        return user
+
+    # Gyorsítótár nélküli lekérdezés (a jogosultsági döntésekhez); az eredménnyel a
+    # gyorsítótárat is frissíti, a máshol törölt felhasználót pedig kiveszi belőle
+    def fresh_user_by_email(self, email):
+        try:
+            user = self.directory.get_user_by_email(email)
+        except UserNotFound:
+            self.users.pop_matching(lambda user: user.email == email)
+            self.pages.clear()
+            raise
+        self._forget(user.uid)
+        self._remember(user)
+        return user
+
+    def list_users(self, page_token=None, max_results=50):
+        key = (page_token, max_results)
+        page = self.pages.get(key)
+        if page is None:
+            page = self.directory.list_users(page_token, max_results)
+            self.pages.put(key, page)
+            for user in page[0]:
+                self._remember(user)
+        return page
+
+    def create_user(self, email, password, role="user"):
+        user = self.directory.create_user(email, password, role)
+        self.users.pop(("email", email))
+        self.pages.clear()
+        return user
+
+    # Az érvénytelenítés az írás után jön: ha előtte lenne, egy közben futó olvasás a régi
+    # rekordot visszatehetné. Hiba esetén is ürítünk, mert az írás részben megtörténhetett.
+    def set_role(self, uid, role):
+        try:
+            self.directory.set_role(uid, role)
+        finally:
+            self._forget(uid)
+
+    def delete_user(self, uid):
+        try:
+            self.directory.delete_user(uid)
+        finally:
+            self._forget(uid)
+
+    def _remember(self, user):
+        self.users.put(("uid", user.uid), user)
+        if user.email:
+            self.users.put(("email", user.email), user)
+
+    def _forget(self, uid):
+        # Az uid és az email szerinti bejegyzés is ugyanarra a rekordra mutat
+        self.users.pop_matching(lambda user: user.uid == uid)
+        self.pages.clear()